@@ -15,7 +15,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 # Import your models
 from app.core.database import Base
-from app.models.call import Call, CallTranscript, Speaker, CallAnalysis, ProcessingTask
+from app.models.call import Call, CallTranscript, Speaker, CallAnalysis, ProcessingTask, UploadSession, SftpManifestEntry
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,124 @@
+"""Initial schema
+
+The tables exactly as app/models/call.py defined them before migrations
+were kept; every later column, table and index comes from 0002 onwards.
+A database created from those models has exactly this schema: mark it with
+`alembic stamp 0001`, then `alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "calls",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=False),
+        sa.Column("original_filename", sa.String(), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column("file_size", sa.Integer(), nullable=False),
+        sa.Column("duration_seconds", sa.Float(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("sample_rate", sa.Integer(), nullable=True),
+        sa.Column("channels", sa.Integer(), nullable=True),
+        sa.Column("format", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_calls_id", "calls", ["id"])
+    op.create_index("ix_calls_filename", "calls", ["filename"], unique=True)
+    op.create_index("ix_calls_status", "calls", ["status"])
+
+    op.create_table(
+        "call_transcripts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("call_id", sa.Integer(), nullable=False),
+        sa.Column("raw_text", sa.Text(), nullable=False),
+        sa.Column("processed_text", sa.Text(), nullable=True),
+        sa.Column("language", sa.String(), nullable=True),
+        sa.Column("confidence", sa.Float(), nullable=True),
+        sa.Column("segments", sa.JSON(), nullable=True),
+        sa.Column("whisper_model", sa.String(), nullable=True),
+        sa.Column("processing_time_seconds", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["call_id"], ["calls.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_call_transcripts_id", "call_transcripts", ["id"])
+
+    op.create_table(
+        "speakers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("call_id", sa.Integer(), nullable=False),
+        sa.Column("speaker_id", sa.String(), nullable=False),
+        sa.Column("speaker_label", sa.String(), nullable=True),
+        sa.Column("segments", sa.JSON(), nullable=False),
+        sa.Column("total_speaking_time", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["call_id"], ["calls.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_speakers_id", "speakers", ["id"])
+
+    op.create_table(
+        "call_analyses",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("call_id", sa.Integer(), nullable=False),
+        sa.Column("overall_result", sa.String(), nullable=False),
+        sa.Column("confidence_score", sa.Float(), nullable=True),
+        sa.Column("violations", sa.JSON(), nullable=True),
+        sa.Column("bindingstid_mentioned", sa.Boolean(), nullable=True),
+        sa.Column("bindingstid_details", sa.JSON(), nullable=True),
+        sa.Column("pris_mentioned", sa.Boolean(), nullable=True),
+        sa.Column("pris_details", sa.JSON(), nullable=True),
+        sa.Column("press_mentioned", sa.Boolean(), nullable=True),
+        sa.Column("press_details", sa.JSON(), nullable=True),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("key_points", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["call_id"], ["calls.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_call_analyses_id", "call_analyses", ["id"])
+
+    op.create_table(
+        "processing_tasks",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("call_id", sa.Integer(), nullable=True),
+        sa.Column("task_id", sa.String(), nullable=False),
+        sa.Column("task_type", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("progress_percentage", sa.Integer(), nullable=True),
+        sa.Column("current_step", sa.String(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["call_id"], ["calls.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_processing_tasks_id", "processing_tasks", ["id"])
+    op.create_index("ix_processing_tasks_task_id", "processing_tasks", ["task_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("processing_tasks")
+    op.drop_table("call_analyses")
+    op.drop_table("speakers")
+    op.drop_table("call_transcripts")
+    op.drop_table("calls")
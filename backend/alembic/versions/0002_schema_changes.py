@@ -0,0 +1,90 @@
+"""Columns and tables added since the initial schema
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:15:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Duplicate detection: SHA-256 of the upload and the call whose results it reuses
+    with op.batch_alter_table("calls") as batch_op:
+        batch_op.add_column(sa.Column("content_hash", sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column("duplicate_of_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_calls_duplicate_of_id_calls", "calls", ["duplicate_of_id"], ["id"])
+        batch_op.create_index("ix_calls_content_hash", ["content_hash"])
+        # Archival tier: when the audio was transcoded and its size before that
+        batch_op.add_column(sa.Column("archived_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column("original_file_size", sa.Integer(), nullable=True))
+
+    # Transcript segments labelled with the speaker who said them
+    op.add_column("call_transcripts", sa.Column("aligned_segments", sa.JSON(), nullable=True))
+
+    # Resumable chunked uploads
+    op.create_table(
+        "upload_sessions",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(length=36), nullable=False),
+        sa.Column("original_filename", sa.String(), nullable=False),
+        sa.Column("total_size", sa.Integer(), nullable=False),
+        sa.Column("chunk_size", sa.Integer(), nullable=False),
+        sa.Column("total_chunks", sa.Integer(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+        sa.Column("force_reprocess", sa.Boolean(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("call_id", sa.Integer(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["call_id"], ["calls.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_upload_sessions_id", "upload_sessions", ["id"])
+    op.create_index("ix_upload_sessions_session_id", "upload_sessions", ["session_id"], unique=True)
+    op.create_index("ix_upload_sessions_status", "upload_sessions", ["status"])
+    op.create_index("ix_upload_sessions_expires_at", "upload_sessions", ["expires_at"])
+
+    # Files already fetched by the SFTP sync, with the size and mtime they had
+    op.create_table(
+        "sftp_manifest",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("remote_path", sa.String(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("mtime", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("call_id", sa.Integer(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("fetched_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["call_id"], ["calls.id"]),
+        sa.PrimaryKeyConstraint("id")
+    )
+    op.create_index("ix_sftp_manifest_id", "sftp_manifest", ["id"])
+    op.create_index("ix_sftp_manifest_remote_path", "sftp_manifest", ["remote_path"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("sftp_manifest")
+    op.drop_table("upload_sessions")
+
+    with op.batch_alter_table("call_transcripts") as batch_op:
+        batch_op.drop_column("aligned_segments")
+
+    with op.batch_alter_table("calls") as batch_op:
+        batch_op.drop_index("ix_calls_content_hash")
+        batch_op.drop_column("original_file_size")
+        batch_op.drop_column("archived_at")
+        batch_op.drop_constraint("fk_calls_duplicate_of_id_calls", type_="foreignkey")
+        batch_op.drop_column("duplicate_of_id")
+        batch_op.drop_column("content_hash")
@@ -0,0 +1,84 @@
+"""Indexes for the hot query paths; one transcript and one analysis per call
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:30:00
+
+"""
+from contextlib import nullcontext
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+ARCHIVE_CANDIDATES = "status = 'completed' AND archived_at IS NULL"
+
+# (name, table, columns, extra create_index arguments)
+INDEXES = [
+    ("ix_calls_created_at", "calls", ["created_at"], {}),
+    ("ix_calls_status_created_at", "calls", ["status", "created_at"], {}),
+    ("ix_calls_duplicate_of_id", "calls", ["duplicate_of_id"], {}),
+    ("ix_calls_archive_candidates", "calls", ["processed_at"], {
+        "postgresql_where": sa.text(ARCHIVE_CANDIDATES),
+        "sqlite_where": sa.text(ARCHIVE_CANDIDATES)
+    }),
+    ("ix_speakers_call_id", "speakers", ["call_id"], {}),
+    ("ix_call_analyses_overall_result_call_id", "call_analyses", ["overall_result", "call_id"], {}),
+    ("ix_processing_tasks_call_id_task_type", "processing_tasks", ["call_id", "task_type"], {}),
+    ("ix_processing_tasks_created_at", "processing_tasks", ["created_at"], {}),
+    ("ix_processing_tasks_status_created_at", "processing_tasks", ["status", "created_at"], {}),
+]
+
+# Replaced by ix_calls_status_created_at, which serves the same lookups
+SUPERSEDED = [("ix_calls_status", "calls", ["status"])]
+
+ONE_PER_CALL = [
+    ("uq_call_transcripts_call_id", "call_transcripts"),
+    ("uq_call_analyses_call_id", "call_analyses"),
+]
+
+
+def _online_index_changes():
+    # On Postgres, build and drop concurrently so the live tables stay
+    # writable; that cannot run inside the migration's transaction.
+    if op.get_bind().dialect.name == "postgresql":
+        return op.get_context().autocommit_block(), {"postgresql_concurrently": True}
+    return nullcontext(), {}
+
+
+def upgrade() -> None:
+    # Reprocessing used to add a second analysis row; keep the newest per call
+    for _, table in ONE_PER_CALL:
+        op.execute(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM {table} GROUP BY call_id) AS newest)"
+        )
+    for name, table in ONE_PER_CALL:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_unique_constraint(name, ["call_id"])
+
+    block, options = _online_index_changes()
+    with block:
+        for name, table, columns, extra in INDEXES:
+            op.create_index(name, table, columns, **extra, **options)
+        for name, table, _ in SUPERSEDED:
+            op.drop_index(name, table_name=table, **options)
+
+
+def downgrade() -> None:
+    block, options = _online_index_changes()
+    with block:
+        for name, table, columns in SUPERSEDED:
+            op.create_index(name, table, columns, **options)
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, **options)
+
+    for name, table in reversed(ONE_PER_CALL):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(name, type_="unique")
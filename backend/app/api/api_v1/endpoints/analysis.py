@@ -3,49 +3,63 @@ API endpoints for call analysis and statistics.
 Designer: Abdullah Alawiss
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
 
-from ....core.database import get_db
+from ....core.database import get_async_db
 from ....models.call import Call, CallAnalysis, CallTranscript, ProcessingTask
 from ....schemas.call import StatsResponse, ProcessingTaskResponse
+from ....services.transcript_importer import TRANSCRIPT_FORMAT
 
 router = APIRouter()
 
+def _bad_calls_query():
+    # The analysis comes from the join itself instead of one lazy load per call
+    return select(Call).join(CallAnalysis).options(contains_eager(Call.analysis)).where(
+        CallAnalysis.overall_result == "bad"
+    )
+
 @router.get("/stats", response_model=StatsResponse)
 async def get_dashboard_stats(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get dashboard statistics."""
     
-    # Basic call counts
-    total_calls = db.query(Call).count()
-    completed_calls = db.query(Call).filter(Call.status == "completed").count()
-    failed_calls = db.query(Call).filter(Call.status == "failed").count()
-    processing_calls = db.query(Call).filter(Call.status == "processing").count()
+    # Basic call counts, one grouped query
+    status_counts = dict((await db.execute(
+        select(Call.status, func.count()).group_by(Call.status)
+    )).all())
+    total_calls = sum(status_counts.values())
+    completed_calls = status_counts.get("completed", 0)
+    failed_calls = status_counts.get("failed", 0)
+    processing_calls = status_counts.get("processing", 0)
     
     # Analysis results
-    good_calls = db.query(CallAnalysis).filter(CallAnalysis.overall_result == "good").count()
-    bad_calls = db.query(CallAnalysis).filter(CallAnalysis.overall_result == "bad").count()
+    result_counts = dict((await db.execute(
+        select(CallAnalysis.overall_result, func.count()).group_by(CallAnalysis.overall_result)
+    )).all())
+    good_calls = result_counts.get("good", 0)
+    bad_calls = result_counts.get("bad", 0)
     
     # Duration stats
-    total_duration = db.query(func.sum(Call.duration_seconds)).scalar() or 0
+    total_duration = await db.scalar(select(func.sum(Call.duration_seconds))) or 0
     total_duration_minutes = total_duration / 60
     
     # Processing time stats
-    avg_processing_time = db.query(func.avg(CallTranscript.processing_time_seconds)).scalar() or 0
+    avg_processing_time = await db.scalar(select(func.avg(CallTranscript.processing_time_seconds))) or 0
     
     # Top violations
-    violations_data = db.query(CallAnalysis.violations).filter(
-        CallAnalysis.violations.isnot(None)
-    ).all()
+    violations_data = await db.stream_scalars(
+        select(CallAnalysis.violations).where(CallAnalysis.violations.isnot(None))
+    )
     
     violation_counts = {}
-    for analysis in violations_data:
-        if analysis.violations:
-            for violation in analysis.violations:
+    async for violations in violations_data:
+        if violations:
+            for violation in violations:
                 violation_type = violation.get('type', 'unknown')
                 violation_counts[violation_type] = violation_counts.get(violation_type, 0) + 1
     
@@ -54,6 +68,11 @@ async def get_dashboard_stats(
         for vtype, count in sorted(violation_counts.items(), key=lambda x: x[1], reverse=True)[:3]
     ]
     
+    # Archival tier savings
+    from ....workers.archive_tasks import archive_bytes_saved
+    archived_calls = await db.scalar(select(func.count()).where(Call.archived_at.isnot(None)))
+    archive_saved = await db.run_sync(archive_bytes_saved)
+    
     return StatsResponse(
         total_calls=total_calls,
         completed_calls=completed_calls,
@@ -63,19 +82,21 @@ async def get_dashboard_stats(
         bad_calls=bad_calls,
         total_duration_minutes=total_duration_minutes,
         avg_processing_time_seconds=avg_processing_time,
-        top_violations=top_violations
+        top_violations=top_violations,
+        archived_calls=archived_calls,
+        archive_bytes_saved=archive_saved
     )
 
 @router.get("/violations")
 async def get_violations_summary(
     limit: int = Query(50, ge=1, le=1000),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get summary of all violations across calls."""
     
-    calls_with_violations = db.query(Call).join(CallAnalysis).filter(
-        CallAnalysis.overall_result == "bad"
-    ).order_by(desc(Call.created_at)).limit(limit).all()
+    calls_with_violations = (await db.scalars(
+        _bad_calls_query().order_by(desc(Call.created_at)).limit(limit)
+    )).all()
     
     violations_summary = []
     
@@ -99,24 +120,19 @@ async def get_violations_summary(
 
 @router.get("/rule-analysis")
 async def get_rule_analysis_summary(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get analysis summary for each rule type."""
     
-    # Count mentions of each rule
-    bindingstid_count = db.query(CallAnalysis).filter(
-        CallAnalysis.bindingstid_mentioned == True
-    ).count()
-    
-    pris_count = db.query(CallAnalysis).filter(
-        CallAnalysis.pris_mentioned == True
-    ).count()
-    
-    press_count = db.query(CallAnalysis).filter(
-        CallAnalysis.press_mentioned == True
-    ).count()
-    
-    total_analyzed = db.query(CallAnalysis).count()
+    # Count mentions of each rule in a single pass over the table
+    total_analyzed, bindingstid_count, pris_count, press_count = (await db.execute(
+        select(
+            func.count(),
+            func.count().filter(CallAnalysis.bindingstid_mentioned == True),
+            func.count().filter(CallAnalysis.pris_mentioned == True),
+            func.count().filter(CallAnalysis.press_mentioned == True)
+        ).select_from(CallAnalysis)
+    )).one()
     
     return {
         "total_analyzed_calls": total_analyzed,
@@ -140,27 +156,27 @@ async def get_rule_analysis_summary(
 async def get_processing_tasks(
     status: Optional[str] = Query(None, description="Filter by task status"),
     limit: int = Query(50, ge=1, le=1000),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get list of processing tasks."""
     
-    query = db.query(ProcessingTask)
+    query = select(ProcessingTask)
     
     if status:
-        query = query.filter(ProcessingTask.status == status)
+        query = query.where(ProcessingTask.status == status)
     
-    tasks = query.order_by(desc(ProcessingTask.created_at)).limit(limit).all()
+    tasks = (await db.scalars(query.order_by(desc(ProcessingTask.created_at)).limit(limit))).all()
     
     return [ProcessingTaskResponse.from_orm(task) for task in tasks]
 
 @router.get("/tasks/{task_id}", response_model=ProcessingTaskResponse)
 async def get_processing_task(
     task_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get details of a specific processing task."""
     
-    task = db.query(ProcessingTask).filter(ProcessingTask.task_id == task_id).first()
+    task = await db.scalar(select(ProcessingTask).where(ProcessingTask.task_id == task_id))
     
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -170,22 +186,27 @@ async def get_processing_task(
 @router.post("/reprocess/{call_id}")
 async def reprocess_call(
     call_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Reprocess a call (re-run analysis)."""
     
-    call = db.query(Call).filter(Call.id == call_id).first()
+    call = await db.get(Call, call_id)
     
     if not call:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    # Reset call status
+    # Reset call status; a reprocessed duplicate gets results of its own
     call.status = "processing"
-    db.commit()
+    call.duplicate_of_id = None
+    await db.commit()
     
-    # Start reprocessing task
-    from ....workers.audio_tasks import process_audio_file
-    task = process_audio_file.delay(call_id)
+    # Start reprocessing task; imported transcripts have no audio to run through
+    if call.format == TRANSCRIPT_FORMAT:
+        from ....workers.import_tasks import analyze_imported_calls
+        task = analyze_imported_calls.delay([call_id])
+    else:
+        from ....workers.audio_tasks import process_audio_file
+        task = process_audio_file.delay(call_id)
     
     return {
         "message": "Reprocessing started",
@@ -196,15 +217,13 @@ async def reprocess_call(
 @router.get("/export/violations")
 async def export_violations(
     format: str = Query("json", regex="^(json|csv)$"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Export violations data in JSON or CSV format."""
     
     violations_data = []
     
-    calls_with_violations = db.query(Call).join(CallAnalysis).filter(
-        CallAnalysis.overall_result == "bad"
-    ).all()
+    calls_with_violations = (await db.scalars(_bad_calls_query())).all()
     
     for call in calls_with_violations:
         if call.analysis and call.analysis.violations:
@@ -3,31 +3,48 @@ API endpoints for call management.
 Designer: Abdullah Alawiss
 """
 
-from typing import List, Optional
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, desc, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from ....core.database import get_db
-from ....models.call import Call, CallTranscript, CallAnalysis
+from ....core.database import get_async_db
+from ....models.call import Call, CallTranscript, CallAnalysis, Speaker
 from ....schemas.call import CallResponse, CallDetailResponse, CallListResponse
+from ....services.admission import dispatch_new_calls
 
 router = APIRouter()
 
+async def _results_call_id(db: AsyncSession, call_id: int) -> int:
+    """Duplicate uploads share the results of the call they duplicate."""
+    duplicate_of_id = await db.scalar(select(Call.duplicate_of_id).where(Call.id == call_id))
+    return duplicate_of_id or call_id
+
+def _call_with_results(call_id: int):
+    # Relationships cannot lazy-load on an async session; fetch them up front
+    return select(Call).where(Call.id == call_id).options(
+        selectinload(Call.transcript),
+        selectinload(Call.analysis),
+        selectinload(Call.speakers)
+    )
+
 @router.get("/", response_model=CallListResponse)
 async def get_calls(
     skip: int = Query(0, ge=0, description="Number of calls to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of calls to return"),
     status: Optional[str] = Query(None, description="Filter by status"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get list of calls with pagination and filtering."""
-    query = db.query(Call)
+    """Get list of calls with pagination and filtering, newest first."""
+    query = select(Call)
     
     if status:
-        query = query.filter(Call.status == status)
+        query = query.where(Call.status == status)
     
-    total = query.count()
-    calls = query.offset(skip).limit(limit).all()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    calls = (await db.scalars(query.order_by(desc(Call.created_at)).offset(skip).limit(limit))).all()
     
     return CallListResponse(
         calls=[CallResponse.from_orm(call) for call in calls],
@@ -39,44 +56,104 @@ async def get_calls(
 @router.get("/{call_id}", response_model=CallDetailResponse)
 async def get_call(
     call_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get detailed information about a specific call."""
-    call = db.query(Call).filter(Call.id == call_id).first()
+    call = await db.scalar(_call_with_results(call_id))
     
     if not call:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    return CallDetailResponse.from_orm(call)
+    detail = CallDetailResponse.from_orm(call)
+    
+    if call.duplicate_of_id:
+        original = await db.scalar(_call_with_results(call.duplicate_of_id))
+        if original:
+            source = CallDetailResponse.from_orm(original)
+            detail.transcript = source.transcript
+            detail.analysis = source.analysis
+            detail.speakers = source.speakers
+    
+    return detail
 
 @router.delete("/{call_id}")
 async def delete_call(
     call_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a call and all associated data."""
-    call = db.query(Call).filter(Call.id == call_id).first()
+    call = await db.get(Call, call_id)
     
     if not call:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    # Delete related records first
-    db.query(CallTranscript).filter(CallTranscript.call_id == call_id).delete()
-    db.query(CallAnalysis).filter(CallAnalysis.call_id == call_id).delete()
+    heir_id = await _promote_duplicate(db, call)
+    
+    # Delete related records first (results handed to a duplicate are already repointed)
+    await db.execute(delete(CallTranscript).where(CallTranscript.call_id == call_id))
+    await db.execute(delete(CallAnalysis).where(CallAnalysis.call_id == call_id))
+    await db.execute(delete(Speaker).where(Speaker.call_id == call_id))
     
     # Delete the call
-    db.delete(call)
-    db.commit()
+    await db.delete(call)
+    await db.commit()
+    
+    if heir_id is not None and call.status != "completed":
+        # No results to hand over: the promoted duplicate is processed on its own
+        await asyncio.to_thread(dispatch_new_calls, [heir_id])
     
     return {"message": "Call deleted successfully"}
 
+async def _promote_duplicate(db: AsyncSession, call: Call) -> Optional[int]:
+    """
+    Make the oldest duplicate of a call that is being deleted the new original.
+    It takes over the results when there are any, otherwise it is reset for
+    processing; the other duplicates are repointed at it. Returns its id.
+    """
+    duplicate_ids = (await db.scalars(
+        select(Call.id).where(Call.duplicate_of_id == call.id).order_by(Call.id)
+    )).all()
+    if not duplicate_ids:
+        return None
+    
+    heir_id = duplicate_ids[0]
+    await db.execute(
+        update(Call).where(Call.duplicate_of_id == call.id, Call.id != heir_id).values(duplicate_of_id=heir_id),
+        execution_options={"synchronize_session": False}
+    )
+    
+    if call.status == "completed":
+        for model in (CallTranscript, CallAnalysis, Speaker):
+            await db.execute(
+                update(model).where(model.call_id == call.id).values(call_id=heir_id),
+                execution_options={"synchronize_session": False}
+            )
+        heir_values = {
+            "status": "completed",
+            "duration_seconds": call.duration_seconds,
+            "sample_rate": call.sample_rate,
+            "channels": call.channels,
+            "processed_at": call.processed_at
+        }
+    else:
+        heir_values = {"status": "uploaded"}
+    
+    await db.execute(
+        update(Call).where(Call.id == heir_id).values(duplicate_of_id=None, **heir_values),
+        execution_options={"synchronize_session": False}
+    )
+    return heir_id
+
 @router.get("/{call_id}/transcript")
 async def get_call_transcript(
     call_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get transcript for a specific call."""
-    transcript = db.query(CallTranscript).filter(CallTranscript.call_id == call_id).first()
+    results_call_id = await _results_call_id(db, call_id)
+    transcript = await db.scalar(
+        select(CallTranscript).where(CallTranscript.call_id == results_call_id).limit(1)
+    )
     
     if not transcript:
         raise HTTPException(status_code=404, detail="Transcript not found")
@@ -88,16 +165,20 @@ async def get_call_transcript(
         "language": transcript.language,
         "confidence": transcript.confidence,
         "segments": transcript.segments,
+        "aligned_segments": transcript.aligned_segments,
         "created_at": transcript.created_at
     }
 
 @router.get("/{call_id}/analysis")
 async def get_call_analysis(
     call_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get analysis results for a specific call."""
-    analysis = db.query(CallAnalysis).filter(CallAnalysis.call_id == call_id).first()
+    results_call_id = await _results_call_id(db, call_id)
+    analysis = await db.scalar(
+        select(CallAnalysis).where(CallAnalysis.call_id == results_call_id).limit(1)
+    )
     
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
@@ -10,7 +10,7 @@ from sqlalchemy import text
 from celery import Celery
 
 from ....core.config import settings
-from ....core.database import engine
+from ....core.database import engine, pool_status
 
 router = APIRouter()
 
@@ -194,8 +194,7 @@ async def get_metrics():
             },
             "database": {
                 "active_connections": db_connections,
-                "pool_size": engine.pool.size(),
-                "checked_out": engine.pool.checkedout()
+                "pool": pool_status()  # This process only
             },
             "redis": {
                 "used_memory": redis_info.get('used_memory', 0),
@@ -3,125 +3,504 @@ API endpoints for file upload.
 Designer: Abdullah Alawiss
 """
 
+import asyncio
+import math
 import os
 import uuid
-import aiofiles
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, File, Query, Request
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ....core.database import get_db
+from ....core.database import get_async_db
 from ....core.config import settings
-from ....models.call import Call
-from ....schemas.call import UploadResponse
-from ....workers.audio_tasks import process_audio_file
+from ....models.call import Call, UploadSession
+from ....schemas.call import UploadResponse, UploadSessionCreate, UploadSessionResponse
+from ....services.admission import AdmissionController, AdmissionDecision, dispatch_new_calls
+from ....services.ingest_service import duplicate_files, insert_uploads
+from ....services.storage import get_storage
+from ....services.upload_service import (
+    ChunkMismatch,
+    ChunkStore,
+    StoredUpload,
+    UploadService,
+    UploadTooLarge,
+    UnsupportedAudioFormat
+)
 
 router = APIRouter()
 
-@router.post("/", response_model=UploadResponse)
-async def upload_audio_file(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    """Upload an audio file for processing."""
-    
-    # Validate file type
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No filename provided")
+PENDING_MESSAGE = "File uploaded successfully. Processing is queued and starts when workers have capacity."
+
+async def _find_original(db: AsyncSession, content_hash: str):
+    """Earliest non-failed call with the same content, if any."""
+    return await db.scalar(select(Call).where(
+        Call.content_hash == content_hash,
+        Call.duplicate_of_id.is_(None),
+        Call.status != "failed"
+    ).order_by(Call.id).limit(1))
+
+async def _store_upload(save) -> StoredUpload:
+    """Run an UploadService save and map its errors onto HTTP responses."""
+    try:
+        return await save
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedAudioFormat as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _check_admission() -> Optional[AdmissionDecision]:
+    """
+    Queue-depth admission control. In "reject" mode new uploads get 429 with
+    Retry-After while the processing queues are over the high watermark; in
+    "park" mode the decision is passed on and the calls wait as "pending".
+    """
+    if settings.ADMISSION_MODE == "off":
+        return None
     
-    file_extension = file.filename.split('.')[-1].lower()
-    if file_extension not in settings.SUPPORTED_AUDIO_FORMATS:
+    # Broker and worker inspection are blocking calls
+    decision = await asyncio.get_running_loop().run_in_executor(None, AdmissionController().check)
+    if settings.ADMISSION_MODE == "reject" and not decision.admit:
         raise HTTPException(
-            status_code=400, 
-            detail=f"Unsupported file format. Supported formats: {', '.join(settings.SUPPORTED_AUDIO_FORMATS)}"
+            status_code=429,
+            detail=f"Processing queue is full ({decision.queue_depth} waiting). Retry later.",
+            headers={"Retry-After": str(decision.retry_after)}
         )
-    
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    
-    # Create uploads directory if it doesn't exist
-    upload_dir = "uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    file_path = os.path.join(upload_dir, unique_filename)
-    
+    return decision
+
+async def _delete_stored(key: str) -> None:
+    """Remove a stored upload without blocking the event loop (disk unlink or S3 DELETE)."""
+    await asyncio.to_thread(get_storage().delete, key)
+
+async def _register_upload(
+    db: AsyncSession,
+    stored: StoredUpload,
+    original_filename: str,
+    force_reprocess: bool,
+    decision: AdmissionDecision = None
+) -> UploadResponse:
+    """Create the call for a stored upload and start processing (or link a duplicate)."""
     try:
-        # Save file to disk
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
-        
-        file_size = len(content)
-        
-        # Validate file size
-        if file_size > settings.MAX_CONTENT_LENGTH:
-            os.remove(file_path)
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {settings.MAX_CONTENT_LENGTH} bytes"
+        # Same recording uploaded before: link to its results instead of reprocessing
+        original = None if force_reprocess else await _find_original(db, stored.content_hash)
+        if original:
+            await _delete_stored(stored.file_path)
+            
+            call = Call(
+                filename=stored.filename,
+                original_filename=original_filename,
+                file_path=original.file_path,
+                file_size=stored.file_size,
+                format=stored.audio_format,
+                status="duplicate",
+                content_hash=stored.content_hash,
+                duplicate_of_id=original.id
+            )
+            
+            db.add(call)
+            await db.commit()
+            await db.refresh(call)
+            
+            return UploadResponse(
+                call_id=call.id,
+                filename=stored.filename,
+                original_filename=original_filename,
+                file_size=stored.file_size,
+                status="duplicate",
+                message=f"Identical recording already uploaded as call {original.id}. Reusing its results."
             )
         
         # Create call record in database
         call = Call(
-            filename=unique_filename,
-            original_filename=file.filename,
-            file_path=file_path,
-            file_size=file_size,
-            format=file_extension,
-            status="uploaded"
+            filename=stored.filename,
+            original_filename=original_filename,
+            file_path=stored.file_path,
+            file_size=stored.file_size,
+            format=stored.audio_format,
+            status="uploaded",
+            content_hash=stored.content_hash
         )
         
         db.add(call)
-        db.commit()
-        db.refresh(call)
+        await db.commit()
+        await db.refresh(call)
+        
+        # Start async processing (or park it while the workers are saturated).
+        # Without a decision, park mode checks admission in the worker thread.
+        task_id = await asyncio.to_thread(dispatch_new_calls, [call.id], decision)
         
-        # Start async processing
-        task = process_audio_file.delay(call.id)
+        if task_id is None:
+            return UploadResponse(
+                call_id=call.id,
+                filename=stored.filename,
+                original_filename=original_filename,
+                file_size=stored.file_size,
+                status="pending",
+                message=PENDING_MESSAGE
+            )
         
         return UploadResponse(
             call_id=call.id,
-            filename=unique_filename,
-            original_filename=file.filename,
-            file_size=file_size,
+            filename=stored.filename,
+            original_filename=original_filename,
+            file_size=stored.file_size,
             status="uploaded",
-            message=f"File uploaded successfully. Processing started with task ID: {task.id}"
+            message=f"File uploaded successfully. Processing started with task ID: {task_id}"
         )
         
     except Exception as e:
         # Clean up file if database operation fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        await _delete_stored(stored.file_path)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.post("/", response_model=UploadResponse)
+async def upload_audio_file(
+    file: UploadFile = File(...),
+    force_reprocess: bool = Query(False, description="Process the file even if identical audio was already uploaded"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Upload an audio file for processing (multipart form).
+    The format is detected from the file's content, not its extension.
+    """
+    
+    # Validate file type
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+    
+    decision = await _check_admission()
+    stored = await _store_upload(UploadService().save_upload_file(file))
+    return await _register_upload(db, stored, file.filename, force_reprocess, decision)
+
+@router.post("/stream", response_model=UploadResponse)
+async def upload_audio_stream(
+    request: Request,
+    filename: str = Query(..., description="Original file name of the recording"),
+    force_reprocess: bool = Query(False, description="Process the file even if identical audio was already uploaded"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Upload an audio file as the raw request body.
+    Unlike multipart, the body is not buffered before this handler runs, so an
+    oversized upload is rejected from its Content-Length or as soon as the
+    streamed bytes pass the limit.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_CONTENT_LENGTH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size: {settings.MAX_CONTENT_LENGTH} bytes"
+        )
+    
+    # Before reading the body, so a refused upload costs no transfer
+    decision = await _check_admission()
+    stored = await _store_upload(UploadService().save_stream(request.stream()))
+    return await _register_upload(db, stored, filename, force_reprocess, decision)
+
 @router.post("/batch", response_model=List[UploadResponse])
 async def upload_multiple_files(
     files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
+    force_reprocess: bool = Query(False, description="Process files even if identical audio was already uploaded"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Upload multiple audio files for processing."""
+    """
+    Upload multiple audio files for processing.
+    Files are stored concurrently (up to BATCH_UPLOAD_CONCURRENCY at a time),
+    their calls are inserted together and processing is dispatched as one
+    Celery group. The response has one entry per file, in request order.
+    """
+    
+    if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Maximum {settings.BATCH_UPLOAD_MAX_FILES} files per batch")
+    
+    decision = await _check_admission()
+    semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+    upload_service = UploadService()
     
-    if len(files) > 10:  # Limit batch uploads
-        raise HTTPException(status_code=400, detail="Maximum 10 files per batch")
+    async def store(file: UploadFile) -> StoredUpload:
+        if not file.filename:
+            raise UnsupportedAudioFormat("No filename provided")
+        async with semaphore:
+            return await upload_service.save_upload_file(file)
+    
+    outcomes = await asyncio.gather(*(store(file) for file in files), return_exceptions=True)
+    
+    stored_files = [
+        (outcome, file.filename) for file, outcome in zip(files, outcomes)
+        if isinstance(outcome, StoredUpload)
+    ]
+    
+    try:
+        # Shared with the SFTP worker, so it stays sync; run_sync sends its queries through the async connection
+        registrations = await db.run_sync(insert_uploads, stored_files, force_reprocess)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        await asyncio.gather(*(_delete_stored(stored.file_path) for stored, _ in stored_files))
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
     
+    # Duplicates reuse the original's file; their own copy is no longer needed
+    await asyncio.gather(*(_delete_stored(key) for key in duplicate_files(stored_files, registrations)))
+    
+    registered = iter(registrations)
     results = []
+    new_call_ids = []
     
-    for file in files:
-        try:
-            result = await upload_audio_file(file, db)
-            results.append(result)
-        except HTTPException as e:
-            # Add error result for failed uploads
+    for file, outcome in zip(files, outcomes):
+        if not isinstance(outcome, StoredUpload):
             results.append(UploadResponse(
                 call_id=0,
                 filename=file.filename or "unknown",
                 original_filename=file.filename or "unknown",
                 file_size=0,
                 status="failed",
-                message=f"Upload failed: {e.detail}"
+                message=f"Upload failed: {outcome}"
             ))
+            continue
+        
+        registration = next(registered)
+        if registration["status"] == "duplicate":
+            message = f"Identical recording already uploaded as call {registration['duplicate_of_id']}. Reusing its results."
+        else:
+            new_call_ids.append(registration["call_id"])
+            message = "File uploaded successfully. Processing started."
+        
+        results.append(UploadResponse(
+            call_id=registration["call_id"],
+            filename=outcome.filename,
+            original_filename=file.filename,
+            file_size=outcome.file_size,
+            status=registration["status"],
+            message=message
+        ))
+    
+    if new_call_ids and await asyncio.to_thread(dispatch_new_calls, new_call_ids, decision) is None:
+        parked = set(new_call_ids)
+        for result in results:
+            if result.call_id in parked:
+                result.status = "pending"
+                result.message = PENDING_MESSAGE
     
     return results
 
+async def _get_session(db: AsyncSession, session_id: str) -> UploadSession:
+    session = await db.scalar(select(UploadSession).where(UploadSession.session_id == session_id))
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+def _session_expired(session: UploadSession) -> bool:
+    return session.expires_at.replace(tzinfo=None) < datetime.utcnow()
+
+def _expected_chunk_size(session: UploadSession, index: int) -> int:
+    if index < session.total_chunks - 1:
+        return session.chunk_size
+    return session.total_size - session.chunk_size * (session.total_chunks - 1)
+
+def _session_response(session: UploadSession, chunk_store: ChunkStore, upload: UploadResponse = None) -> UploadSessionResponse:
+    received = chunk_store.received(session.session_id) if session.status == "open" else []
+    received_set = set(received)
+    missing = [] if session.status != "open" else [i for i in range(session.total_chunks) if i not in received_set]
+    
+    return UploadSessionResponse(
+        session_id=session.session_id,
+        original_filename=session.original_filename,
+        status=session.status,
+        total_size=session.total_size,
+        chunk_size=session.chunk_size,
+        total_chunks=session.total_chunks,
+        received_chunks=received,
+        missing_chunks=missing,
+        expires_at=session.expires_at,
+        call_id=session.call_id,
+        upload=upload
+    )
+
+@router.post("/sessions", response_model=UploadSessionResponse)
+async def create_upload_session(
+    session_request: UploadSessionCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Start a resumable upload. The client then PUTs each chunk (in any order,
+    in parallel, retrying as needed) and calls /complete once all are in.
+    """
+    await _check_admission()
+    
+    if session_request.total_size <= 0:
+        raise HTTPException(status_code=400, detail="total_size must be positive")
+    if session_request.total_size > settings.MAX_CONTENT_LENGTH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size: {settings.MAX_CONTENT_LENGTH} bytes"
+        )
+    
+    chunk_size = session_request.chunk_size or settings.UPLOAD_SESSION_CHUNK_SIZE
+    if chunk_size <= 0 or chunk_size > settings.UPLOAD_SESSION_MAX_CHUNK_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"chunk_size must be between 1 and {settings.UPLOAD_SESSION_MAX_CHUNK_SIZE} bytes"
+        )
+    
+    session = UploadSession(
+        session_id=str(uuid.uuid4()),
+        original_filename=session_request.original_filename,
+        total_size=session_request.total_size,
+        chunk_size=chunk_size,
+        total_chunks=math.ceil(session_request.total_size / chunk_size),
+        content_hash=session_request.content_hash.lower() if session_request.content_hash else None,
+        force_reprocess=session_request.force_reprocess,
+        status="open",
+        expires_at=datetime.utcnow() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    )
+    
+    db.add(session)
+    await db.commit()
+    await db.refresh(session)
+    
+    return _session_response(session, ChunkStore())
+
+@router.get("/sessions/{session_id}", response_model=UploadSessionResponse)
+async def get_upload_session(session_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Status of a resumable upload, including which chunks are still missing."""
+    return _session_response(await _get_session(db, session_id), ChunkStore())
+
+@router.put("/sessions/{session_id}/chunks/{index}", response_model=UploadSessionResponse)
+async def upload_session_chunk(
+    session_id: str,
+    index: int,
+    request: Request,
+    chunk_sha256: str = Header(..., alias="X-Chunk-SHA256", description="Hex SHA-256 of this chunk"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Store one chunk (raw request body). Re-sending a chunk is harmless, so a
+    client resumes by re-PUTting whatever GET reports as missing.
+    """
+    session = await _get_session(db, session_id)
+    if session.status != "open":
+        raise HTTPException(status_code=409, detail=f"Upload session is {session.status}")
+    if _session_expired(session):
+        raise HTTPException(status_code=410, detail="Upload session has expired")
+    if index < 0 or index >= session.total_chunks:
+        raise HTTPException(status_code=400, detail=f"Chunk index must be between 0 and {session.total_chunks - 1}")
+    
+    expected_size = _expected_chunk_size(session, index)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) != expected_size:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be {expected_size} bytes")
+    
+    chunk_store = ChunkStore()
+    try:
+        await chunk_store.write_chunk(session_id, index, request.stream(), expected_size, chunk_sha256)
+    except ChunkMismatch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _session_response(session, chunk_store)
+
+@router.post("/sessions/{session_id}/complete", response_model=UploadSessionResponse)
+async def complete_upload_session(session_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Assemble the chunks into one upload and register it like any other.
+    Exactly one request finalizes a session: repeating /complete afterwards
+    returns the same call, and a concurrent one gets 409.
+    """
+    chunk_store = ChunkStore()
+    session = await _get_session(db, session_id)
+    
+    if session.status == "open":
+        if _session_expired(session):
+            raise HTTPException(status_code=410, detail="Upload session has expired")
+        
+        missing = sorted(set(range(session.total_chunks)) - set(chunk_store.received(session_id)))
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Missing chunks: {missing}")
+        
+        # Claim the session; only the request whose UPDATE matches goes on to finalize
+        claimed = (await db.execute(
+            update(UploadSession).where(
+                UploadSession.id == session.id,
+                UploadSession.status == "open"
+            ).values(status="finalizing"),
+            execution_options={"synchronize_session": False}
+        )).rowcount
+        await db.commit()
+        await db.refresh(session)
+    else:
+        claimed = 0
+    
+    if not claimed:
+        if session.status == "completed":
+            return _session_response(session, chunk_store)
+        if session.status == "finalizing":
+            raise HTTPException(status_code=409, detail="Upload session is already being finalized")
+        raise HTTPException(status_code=410, detail=f"Upload session is {session.status}")
+    
+    try:
+        stored = await _store_upload(
+            UploadService().save_stream(chunk_store.assembled(session_id, session.total_chunks))
+        )
+        if session.content_hash and stored.content_hash != session.content_hash:
+            await _delete_stored(stored.file_path)
+            raise HTTPException(status_code=400, detail="Assembled file does not match content_hash")
+        
+        upload = await _register_upload(db, stored, session.original_filename, session.force_reprocess)
+    
+    except HTTPException as e:
+        # Release the claim so the client can fix the chunks and try again.
+        # The rollback expires `session`, so update by key rather than through it.
+        await db.rollback()
+        await db.execute(
+            update(UploadSession).where(UploadSession.session_id == session_id).values(
+                status="open", error_message=str(e.detail)
+            ),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+        raise
+    
+    session.status = "completed"
+    session.call_id = upload.call_id
+    session.error_message = None
+    session.completed_at = datetime.utcnow()
+    await db.commit()
+    
+    await asyncio.to_thread(chunk_store.remove, session_id)
+    return _session_response(session, chunk_store, upload)
+
+@router.post("/transcripts")
+async def import_transcripts_csv(
+    csv_file: UploadFile = File(..., description="Call log CSV with a filename column"),
+    transcript_dir: str = Query(..., description="Directory of the .txt transcripts, relative to TRANSCRIPT_IMPORT_ROOT")
+):
+    """
+    Import transcript-only calls (no audio) from a call-log CSV. The CSV is
+    put into storage and imported by a worker in batches; only analysis and
+    GDPR redaction run for these calls.
+    """
+    root = os.path.realpath(settings.TRANSCRIPT_IMPORT_ROOT)
+    directory = os.path.realpath(os.path.join(root, transcript_dir))
+    if os.path.commonpath([root, directory]) != root or not os.path.isdir(directory):
+        raise HTTPException(status_code=400, detail="transcript_dir must be an existing directory under the import root")
+    
+    csv_key = f"imports/{uuid.uuid4()}.csv"
+    storage = get_storage()
+    await asyncio.get_running_loop().run_in_executor(
+        None,
+        storage.upload_stream,
+        csv_key,
+        iter(lambda: csv_file.file.read(1024 * 1024), b"")
+    )
+    
+    from ....workers.import_tasks import import_transcripts
+    task = import_transcripts.delay(csv_key, directory)
+    
+    return {
+        "message": "Transcript import started",
+        "task_id": task.id
+    }
+
 @router.get("/supported-formats")
 async def get_supported_formats():
     """Get list of supported audio formats."""
@@ -14,7 +14,11 @@ celery_app = Celery(
     include=[
         "app.workers.audio_tasks",
         "app.workers.analysis_tasks",
-        "app.workers.gdpr_tasks"
+        "app.workers.gdpr_tasks",
+        "app.workers.archive_tasks",
+        "app.workers.maintenance_tasks",
+        "app.workers.sftp_tasks",
+        "app.workers.import_tasks"
     ]
 )
 
@@ -55,10 +59,18 @@ celery_app.conf.update(
     
     # Beat schedule (for periodic tasks)
     beat_schedule={
-        "cleanup-old-tasks": {
-            "task": "app.workers.maintenance_tasks.cleanup_old_tasks",
+        "release-pending-calls": {
+            "task": "release_pending_calls",
+            "schedule": settings.ADMISSION_FEED_INTERVAL_SECONDS,
+        },
+        "cleanup-upload-sessions": {
+            "task": "cleanup_upload_sessions",
             "schedule": 3600.0,  # Every hour
         },
+        "archive-old-calls": {
+            "task": "archive_old_calls",
+            "schedule": 86400.0,  # Daily
+        },
         "sftp-sync": {
             "task": "app.workers.sftp_tasks.sync_sftp_files",
             "schedule": 300.0,  # Every 5 minutes
@@ -23,11 +23,19 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "password"
     POSTGRES_DB: str = "callcenter_db"
     POSTGRES_PORT: str = "5432"
+    DATABASE_URL: Optional[str] = None  # Assembled from the fields above when unset
+    # Connection pool, per process: every API worker and Celery child has its own
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a connection before failing
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Below server/proxy idle timeouts
+    DB_POOL_PRE_PING: bool = True
     
     # Redis
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_URL: Optional[str] = None  # Assembled from the fields above when unset
     
     # Celery
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
@@ -40,13 +48,98 @@ class Settings(BaseSettings):
     MINIO_BUCKET_NAME: str = "callcenter-audio"
     MINIO_SECURE: bool = False
     
+    # Audio storage: "local" (uploads/ on this node or a shared mount) or "s3" (the MinIO/S3 bucket above)
+    STORAGE_BACKEND: str = "local"
+    S3_ENDPOINT_URL: Optional[str] = None  # Overrides MINIO_ENDPOINT/MINIO_SECURE, e.g. AWS or a local stand-in
+    STORAGE_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024  # Held in memory per in-flight S3 upload
+    STORAGE_MAX_CONNECTIONS: int = 10
+    STORAGE_CACHE_DIR: str = "storage_cache"  # Read-through cache of S3 objects on workers
+    STORAGE_CACHE_MAX_BYTES: int = 20 * 1024 * 1024 * 1024
+    
     # Audio Processing
+    MAX_CONTENT_LENGTH: int = 500 * 1024 * 1024  # Largest accepted upload, in bytes
+    # Resumable uploads: chunks are PUT separately (in parallel if wanted) and assembled on finalize
+    UPLOAD_SESSION_DIR: str = "uploads/sessions"  # Local even with S3: behind several API nodes, share it or route sessions stickily
+    UPLOAD_SESSION_CHUNK_SIZE: int = 8 * 1024 * 1024
+    UPLOAD_SESSION_MAX_CHUNK_SIZE: int = 64 * 1024 * 1024
+    UPLOAD_SESSION_TTL_HOURS: int = 24
+    # Batch uploads: files per request and how many are written to disk at once
+    BATCH_UPLOAD_MAX_FILES: int = 200
+    BATCH_UPLOAD_CONCURRENCY: int = 8
+    # Admission control: "off", "reject" (429 + Retry-After) or "park" (accept as "pending", fed in later)
+    ADMISSION_MODE: str = "off"
+    ADMISSION_QUEUES: list = ["celery", "audio_processing"]  # Broker lists whose length is the backlog
+    ADMISSION_HIGH_WATERMARK: float = 20.0  # Queued messages per worker slot above which uploads are held back
+    ADMISSION_LOW_WATERMARK: float = 5.0  # The feeder tops the queues up to this many per slot
+    ADMISSION_DEFAULT_CAPACITY: int = 4  # Worker slots assumed when no worker answers inspect
+    ADMISSION_CAPACITY_TTL_SECONDS: float = 30.0
+    ADMISSION_TASK_SECONDS: float = 30.0  # Rough time per queued message, for Retry-After
+    ADMISSION_FEED_INTERVAL_SECONDS: float = 10.0
+    # Transcript-only imports (CSV call log + .txt files)
+    TRANSCRIPT_IMPORT_ROOT: str = "data"  # API imports may only read transcripts below this directory
+    TRANSCRIPT_IMPORT_BATCH_SIZE: int = 1000  # Rows per COPY / INSERT
+    TRANSCRIPT_IMPORT_DISPATCH_CHUNK: int = 50  # Calls analyzed per Celery message
     MAX_AUDIO_DURATION: int = 3600  # 1 hour in seconds
     SUPPORTED_AUDIO_FORMATS: list = ["wav", "mp3", "m4a", "flac"]
     WHISPER_MODEL: str = "medium"
+    LOCAL_WHISPER_MODEL: str = "base"  # Smaller model for free tier; "mock" for CPU-only tests
+    DIARIZATION_MODEL: str = "pyannote/speaker-diarization"  # "mock" for CPU-only tests
+    PRELOAD_MODELS: list = []  # Registry keys loaded at worker start, e.g. ["whisper:base"]
+    MODEL_WARMUP: bool = True
+    # "file" writes a normalized WAV next to the upload; "memory" streams PCM into
+    # shared memory (transcription and diarization workers must share the host)
+    AUDIO_NORMALIZATION_MODE: str = "file"
+    
+    # Artifact store for intermediate outputs (normalized audio, transcription, diarization)
+    ARTIFACT_STORE_ENABLED: bool = True
+    ARTIFACT_STORE_PATH: str = "artifacts"
+    ARTIFACT_STORE_MAX_BYTES: int = 10 * 1024 ** 3  # 10 GB, least recently used evicted first
+    ARTIFACT_STORE_RESCAN_SECONDS: int = 300  # Re-measure the store from disk at most this often
+    
+    # Archival tier: completed calls are transcoded to Opus after a while
+    ARCHIVE_ENABLED: bool = True
+    ARCHIVE_AFTER_DAYS: int = 30
+    ARCHIVE_BITRATE: str = "32k"  # Per channel; speech stays intelligible for reprocessing
+    ARCHIVE_BATCH_SIZE: int = 100
+    
+    # Voice activity detection (silence and hold music are cut before transcription)
+    VAD_ENABLED: bool = True
+    VAD_MIN_SILENCE_RATIO: float = 0.1  # Only compact calls with at least this much silence
+    VAD_ENERGY_MARGIN_DB: float = 12.0  # Speech threshold above the noise floor
+    VAD_ABSOLUTE_FLOOR_DB: float = -55.0
+    VAD_MIN_SPEECH_SECONDS: float = 0.25
+    VAD_MIN_SILENCE_SECONDS: float = 0.5
+    VAD_PADDING_SECONDS: float = 0.2
+    
+    # Stereo PBX recordings: diarize from channels instead of pyannote
+    STEREO_DIARIZATION_ENABLED: bool = True
+    STEREO_AGENT_CHANNEL: str = "left"  # "left" or "right"
+    STEREO_CROSSTALK_DB: float = 6.0  # Quieter channel within this margin is echo
+    
+    # Chunked transcription (recordings longer than one window)
+    TRANSCRIPTION_CHUNKING_ENABLED: bool = True
+    TRANSCRIPTION_CHUNK_SECONDS: int = 300
+    TRANSCRIPTION_CHUNK_OVERLAP_SECONDS: float = 1.5
+    TRANSCRIPTION_CHUNK_SEARCH_SECONDS: float = 20.0  # How far before a window end to look for a pause
+    TRANSCRIPTION_MAX_CONCURRENCY: int = 4
+    TRANSCRIPTION_CHUNK_RETRIES: int = 2
     
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None  # e.g. a local stand-in server for tests
+    OPENAI_TIMEOUT_SECONDS: float = 120.0
+    OPENAI_MAX_CONNECTIONS: int = 10  # Keep-alive pool per worker process
+    OPENAI_MAX_RETRIES: int = 4
+    OPENAI_RETRY_BASE_SECONDS: float = 0.5
+    OPENAI_RETRY_MAX_SECONDS: float = 30.0
+    OPENAI_REQUESTS_PER_MINUTE: int = 50  # Shared by all workers through Redis
+    OPENAI_RATE_LIMIT_BURST: int = 10
+    OPENAI_RATE_LIMIT_WAIT_SECONDS: float = 60.0
+    OPENAI_CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures before going straight to fallback
+    OPENAI_CIRCUIT_RESET_SECONDS: float = 60.0
+    OPENAI_UPLOAD_CODEC: str = "opus"  # "opus", "mp3" or "wav" (uncompressed)
+    OPENAI_UPLOAD_BITRATE: str = "24k"
+    OPENAI_UPLOAD_MAX_BYTES: int = 24 * 1024 * 1024  # API limit is 25 MB; keep headroom for the form
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -58,10 +151,17 @@ class Settings(BaseSettings):
     SFTP_USERNAME: Optional[str] = None
     SFTP_PASSWORD: Optional[str] = None
     SFTP_REMOTE_PATH: str = "/incoming"
+    SFTP_POOL_SIZE: int = 4  # Connections, and therefore parallel downloads, per sync
+    SFTP_MAX_FILES_PER_SYNC: int = 500
+    SFTP_MIN_FILE_AGE_SECONDS: int = 60  # Younger files may still be being written
     
     # GDPR Settings
     ENABLE_DATA_REDACTION: bool = True
     REDACTION_LANGUAGE: str = "no"  # Norwegian
+    REDACTION_RULESET_VERSION: str = "2"  # Bump when PII detectors change
+    REDACTION_BATCH_SIZE: int = 500
+    REDACTION_WORKERS: int = 4  # Parallel subtasks per bulk re-redaction batch
+    REDACTION_STALL_SECONDS: int = 3600  # A running bulk re-redaction without progress for this long may be resumed
     
     # Monitoring
     SENTRY_DSN: Optional[str] = None
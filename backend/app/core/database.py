@@ -3,26 +3,170 @@ Database configuration and session management.
 Designer: Abdullah Alawiss
 """
 
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from .config import settings
 
+SLOW_CHECKOUT_SECONDS = 0.1
+
+
+class CheckoutStats:
+    """Running totals of how long pool checkouts waited for a connection, for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.slow_checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if seconds >= SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3)
+            }
+
+
+checkout_stats = CheckoutStats()
+
+
+class _CheckoutTiming:
+    """Pool mixin recording the time each checkout waited (including connecting on overflow)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            checkout_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        checkout_stats.record(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_CheckoutTiming, QueuePool):
+    """QueuePool for the sync engine, with checkout timing."""
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTiming, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool for the async engine, with checkout timing."""
+
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite"
+}
+
+
+def async_database_url(url: str) -> str:
+    """The same database through its asyncio driver (asyncpg; aiosqlite for SQLite)."""
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+def engine_options(url: str, asyncio: bool = False, **overrides) -> Dict[str, Any]:
+    """create_engine() keyword arguments for a database URL, from the DB_POOL_* settings."""
+    options: Dict[str, Any] = {"echo": settings.DEBUG}
+
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    if url in ("sqlite://", "sqlite:///") or ":memory:" in url:
+        # Every connection to :memory: is a new, empty database; share one
+        options["poolclass"] = StaticPool
+    else:
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if asyncio else InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+            pool_pre_ping=settings.DB_POOL_PRE_PING
+        )
+
+    options.update(overrides)
+    return options
+
+
 # Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=StaticPool,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=settings.DEBUG
-)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API endpoints; queries do not block the event loop.
+# Workers and scripts keep using the sync engine above.
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    **engine_options(settings.DATABASE_URL, asyncio=True)
+)
+
+# Objects stay usable after commit: reloading an expired attribute would need
+# an await that attribute access cannot do
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 # Create base class for models
 Base = declarative_base()
 
+
+def _reset_pool_after_fork() -> None:
+    # A forked child (Celery prefork pool, gunicorn --preload) inherits the
+    # parent's pooled sockets; two processes talking over one socket corrupts
+    # both sessions. Give the child an empty pool of its own without closing
+    # the parent's connections.
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    checkout_stats.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def _pool_occupancy(pool) -> Dict[str, Any]:
+    occupancy: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    for name in ("size", "checkedout", "checkedin", "overflow"):
+        if hasattr(pool, name):
+            occupancy[name] = getattr(pool, name)()
+    return occupancy
+
+
+def pool_status() -> Dict[str, Any]:
+    """Pool occupancy of this process (sync and async engines) plus checkout wait statistics."""
+    status = _pool_occupancy(engine.pool)
+    status["async"] = _pool_occupancy(async_engine.pool)
+    status["checkout_wait"] = checkout_stats.snapshot()
+    return status
+
+
 def get_db():
     """Dependency to get database session."""
     db = SessionLocal()
@@ -30,3 +174,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency to get an async database session."""
+    async with AsyncSessionLocal() as db:
+        yield db
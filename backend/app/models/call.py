@@ -3,14 +3,26 @@ Database models for calls and related entities.
 Designer: Abdullah Alawiss
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, JSON, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from ..core.database import Base
 
 class Call(Base):
     """Model for call records."""
     __tablename__ = "calls"
+    __table_args__ = (
+        Index("ix_calls_created_at", "created_at"),  # /calls, /violations: newest first
+        Index("ix_calls_status_created_at", "status", "created_at"),  # /calls?status=, pending feeder
+        Index("ix_calls_duplicate_of_id", "duplicate_of_id"),
+        # Archival sweep: only completed, unarchived calls, oldest processed first
+        Index(
+            "ix_calls_archive_candidates",
+            "processed_at",
+            postgresql_where=text("status = 'completed' AND archived_at IS NULL"),
+            sqlite_where=text("status = 'completed' AND archived_at IS NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, unique=True, index=True, nullable=False)
@@ -20,13 +32,21 @@ class Call(Base):
     duration_seconds = Column(Float, nullable=True)
     
     # Processing status
-    status = Column(String, default="uploaded", index=True)  # uploaded, processing, completed, failed
+    status = Column(String, default="uploaded")  # uploaded, processing, completed, failed
     
     # Audio metadata
     sample_rate = Column(Integer, nullable=True)
     channels = Column(Integer, nullable=True)
     format = Column(String, nullable=True)
     
+    # Duplicate detection (SHA-256 of the uploaded bytes)
+    content_hash = Column(String(64), index=True, nullable=True)
+    duplicate_of_id = Column(Integer, ForeignKey("calls.id"), nullable=True)  # Reuses that call's results
+    
+    # Archival tier (audio transcoded to Opus once processed and old enough)
+    archived_at = Column(DateTime(timezone=True), nullable=True)
+    original_file_size = Column(Integer, nullable=True)  # Size before archival
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -40,6 +60,9 @@ class Call(Base):
 class CallTranscript(Base):
     """Model for call transcripts."""
     __tablename__ = "call_transcripts"
+    __table_args__ = (
+        UniqueConstraint("call_id", name="uq_call_transcripts_call_id"),  # One transcript per call
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     call_id = Column(Integer, ForeignKey("calls.id"), nullable=False)
@@ -54,6 +77,7 @@ class CallTranscript(Base):
     
     # Segmented transcript with timestamps
     segments = Column(JSON, nullable=True)  # Array of segment objects
+    aligned_segments = Column(JSON, nullable=True)  # Segments with the speaker who said them
     
     # Processing info
     whisper_model = Column(String, nullable=True)
@@ -68,6 +92,9 @@ class CallTranscript(Base):
 class Speaker(Base):
     """Model for speaker diarization results."""
     __tablename__ = "speakers"
+    __table_args__ = (
+        Index("ix_speakers_call_id", "call_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     call_id = Column(Integer, ForeignKey("calls.id"), nullable=False)
@@ -89,6 +116,10 @@ class Speaker(Base):
 class CallAnalysis(Base):
     """Model for call analysis results."""
     __tablename__ = "call_analyses"
+    __table_args__ = (
+        UniqueConstraint("call_id", name="uq_call_analyses_call_id"),  # One analysis per call
+        Index("ix_call_analyses_overall_result_call_id", "overall_result", "call_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     call_id = Column(Integer, ForeignKey("calls.id"), nullable=False)
@@ -123,6 +154,11 @@ class CallAnalysis(Base):
 class ProcessingTask(Base):
     """Model for tracking processing tasks."""
     __tablename__ = "processing_tasks"
+    __table_args__ = (
+        Index("ix_processing_tasks_call_id_task_type", "call_id", "task_type"),
+        Index("ix_processing_tasks_created_at", "created_at"),  # /tasks: newest first
+        Index("ix_processing_tasks_status_created_at", "status", "created_at"),  # /tasks?status=
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     call_id = Column(Integer, ForeignKey("calls.id"), nullable=True)
@@ -144,3 +180,48 @@ class ProcessingTask(Base):
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class UploadSession(Base):
+    """Model for resumable chunked uploads. Chunks live on disk until finalization."""
+    __tablename__ = "upload_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(36), unique=True, index=True, nullable=False)
+    
+    # Declared by the client when the session is created
+    original_filename = Column(String, nullable=False)
+    total_size = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    total_chunks = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=True)  # Optional SHA-256 of the whole file
+    force_reprocess = Column(Boolean, default=False)
+    
+    # open, finalizing, completed, expired
+    status = Column(String, default="open", index=True)
+    call_id = Column(Integer, ForeignKey("calls.id"), nullable=True)  # Set exactly once, on finalization
+    error_message = Column(Text, nullable=True)
+    
+    # Timestamps
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+class SftpManifestEntry(Base):
+    """Model for remote files already seen by the SFTP ingestion worker."""
+    __tablename__ = "sftp_manifest"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    remote_path = Column(String, unique=True, index=True, nullable=False)
+    
+    # Remote attributes at fetch time; a change means the file was replaced and is fetched again
+    size = Column(Integer, nullable=False)
+    mtime = Column(Integer, nullable=False)
+    
+    # downloaded, rejected (unsupported or too large; not retried until it changes)
+    status = Column(String, nullable=False)
+    call_id = Column(Integer, ForeignKey("calls.id"), nullable=True)
+    error_message = Column(Text, nullable=True)
+    
+    # Timestamps
+    fetched_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
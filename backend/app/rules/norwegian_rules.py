@@ -19,10 +19,11 @@ class NorwegianRulesEngine:
         Returns comprehensive analysis results.
         """
         
-        # Run all compliance checks
-        bindingstid_result = check_bindingstid_compliance.delay(0, text).get()
-        pris_result = check_price_compliance.delay(0, text).get()
-        press_result = check_pressure_compliance.delay(0, text).get()
+        # Run all compliance checks in-process; they are pure regex work and
+        # waiting on other workers from inside a task can deadlock the pool
+        bindingstid_result = check_bindingstid_compliance(0, text)
+        pris_result = check_price_compliance(0, text)
+        press_result = check_pressure_compliance(0, text)
         
         # Collect all violations
         all_violations = []
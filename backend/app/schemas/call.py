@@ -21,6 +21,8 @@ class CallBase(BaseModel):
 class CallResponse(CallBase):
     """Schema for call response in lists."""
     id: int
+    content_hash: Optional[str] = None
+    duplicate_of_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     processed_at: Optional[datetime] = None
@@ -37,6 +39,7 @@ class TranscriptResponse(BaseModel):
     language: Optional[str] = None
     confidence: Optional[float] = None
     segments: Optional[List[Dict[str, Any]]] = None
+    aligned_segments: Optional[List[Dict[str, Any]]] = None
     whisper_model: Optional[str] = None
     processing_time_seconds: Optional[float] = None
     created_at: datetime
@@ -102,6 +105,28 @@ class UploadResponse(BaseModel):
     status: str
     message: str
 
+class UploadSessionCreate(BaseModel):
+    """Request to start a resumable upload."""
+    original_filename: str
+    total_size: int
+    chunk_size: Optional[int] = None  # Server default when omitted
+    content_hash: Optional[str] = None  # SHA-256 of the whole file, checked on finalization
+    force_reprocess: bool = False
+
+class UploadSessionResponse(BaseModel):
+    """State of a resumable upload."""
+    session_id: str
+    original_filename: str
+    status: str
+    total_size: int
+    chunk_size: int
+    total_chunks: int
+    received_chunks: List[int]
+    missing_chunks: List[int]
+    expires_at: datetime
+    call_id: Optional[int] = None
+    upload: Optional[UploadResponse] = None  # Filled in by finalization
+
 class ProcessingTaskResponse(BaseModel):
     """Response for processing task status."""
     task_id: str
@@ -128,3 +153,5 @@ class StatsResponse(BaseModel):
     total_duration_minutes: float
     avg_processing_time_seconds: float
     top_violations: List[Dict[str, Any]]
+    archived_calls: int = 0
+    archive_bytes_saved: int = 0
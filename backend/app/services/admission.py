@@ -0,0 +1,150 @@
+"""
+Admission control for new processing work, based on broker queue depth.
+Designer: Abdullah Alawiss
+"""
+
+import math
+import threading
+import time
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.call import Call
+
+DEPTH_CACHE_SECONDS = 1.0  # Many uploads in the same second share one LLEN round trip
+
+
+class AdmissionDecision:
+    """Whether new work may be queued now, and if not, when to try again."""
+
+    def __init__(self, admit: bool, queue_depth: int, capacity: int, retry_after: int = 0):
+        self.admit = admit
+        self.queue_depth = queue_depth
+        self.capacity = capacity
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Compares the number of messages waiting in the processing queues with the
+    worker slots available. Above ADMISSION_HIGH_WATERMARK messages per slot
+    new work is refused (or parked); the pending-call feeder refills the
+    queues up to ADMISSION_LOW_WATERMARK per slot, which is the rate the
+    workers actually drain them. When the broker cannot be read, work is
+    admitted: backpressure must not turn into an outage.
+    """
+
+    _lock = threading.Lock()
+    _capacity: Optional[int] = None
+    _capacity_at = 0.0
+    _depth: Optional[int] = None
+    _depth_at = 0.0
+
+    def check(self) -> AdmissionDecision:
+        depth = self.queue_depth()
+        capacity = self.worker_capacity()
+        if depth is None:
+            return AdmissionDecision(True, 0, capacity)
+
+        if depth <= settings.ADMISSION_HIGH_WATERMARK * capacity:
+            return AdmissionDecision(True, depth, capacity)
+
+        # Time for the workers to drain the queue down to the low watermark
+        backlog = depth - settings.ADMISSION_LOW_WATERMARK * capacity
+        retry_after = math.ceil(backlog / capacity * settings.ADMISSION_TASK_SECONDS)
+        return AdmissionDecision(False, depth, capacity, max(1, min(retry_after, 3600)))
+
+    def release_budget(self) -> int:
+        """How many parked calls may be queued now to bring depth back to the low watermark."""
+        depth = self.queue_depth()
+        if depth is None:
+            return 0
+        room = int(settings.ADMISSION_LOW_WATERMARK * self.worker_capacity()) - depth
+        return max(0, room)
+
+    def queue_depth(self) -> Optional[int]:
+        """Messages waiting in ADMISSION_QUEUES, or None when the broker is unreachable."""
+        cls = type(self)
+        now = time.monotonic()
+        if cls._depth is not None and now - cls._depth_at < DEPTH_CACHE_SECONDS:
+            return cls._depth
+
+        try:
+            import redis
+            client = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=2, socket_connect_timeout=2)
+            pipeline = client.pipeline(transaction=False)
+            for queue in settings.ADMISSION_QUEUES:
+                pipeline.llen(queue)
+            depth = int(sum(pipeline.execute()))
+        except Exception as e:
+            print(f"Warning: Could not read broker queue depth ({e}), admitting work")
+            return None
+
+        with cls._lock:
+            cls._depth, cls._depth_at = depth, now
+        return depth
+
+    def worker_capacity(self) -> int:
+        """Total pool slots of the live workers; refreshed every ADMISSION_CAPACITY_TTL_SECONDS."""
+        cls = type(self)
+        now = time.monotonic()
+        if cls._capacity is not None and now - cls._capacity_at < settings.ADMISSION_CAPACITY_TTL_SECONDS:
+            return cls._capacity
+
+        capacity = 0
+        try:
+            from ..core.celery_config import celery_app
+            stats = celery_app.control.inspect(timeout=1.0).stats() or {}
+            capacity = sum(int(s.get("pool", {}).get("max-concurrency", 0)) for s in stats.values())
+        except Exception as e:
+            print(f"Warning: Could not inspect workers ({e})")
+
+        capacity = capacity or settings.ADMISSION_DEFAULT_CAPACITY
+        with cls._lock:
+            cls._capacity, cls._capacity_at = capacity, now
+        return capacity
+
+
+def dispatch_or_park(db: Session, call_ids: List[int], decision: AdmissionDecision = None) -> Optional[str]:
+    """
+    Start processing for newly registered calls, or, in "park" mode while the
+    queues are over the watermark (or calls are already waiting, to keep them
+    in order), leave them as "pending" for the feeder task.
+    Returns the Celery task or group id, or None when the calls were parked.
+    """
+    if not call_ids:
+        return None
+
+    if settings.ADMISSION_MODE == "park":
+        decision = decision or AdmissionController().check()
+        already_waiting = db.query(Call.id).filter(Call.status == "pending").first() is not None
+        if not decision.admit or already_waiting:
+            db.query(Call).filter(Call.id.in_(call_ids)).update(
+                {Call.status: "pending"}, synchronize_session=False
+            )
+            db.commit()
+            return None
+
+    from celery import group
+    from ..workers.audio_tasks import process_audio_file
+
+    if len(call_ids) == 1:
+        return process_audio_file.delay(call_ids[0]).id
+    # One round trip to the broker for the whole batch
+    return group(process_audio_file.si(call_id) for call_id in call_ids).apply_async().id
+
+
+def dispatch_new_calls(call_ids: List[int], decision: AdmissionDecision = None) -> Optional[str]:
+    """
+    dispatch_or_park on a session of its own. The async API runs this in a
+    worker thread: the broker publish, and in park mode the admission check
+    and the pending-call query, would otherwise block the event loop.
+    """
+    db = SessionLocal()
+    try:
+        return dispatch_or_park(db, call_ids, decision)
+    finally:
+        db.close()
@@ -0,0 +1,135 @@
+"""
+Speaker attribution of transcript segments from diarization turns.
+Designer: Abdullah Alawiss
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+Turn = Tuple[float, float, str]
+
+
+class AlignmentService:
+    """
+    Assign each transcript segment the speaker it overlaps most in time.
+    Segments and turns are both swept in start order with a min-heap of
+    active turns keyed by end time, so the whole join is O(n log n) even for
+    chunked transcripts with thousands of segments.
+    """
+
+    def __init__(self, min_overlap_ratio: float = 0.2, max_gap_seconds: float = 1.0):
+        # Another speaker covering at least this share of a segment is reported as overlapping speech
+        self.min_overlap_ratio = min_overlap_ratio
+        # Segments that fall in a diarization gap take the nearest turn within this distance
+        self.max_gap_seconds = max_gap_seconds
+
+    def align(
+        self,
+        transcript_segments: List[Dict[str, Any]],
+        speaker_segments: Dict[str, List[Dict[str, Any]]],
+        speaker_labels: Dict[str, str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Return copies of the transcript segments, in their original order, with
+        speaker, speaker_label, speaker_overlap (share of the segment covered by
+        that speaker) and overlapping_speakers added.
+        """
+        speaker_labels = speaker_labels or {}
+        turns = _sorted_turns(speaker_segments)
+        turn_starts = [turn[0] for turn in turns]
+        latest_ending = _latest_ending_prefix(turns)
+
+        order = sorted(range(len(transcript_segments)), key=lambda i: float(transcript_segments[i]["start"]))
+        aligned: List[Optional[Dict[str, Any]]] = [None] * len(transcript_segments)
+
+        active: List[Tuple[float, int]] = []  # (end, turn index)
+        next_turn = 0
+
+        for index in order:
+            segment = transcript_segments[index]
+            start, end = float(segment["start"]), float(segment["end"])
+
+            # Admit every turn that starts before this segment ends
+            while next_turn < len(turns) and turns[next_turn][0] < end:
+                heapq.heappush(active, (turns[next_turn][1], next_turn))
+                next_turn += 1
+
+            # Segments arrive in start order, so a turn ending before this start is done for good
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+
+            overlaps: Dict[str, float] = {}
+            for _, turn_index in active:
+                turn_start, turn_end, speaker = turns[turn_index]
+                overlap = min(end, turn_end) - max(start, turn_start)
+                if overlap > 0:
+                    overlaps[speaker] = overlaps.get(speaker, 0.0) + overlap
+
+            duration = max(end - start, 1e-6)
+            if overlaps:
+                speaker = max(sorted(overlaps), key=overlaps.get)
+                coverage = min(1.0, overlaps[speaker] / duration)
+                overlapping = sorted(
+                    s for s, seconds in overlaps.items()
+                    if s != speaker and seconds / duration >= self.min_overlap_ratio
+                )
+            else:
+                speaker = self._nearest_speaker(start, end, turns, turn_starts, latest_ending)
+                coverage = 0.0
+                overlapping = []
+
+            result = dict(segment)
+            result["speaker"] = speaker
+            result["speaker_label"] = speaker_labels.get(speaker) if speaker else None
+            result["speaker_overlap"] = round(coverage, 3)
+            result["overlapping_speakers"] = overlapping
+            aligned[index] = result
+
+        return aligned
+
+    def _nearest_speaker(
+        self,
+        start: float,
+        end: float,
+        turns: List[Turn],
+        turn_starts: List[float],
+        latest_ending: List[int]
+    ) -> Optional[str]:
+        """Speaker of the closest turn before or after a segment, within max_gap_seconds."""
+        candidates = []
+
+        before = bisect_right(turn_starts, start) - 1
+        if before >= 0:
+            turn = turns[latest_ending[before]]
+            candidates.append((start - turn[1], turn[2]))
+
+        after = bisect_left(turn_starts, end)
+        if after < len(turns):
+            turn = turns[after]
+            candidates.append((turn[0] - end, turn[2]))
+
+        candidates = [(gap, speaker) for gap, speaker in candidates if 0 <= gap <= self.max_gap_seconds]
+        return min(candidates)[1] if candidates else None
+
+
+def _sorted_turns(speaker_segments: Dict[str, List[Dict[str, Any]]]) -> List[Turn]:
+    turns = [
+        (float(segment["start"]), float(segment["end"]), speaker_id)
+        for speaker_id, segments in speaker_segments.items()
+        for segment in segments
+        if float(segment["end"]) > float(segment["start"])
+    ]
+    turns.sort()
+    return turns
+
+
+def _latest_ending_prefix(turns: List[Turn]) -> List[int]:
+    """For each i, the index of the turn with the latest end among turns[0..i]."""
+    prefix = []
+    best = -1
+    for i, turn in enumerate(turns):
+        if best < 0 or turn[1] > turns[best][1]:
+            best = i
+        prefix.append(best)
+    return prefix
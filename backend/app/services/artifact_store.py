@@ -0,0 +1,200 @@
+"""
+Content-addressed store for intermediate pipeline outputs.
+Designer: Abdullah Alawiss
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import settings
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Eviction frees down to this share of max_bytes, so the next full scan is
+# not due until that headroom has been written again
+EVICT_TARGET_RATIO = 0.9
+
+
+class ArtifactStore:
+    """
+    Local-disk cache of stage outputs (normalized audio, transcription and
+    diarization JSON) keyed by input content hash + stage + parameters.
+    Total size is bounded; the least recently used artifacts are evicted first.
+    Access time is tracked through file mtimes, so the store needs no index.
+    Writes update a running size total; the directory is only scanned when
+    that total crosses max_bytes or has not been re-measured for a while.
+    """
+
+    _evict_lock = threading.Lock()
+    # Running size per store root, shared by the instances in a process:
+    # root -> (bytes, monotonic time of the last scan)
+    _usage: Dict[str, Tuple[int, float]] = {}
+
+    def __init__(self, root: str = None, max_bytes: int = None, rescan_seconds: float = None):
+        self.root = root or settings.ARTIFACT_STORE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else settings.ARTIFACT_STORE_MAX_BYTES
+        self.rescan_seconds = rescan_seconds if rescan_seconds is not None else settings.ARTIFACT_STORE_RESCAN_SECONDS
+        self._usage_key = os.path.abspath(self.root)
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(input_hash: str, stage: str, params: Dict[str, Any]) -> str:
+        """Stable key for one stage run over one input."""
+        payload = json.dumps(
+            {"input": input_hash, "stage": stage, "params": params},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_json(self, key: str) -> Optional[Any]:
+        path = self._path(key, ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        self._touch(path)
+        return value
+
+    def put_json(self, key: str, value: Any) -> None:
+        path = self._path(key, ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, default=str)
+            replaced = _size_or_zero(path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._added(_size_or_zero(path) - replaced)
+
+    def get_file(self, key: str, suffix: str) -> Optional[str]:
+        """Path of a stored file artifact, or None on a miss."""
+        path = self._path(key, suffix)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def link_file(self, key: str, suffix: str, target_path: str) -> bool:
+        """Materialize a stored file at target_path (hard link when possible). False on a miss."""
+        path = self.get_file(key, suffix)
+        if path is None:
+            return False
+        _link_or_copy(path, target_path)
+        return True
+
+    def put_file(self, key: str, suffix: str, source_path: str) -> str:
+        """Store a file artifact; the source file is left in place."""
+        path = self._path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            _link_or_copy(source_path, tmp_path)
+            replaced = _size_or_zero(path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._touch(path)
+        self._added(_size_or_zero(path) - replaced)
+        return path
+
+    def usage_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}{suffix}")
+
+    def _touch(self, path: str) -> None:
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _entries(self):
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def _added(self, size: int) -> None:
+        """Count bytes just written; scan and evict only when the total is over max_bytes or stale."""
+        if self.max_bytes <= 0:
+            return
+
+        with self._evict_lock:
+            usage, scanned_at = self._usage.get(self._usage_key, (None, 0.0))
+            if usage is None or time.monotonic() - scanned_at >= self.rescan_seconds:
+                # Other processes write to the same directory; re-measure now and then
+                self._evict()
+            elif usage + size > self.max_bytes:
+                self._evict()
+            else:
+                self._usage[self._usage_key] = (usage + size, scanned_at)
+
+    def _evict(self) -> None:
+        """
+        Measure the store and, if it is over max_bytes, delete least recently
+        used artifacts until it is down to EVICT_TARGET_RATIO of it.
+        Called with _evict_lock held.
+        """
+        entries = list(self._entries())
+        total = sum(size for _, _, size in entries)
+
+        if total > self.max_bytes:
+            target = int(self.max_bytes * EVICT_TARGET_RATIO)
+            for path, _, size in sorted(entries, key=lambda entry: entry[1]):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= target:
+                    break
+
+        self._usage[self._usage_key] = (total, time.monotonic())
+
+
+def file_sha256(file_path: str) -> str:
+    """Streaming SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _size_or_zero(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _link_or_copy(source_path: str, target_path: str) -> None:
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        # Different filesystem or no hard-link support
+        shutil.copyfile(source_path, target_path)
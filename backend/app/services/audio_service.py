@@ -3,19 +3,69 @@ Audio processing service for validation, normalization, and metadata extraction.
 Designer: Abdullah Alawiss
 """
 
+import math
 import os
+import wave
 import ffmpeg
-from typing import Dict, Any
+import numpy as np
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from ..core.config import settings
+from .pcm_buffer import PCMAudio, SharedPCMBuffer, SAMPLE_WIDTH, _wav_data_chunk
+from .storage import StorageBackend, get_storage
+from .vad_service import VADService
+
+TARGET_SAMPLE_RATE = 16000  # Whisper and pyannote expect 16kHz mono
+
+# Upload codecs for transcription APIs: (container format, encoder, file name)
+UPLOAD_CODECS = {
+    "opus": ("ogg", "libopus", "audio.ogg"),
+    "mp3": ("mp3", "libmp3lame", "audio.mp3")
+}
+ENVELOPE_SAMPLE_RATE = 8000  # Telephony bandwidth is enough for channel energy
 
 class AudioService:
     """Service for audio file processing operations."""
     
-    def validate_and_normalize(self, file_path: str) -> str:
+    def __init__(self, storage: StorageBackend = None):
+        self._storage = storage
+    
+    @property
+    def storage(self) -> StorageBackend:
+        # Resolved lazily: most operations here work on local paths only
+        if self._storage is None:
+            self._storage = get_storage()
+        return self._storage
+    
+    def source_path(self, file_path: str) -> str:
+        """
+        Local path of a stored recording (Call.file_path). With object storage
+        it is fetched once into this worker's read-through cache.
+        """
+        return self.storage.local_path(file_path)
+    
+    def validate_and_normalize(self, file_path: str, normalized_path: str = None) -> str:
         """
         Validate audio file and normalize it for processing.
         Returns path to normalized file.
         """
+        self.validate(file_path)
+        
+        # Normalize audio (convert to standard format)
+        normalized_path = self._normalize_audio(file_path, normalized_path)
+        
+        return normalized_path
+    
+    def validate_and_normalize_to_buffer(self, file_path: str) -> SharedPCMBuffer:
+        """
+        Validate audio file and stream normalized PCM into shared memory.
+        Nothing is written to disk; the caller must release() the buffer.
+        """
+        metadata = self.validate(file_path)
+        return self._normalize_to_buffer(file_path, metadata)
+    
+    def validate(self, file_path: str) -> Dict[str, Any]:
+        """Validate audio file size and duration. Returns the source metadata."""
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Audio file not found: {file_path}")
         
@@ -30,41 +80,187 @@ class AudioService:
         if metadata["duration"] > settings.MAX_AUDIO_DURATION:
             raise ValueError(f"Audio too long: {metadata['duration']} seconds")
         
-        # Normalize audio (convert to standard format)
-        normalized_path = self._normalize_audio(file_path)
-        
-        return normalized_path
+        return metadata
     
     def get_audio_metadata(self, file_path: str) -> Dict[str, Any]:
-        """Extract metadata from audio file."""
+        """
+        Extract metadata from audio file.
+        Results are cached by path and mtime, so each file is probed at most once
+        per process. PCM WAV files are read from their header without ffprobe.
+        """
         try:
-            probe = ffmpeg.probe(file_path)
-            
-            audio_stream = next(
-                (stream for stream in probe['streams'] if stream['codec_type'] == 'audio'),
-                None
+            stat = os.stat(file_path)
+        except OSError as e:
+            raise ValueError(f"Failed to extract metadata: {str(e)}")
+        
+        return dict(_cached_metadata(file_path, stat.st_mtime_ns, stat.st_size))
+    
+    def channel_speaker_segments(
+        self,
+        file_path: str,
+        metadata: Dict[str, Any] = None
+    ) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """
+        Diarize dual-channel telephony audio from per-channel energy envelopes.
+        PBX recordings put the agent and the customer on separate channels, so
+        who spoke when follows from which channel is active.
+        Returns None when the file is not genuinely two-sided (mono or upmixed).
+        """
+        metadata = metadata or self.get_audio_metadata(file_path)
+        if metadata.get("channels") != 2:
+            return None
+        
+        stereo, sample_rate = self._decode_stereo(file_path, metadata)
+        if stereo.shape[0] == 0 or np.array_equal(stereo[:, 0], stereo[:, 1]):
+            return None
+        
+        left = PCMAudio(np.ascontiguousarray(stereo[:, 0]), sample_rate)
+        right = PCMAudio(np.ascontiguousarray(stereo[:, 1]), sample_rate)
+        del stereo
+        
+        vad = VADService()
+        left_mask, left_db = vad.frame_mask(left)
+        right_mask, right_db = vad.frame_mask(right)
+        
+        # Mono upmixed to stereo: both envelopes move together
+        if left_db.std() > 1e-6 and right_db.std() > 1e-6:
+            if np.corrcoef(left_db, right_db)[0, 1] > 0.98:
+                return None
+        
+        # Crosstalk: a channel is only active while it is not an echo of the louder side
+        margin = settings.STEREO_CROSSTALK_DB
+        left_active = left_mask & ~(right_mask & (right_db - left_db > margin))
+        right_active = right_mask & ~(left_mask & (left_db - right_db > margin))
+        
+        if settings.STEREO_AGENT_CHANNEL == "right":
+            agent_active, customer_active = right_active, left_active
+        else:
+            agent_active, customer_active = left_active, right_active
+        
+        speakers = {}
+        # SPEAKER_00 is labelled Agent downstream
+        for speaker_id, active in (("SPEAKER_00", agent_active), ("SPEAKER_01", customer_active)):
+            regions = vad.mask_to_regions(active, left.duration)
+            if regions:
+                speakers[speaker_id] = [
+                    {"start": start, "end": end, "duration": end - start, "confidence": 0.95}
+                    for start, end in regions
+                ]
+        
+        return speakers
+    
+    def _decode_stereo(self, file_path: str, metadata: Dict[str, Any]) -> Tuple[np.ndarray, int]:
+        """Interleaved stereo samples as an (n, 2) int16 array plus their sample rate."""
+        if metadata.get("codec") == "pcm_s16le" and file_path.lower().endswith(".wav"):
+            offset, length, sample_rate, channels, _ = _wav_data_chunk(file_path)
+            frames = length // (SAMPLE_WIDTH * channels)
+            if frames == 0:
+                return np.zeros((0, 2), dtype=np.int16), sample_rate
+            return np.memmap(file_path, dtype="<i2", mode="r", offset=offset, shape=(frames, 2)), sample_rate
+        
+        try:
+            output, _ = (
+                ffmpeg
+                .input(file_path)
+                .output('pipe:', format='s16le', acodec='pcm_s16le', ac=2, ar=ENVELOPE_SAMPLE_RATE)
+                .global_args('-loglevel', 'error')
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+        except ffmpeg.Error as e:
+            raise ValueError(f"Failed to decode stereo audio: {e.stderr.decode(errors='replace')}")
+        
+        return np.frombuffer(output, dtype="<i2").reshape(-1, 2), ENVELOPE_SAMPLE_RATE
+    
+    def encode_for_upload(self, audio: PCMAudio, codec: str = None, bitrate: str = None) -> Tuple[str, bytes]:
+        """
+        Compress PCM for an API upload. Returns (file name, encoded bytes).
+        Samples are piped through ffmpeg; nothing touches the disk. Opus at
+        speech bitrates is roughly 10x smaller than 16kHz PCM WAV.
+        """
+        codec = codec or settings.OPENAI_UPLOAD_CODEC
+        if codec == "wav":
+            return "audio.wav", audio.to_wav_bytes()
+        
+        container, encoder, file_name = UPLOAD_CODECS[codec]
+        samples = np.ascontiguousarray(audio.samples, dtype="<i2")
+        
+        try:
+            encoded, _ = (
+                ffmpeg
+                .input('pipe:', format='s16le', ac=1, ar=audio.sample_rate)
+                .output(
+                    'pipe:',
+                    format=container,
+                    acodec=encoder,
+                    audio_bitrate=bitrate or settings.OPENAI_UPLOAD_BITRATE,
+                    ac=1
+                )
+                .global_args('-loglevel', 'error')
+                .run(input=memoryview(samples).cast('B'), capture_stdout=True, capture_stderr=True)
+            )
+        except ffmpeg.Error as e:
+            raise ValueError(f"Failed to encode audio as {codec}: {e.stderr.decode(errors='replace').strip()}")
+        
+        return file_name, encoded
+    
+    def transcode_for_archive(self, file_path: str, target_path: str) -> Dict[str, Any]:
+        """
+        Transcode a recording to speech-optimized Opus for long-term storage.
+        The source's channels are kept (stereo PBX recordings still diarize
+        from them); the result is checked against the source duration before
+        it is returned.
+        """
+        source = self.get_audio_metadata(file_path)
+        channels = min(source.get("channels") or 1, 2)
+        tmp_path = f"{target_path}.tmp"
+        
+        try:
+            (
+                ffmpeg
+                .input(file_path)
+                .output(
+                    tmp_path,
+                    format='ogg',
+                    acodec='libopus',
+                    audio_bitrate=_scale_bitrate(settings.ARCHIVE_BITRATE, channels),
+                    application='voip',
+                    ac=channels
+                )
+                .global_args('-loglevel', 'error')
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
             )
             
-            if not audio_stream:
-                raise ValueError("No audio stream found")
+            archived = _probe_metadata(tmp_path)
+            tolerance = 0.5 + 0.01 * source["duration"]
+            if abs(archived["duration"] - source["duration"]) > tolerance:
+                raise ValueError(
+                    f"Archived duration {archived['duration']:.1f}s does not match source {source['duration']:.1f}s"
+                )
             
-            return {
-                "duration": float(probe['format']['duration']),
-                "size": int(probe['format']['size']),
-                "sample_rate": int(audio_stream.get('sample_rate', 0)),
-                "channels": int(audio_stream.get('channels', 0)),
-                "codec": audio_stream.get('codec_name'),
-                "bit_rate": int(probe['format'].get('bit_rate', 0))
-            }
+            os.replace(tmp_path, target_path)
+            return dict(archived, size=os.path.getsize(target_path))
             
-        except Exception as e:
-            raise ValueError(f"Failed to extract metadata: {str(e)}")
+        except ffmpeg.Error as e:
+            raise ValueError(f"Failed to archive audio: {e.stderr.decode(errors='replace').strip()}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
     
-    def _normalize_audio(self, file_path: str) -> str:
-        """Normalize audio to standard format for processing."""
+    def normalized_path_for(self, file_path: str) -> str:
+        """Where the normalized WAV for an upload is written."""
         file_dir = os.path.dirname(file_path)
         file_name = os.path.splitext(os.path.basename(file_path))[0]
-        normalized_path = os.path.join(file_dir, f"{file_name}_normalized.wav")
+        return os.path.join(file_dir, f"{file_name}_normalized.wav")
+    
+    def _normalize_audio(self, file_path: str, normalized_path: str = None) -> str:
+        """Normalize audio to standard format for processing."""
+        normalized_path = normalized_path or self.normalized_path_for(file_path)
+        os.makedirs(os.path.dirname(normalized_path) or ".", exist_ok=True)
+        
+        # A leftover file may be hard-linked into the artifact store; never write through it
+        if os.path.exists(normalized_path):
+            os.remove(normalized_path)
         
         try:
             # Convert to 16kHz mono WAV for Whisper
@@ -75,7 +271,7 @@ class AudioService:
                     normalized_path,
                     acodec='pcm_s16le',
                     ac=1,  # mono
-                    ar=16000  # 16kHz sample rate
+                    ar=TARGET_SAMPLE_RATE  # 16kHz sample rate
                 )
                 .overwrite_output()
                 .run(quiet=True)
@@ -84,4 +280,164 @@ class AudioService:
             return normalized_path
             
         except Exception as e:
+            # Don't leave a partial file behind
+            if os.path.exists(normalized_path):
+                os.remove(normalized_path)
             raise ValueError(f"Failed to normalize audio: {str(e)}")
+    
+    def _normalize_to_buffer(self, file_path: str, metadata: Dict[str, Any]) -> SharedPCMBuffer:
+        """
+        Normalize audio straight into a shared-memory buffer.
+        16kHz mono PCM WAV input is copied in without a subprocess; anything else
+        is decoded by ffmpeg and read from its stdout pipe.
+        """
+        # Size the segment from the probed duration, with headroom for resampling
+        expected_samples = int(math.ceil(metadata["duration"] * TARGET_SAMPLE_RATE))
+        capacity = expected_samples + expected_samples // 50 + TARGET_SAMPLE_RATE
+        buffer = SharedPCMBuffer.create(capacity, TARGET_SAMPLE_RATE)
+        
+        try:
+            if (
+                metadata.get("codec") == "pcm_s16le"
+                and metadata.get("channels") == 1
+                and metadata.get("sample_rate") == TARGET_SAMPLE_RATE
+                and file_path.lower().endswith(".wav")
+            ):
+                written = self._copy_pcm_wav(file_path, buffer)
+            else:
+                written = self._stream_ffmpeg_pcm(file_path, buffer)
+            
+            buffer.num_samples = written // SAMPLE_WIDTH
+            return buffer
+            
+        except Exception as e:
+            buffer.release()
+            raise ValueError(f"Failed to normalize audio: {str(e)}")
+    
+    def _copy_pcm_wav(self, file_path: str, buffer: SharedPCMBuffer) -> int:
+        """Read the data chunk of an already-normalized WAV into the buffer."""
+        offset, length, _, _, _ = _wav_data_chunk(file_path)
+        view = buffer.writable_view()
+        if length > len(view):
+            raise ValueError("Audio longer than probed duration")
+        
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            return _read_into(f, view[:length])
+    
+    def _stream_ffmpeg_pcm(self, file_path: str, buffer: SharedPCMBuffer) -> int:
+        """Decode with ffmpeg to raw s16le on stdout and read it into the buffer."""
+        process = (
+            ffmpeg
+            .input(file_path)
+            .output(
+                'pipe:',
+                format='s16le',
+                acodec='pcm_s16le',
+                ac=1,  # mono
+                ar=TARGET_SAMPLE_RATE
+            )
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdout=True, pipe_stderr=True)
+        )
+        
+        try:
+            view = buffer.writable_view()
+            written = _read_into(process.stdout, view)
+            if written == len(view) and process.stdout.read(1):
+                raise ValueError("Audio longer than probed duration")
+            
+            _, stderr = process.communicate()
+            if process.returncode != 0:
+                raise ValueError(stderr.decode(errors="replace").strip() or "ffmpeg failed")
+            
+            return written
+            
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+
+def _scale_bitrate(bitrate: str, channels: int) -> str:
+    """Per-channel bitrate such as "32k" scaled to the total for the channel count."""
+    if bitrate.endswith("k"):
+        return f"{int(bitrate[:-1]) * channels}k"
+    return str(int(bitrate) * channels)
+
+
+def _read_into(stream, view: memoryview) -> int:
+    """Fill view from a binary stream until EOF or the view is full. Returns bytes read."""
+    written = 0
+    while written < len(view):
+        count = stream.readinto(view[written:])
+        if not count:
+            break
+        written += count
+    return written
+
+
+@lru_cache(maxsize=256)
+def _cached_metadata(file_path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """Probe a file once per (path, mtime, size); callers receive copies."""
+    metadata = _read_wav_header(file_path, size)
+    if metadata is None:
+        metadata = _probe_metadata(file_path)
+    return metadata
+
+def _read_wav_header(file_path: str, size: int) -> Optional[Dict[str, Any]]:
+    """Read metadata straight from a PCM WAV header. Returns None for anything else."""
+    if not file_path.lower().endswith(".wav"):
+        return None
+    
+    try:
+        with wave.open(file_path, "rb") as wav:
+            sample_rate = wav.getframerate()
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            frames = wav.getnframes()
+    except (wave.Error, EOFError, OSError):
+        # Not plain PCM (e.g. float or compressed WAV) - let ffprobe handle it
+        return None
+    
+    if not sample_rate:
+        return None
+    
+    bit_depth = sample_width * 8
+    return {
+        "duration": frames / float(sample_rate),
+        "size": size,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "codec": f"pcm_s{bit_depth}le" if bit_depth > 8 else "pcm_u8",
+        "bit_rate": sample_rate * channels * bit_depth,
+        "format_name": "wav",
+        "bit_depth": bit_depth
+    }
+
+def _probe_metadata(file_path: str) -> Dict[str, Any]:
+    """Extract metadata with ffprobe."""
+    try:
+        probe = ffmpeg.probe(file_path)
+        
+        audio_stream = next(
+            (stream for stream in probe['streams'] if stream['codec_type'] == 'audio'),
+            None
+        )
+        
+        if not audio_stream:
+            raise ValueError("No audio stream found")
+        
+        return {
+            "duration": float(probe['format']['duration']),
+            "size": int(probe['format']['size']),
+            "sample_rate": int(audio_stream.get('sample_rate', 0)),
+            "channels": int(audio_stream.get('channels', 0)),
+            "codec": audio_stream.get('codec_name'),
+            "bit_rate": int(probe['format'].get('bit_rate', 0)),
+            "format_name": probe['format'].get('format_name'),
+            "bit_depth": audio_stream.get('bits_per_sample')
+        }
+        
+    except Exception as e:
+        raise ValueError(f"Failed to extract metadata: {str(e)}")
@@ -0,0 +1,231 @@
+"""
+Chunked transcription: split long audio at silence, transcribe chunks in
+parallel and stitch the segments back onto one timeline.
+Designer: Abdullah Alawiss
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from ..core.config import settings
+from .pcm_buffer import PCMAudio
+from .vad_service import frame_energy
+
+FRAME_SECONDS = 0.03  # Energy frame used to locate pauses
+
+TranscriptionBackend = Callable[[PCMAudio], Dict[str, Any]]
+
+
+class AudioChunk:
+    """One transcription window. The chunk owns [own_start, own_end) of the timeline."""
+
+    def __init__(self, index: int, start: float, end: float, own_start: float, own_end: float):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.own_start = own_start
+        self.own_end = own_end
+
+
+class ChunkedTranscriber:
+    """
+    Transcribe long recordings as overlapping chunks cut at silence.
+    The backend receives a PCMAudio view per chunk and returns the usual
+    transcription dict ({"text", "segments", ...}) with chunk-local timestamps.
+    """
+
+    def __init__(
+        self,
+        backend: TranscriptionBackend,
+        fallback: Optional[TranscriptionBackend] = None,
+        window_seconds: float = None,
+        overlap_seconds: float = None,
+        search_seconds: float = None,
+        max_workers: int = None,
+        max_retries: int = None,
+        retry_backoff_seconds: float = 1.0
+    ):
+        self.backend = backend
+        self.fallback = fallback
+        self.window_seconds = window_seconds or settings.TRANSCRIPTION_CHUNK_SECONDS
+        self.overlap_seconds = settings.TRANSCRIPTION_CHUNK_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds
+        self.search_seconds = settings.TRANSCRIPTION_CHUNK_SEARCH_SECONDS if search_seconds is None else search_seconds
+        self.max_workers = max_workers or settings.TRANSCRIPTION_MAX_CONCURRENCY
+        self.max_retries = settings.TRANSCRIPTION_CHUNK_RETRIES if max_retries is None else max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    def transcribe(self, audio: PCMAudio) -> Dict[str, Any]:
+        """Transcribe the whole recording and return one stitched result."""
+        chunks = self.plan_chunks(audio)
+
+        if len(chunks) == 1:
+            result = self._transcribe_chunk(audio, chunks[0])
+            result["chunks"] = 1
+            result["chunk_models"] = [result.get("model", "unknown")]
+            result["degraded"] = bool(result.pop("fallback", False))
+            return result
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            results = list(pool.map(lambda chunk: self._transcribe_chunk(audio, chunk), chunks))
+
+        return self.stitch(chunks, results)
+
+    def plan_chunks(self, audio: PCMAudio) -> List[AudioChunk]:
+        """Cut the timeline into windows, moving each cut to the quietest frame before it."""
+        duration = audio.duration
+        if duration <= self.window_seconds:
+            return [AudioChunk(0, 0.0, duration, 0.0, duration)]
+
+        energy = frame_energy(audio, FRAME_SECONDS)
+        cuts = [0.0]
+
+        while duration - cuts[-1] > self.window_seconds:
+            target = cuts[-1] + self.window_seconds
+            search_start = max(cuts[-1] + self.window_seconds / 2, target - self.search_seconds)
+            first = int(search_start / FRAME_SECONDS)
+            last = min(int(target / FRAME_SECONDS), len(energy))
+
+            if last > first:
+                quietest = first + int(np.argmin(energy[first:last]))
+                cuts.append((quietest + 0.5) * FRAME_SECONDS)
+            else:
+                cuts.append(target)
+
+        cuts.append(duration)
+
+        return [
+            AudioChunk(
+                index=i,
+                start=max(0.0, cuts[i] - self.overlap_seconds),
+                end=min(duration, cuts[i + 1] + self.overlap_seconds),
+                own_start=cuts[i],
+                own_end=cuts[i + 1]
+            )
+            for i in range(len(cuts) - 1)
+        ]
+
+    def _transcribe_chunk(self, audio: PCMAudio, chunk: AudioChunk) -> Dict[str, Any]:
+        """Transcribe one chunk, retrying only that chunk on failure."""
+        chunk_audio = audio.slice(chunk.start, chunk.end)
+        attempt = 0
+
+        while True:
+            try:
+                return self.backend(chunk_audio)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    if self.fallback is None:
+                        raise
+                    print(f"Chunk {chunk.index} failed after {attempt + 1} attempts: {e}, using fallback")
+                    return dict(self.fallback(chunk_audio), fallback=True)
+
+                delay = self.retry_backoff_seconds * (2 ** attempt)
+                print(f"Chunk {chunk.index} failed: {e}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def stitch(self, chunks: List[AudioChunk], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Shift chunk segments to global time and drop duplicates from the overlaps."""
+        segments: List[Dict[str, Any]] = []
+        texts: List[str] = []
+
+        for chunk, result in zip(chunks, results):
+            chunk_segments = [segment_dict(s) for s in result.get("segments") or []]
+
+            if not chunk_segments:
+                texts.append(result.get("text", ""))
+                continue
+
+            for segment in chunk_segments:
+                segment["start"] = float(segment["start"]) + chunk.start
+                segment["end"] = float(segment["end"]) + chunk.start
+
+                # Overlap regions are transcribed twice; keep the copy from the
+                # chunk that owns the segment's midpoint
+                midpoint = (segment["start"] + segment["end"]) / 2
+                is_last = chunk.index == len(chunks) - 1
+                if midpoint < chunk.own_start or (midpoint >= chunk.own_end and not is_last):
+                    continue
+
+                if segments and _is_duplicate(segments[-1], segment):
+                    continue
+
+                segment["id"] = len(segments)
+                segments.append(segment)
+
+        if segments:
+            text = " ".join(s.get("text", "").strip() for s in segments).strip()
+        else:
+            text = ""
+            for chunk_text in texts:
+                text = merge_overlapping_text(text, chunk_text)
+
+        confidences = [r.get("confidence") for r in results if r.get("confidence") is not None]
+
+        # A chunk that fell back was transcribed by another model; name them all
+        chunk_models = [r.get("model", "unknown") for r in results]
+        models = list(dict.fromkeys(chunk_models))
+
+        return {
+            "text": text,
+            "language": next((r.get("language") for r in results if r.get("language")), "no"),
+            "confidence": sum(confidences) / len(confidences) if confidences else 0.0,
+            "segments": segments,
+            "model": "+".join(models) if models else "unknown",
+            "chunk_models": chunk_models,
+            "degraded": len(models) > 1 or any(r.get("fallback") for r in results),
+            "chunks": len(chunks)
+        }
+
+
+def merge_overlapping_text(previous: str, following: str, max_words: int = 30) -> str:
+    """Join two chunk texts, dropping words the second repeats from the end of the first."""
+    previous = previous.strip()
+    following = following.strip()
+    if not previous:
+        return following
+    if not following:
+        return previous
+
+    previous_words = previous.split()
+    following_words = following.split()
+    limit = min(max_words, len(previous_words), len(following_words))
+
+    for size in range(limit, 0, -1):
+        tail = [_normalize_word(w) for w in previous_words[-size:]]
+        head = [_normalize_word(w) for w in following_words[:size]]
+        if tail == head:
+            following_words = following_words[size:]
+            break
+
+    return " ".join(previous_words + following_words)
+
+
+def segment_dict(segment: Any) -> Dict[str, Any]:
+    """Segments come back as dicts (local Whisper) or pydantic objects (OpenAI API)."""
+    if isinstance(segment, dict):
+        return dict(segment)
+    if hasattr(segment, "model_dump"):
+        return segment.model_dump()
+    return dict(vars(segment))
+
+
+def _is_duplicate(previous: Dict[str, Any], segment: Dict[str, Any]) -> bool:
+    """Adjacent segments with overlapping times and the same text are one utterance."""
+    if segment["start"] >= previous["end"]:
+        return False
+    previous_text = _normalize_text(previous.get("text", ""))
+    text = _normalize_text(segment.get("text", ""))
+    return bool(text) and (text in previous_text or previous_text in text)
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(_normalize_word(w) for w in text.split())
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w]", "", word.lower())
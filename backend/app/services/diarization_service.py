@@ -3,7 +3,12 @@ Speaker diarization service using pyannote.audio.
 Designer: Abdullah Alawiss
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Union
+from ..core.config import settings
+from .audio_service import AudioService
+from .model_registry import MockDiarizationPipeline, model_registry, diarization_model_key
+from .pcm_buffer import PCMAudio
+from .segments import SegmentArray
 
 # Try to import optional dependencies
 try:
@@ -20,38 +25,52 @@ except ImportError:
 class DiarizationService:
     """Service for speaker diarization using pyannote.audio."""
     
-    def __init__(self):
-        """Initialize the diarization pipeline."""
-        if not PYANNOTE_AVAILABLE:
+    def __init__(self, pipeline: Any = None):
+        """Initialize the diarization pipeline, shared per process through the model registry."""
+        # Set whenever a result came from the mock fallback rather than the pipeline
+        self.used_mock = False
+        
+        if pipeline is not None:
+            self.pipeline = pipeline
+            return
+        
+        if not PYANNOTE_AVAILABLE and settings.DIARIZATION_MODEL != "mock":
             print("Warning: pyannote.audio not available, using mock implementation")
             self.pipeline = None
             return
             
         try:
-            # Initialize pyannote pipeline
-            self.pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization")
-            
-            # Set device (GPU if available)
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            self.pipeline = self.pipeline.to(device)
+            # Loaded once per worker process, then reused
+            self.pipeline = model_registry.get(diarization_model_key())
             
         except Exception as e:
             # Fallback to mock implementation for development
             print(f"Warning: Could not initialize pyannote pipeline: {e}")
             self.pipeline = None
     
-    def diarize(self, audio_path: str) -> Dict[str, List[Dict[str, Any]]]:
+    def diarize(self, audio: Union[str, PCMAudio], metadata: Dict[str, Any] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
-        Perform speaker diarization on audio file.
+        Perform speaker diarization on an audio file path or in-memory PCM.
         Returns dictionary mapping speaker IDs to their speaking segments.
         """
         if self.pipeline is None:
             # Mock implementation for development/testing
-            return self._mock_diarization(audio_path)
+            return self._mock_diarization(audio, metadata)
+        
+        if isinstance(self.pipeline, MockDiarizationPipeline):
+            # DIARIZATION_MODEL="mock": the registry's stand-in, not a real result
+            self.used_mock = True
         
         try:
             # Apply diarization pipeline
-            diarization = self.pipeline(audio_path)
+            if isinstance(audio, PCMAudio):
+                # pyannote takes in-memory audio as a (channel, time) waveform
+                waveform = audio.as_float32()[None, :]
+                if torch is not None:
+                    waveform = torch.from_numpy(waveform)
+                diarization = self.pipeline({"waveform": waveform, "sample_rate": audio.sample_rate})
+            else:
+                diarization = self.pipeline(audio)
             
             # Convert to our format
             speakers = {}
@@ -72,19 +91,24 @@ class DiarizationService:
         except Exception as e:
             # Fallback to mock on error
             print(f"Diarization failed: {e}, using mock data")
-            return self._mock_diarization(audio_path)
+            return self._mock_diarization(audio, metadata)
     
-    def _mock_diarization(self, audio_path: str) -> Dict[str, List[Dict[str, Any]]]:
+    def _mock_diarization(self, audio: Union[str, PCMAudio], metadata: Dict[str, Any] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
         Mock diarization for development/testing.
         Creates fake speaker segments.
         """
-        # Get audio duration (simplified)
+        self.used_mock = True
+        
+        # Get audio duration, reusing upstream metadata or the cached probe
         try:
-            import ffmpeg
-            probe = ffmpeg.probe(audio_path)
-            duration = float(probe['format']['duration'])
-        except:
+            if metadata is None:
+                if isinstance(audio, PCMAudio):
+                    metadata = audio.metadata()
+                else:
+                    metadata = AudioService().get_audio_metadata(audio)
+            duration = float(metadata["duration"])
+        except Exception:
             duration = 120.0  # Default 2 minutes
         
         # Create mock segments for 2 speakers
@@ -117,42 +141,15 @@ class DiarizationService:
         return speakers
     
     def merge_overlapping_segments(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Merge overlapping or very close segments for the same speaker."""
+        """
+        Merge overlapping or very close (within 0.5 seconds) segments for the same speaker.
+        Returns new segment dicts; the input list is left untouched.
+        """
         if not segments:
             return segments
         
-        # Sort segments by start time
-        sorted_segments = sorted(segments, key=lambda x: x["start"])
-        merged = [sorted_segments[0]]
-        
-        for current in sorted_segments[1:]:
-            last_merged = merged[-1]
-            
-            # If segments overlap or are very close (within 0.5 seconds)
-            if current["start"] <= last_merged["end"] + 0.5:
-                # Merge segments
-                last_merged["end"] = max(last_merged["end"], current["end"])
-                last_merged["duration"] = last_merged["end"] - last_merged["start"]
-                # Average confidence
-                last_merged["confidence"] = (last_merged["confidence"] + current["confidence"]) / 2
-            else:
-                merged.append(current)
-        
-        return merged
+        return SegmentArray.from_dicts(segments).merge(max_gap=0.5).to_dicts()
     
     def get_speaker_statistics(self, speakers: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
         """Calculate statistics for each speaker."""
-        stats = {}
-        
-        for speaker_id, segments in speakers.items():
-            total_time = sum(segment["duration"] for segment in segments)
-            avg_confidence = sum(segment["confidence"] for segment in segments) / len(segments)
-            
-            stats[speaker_id] = {
-                "total_speaking_time": total_time,
-                "segment_count": len(segments),
-                "average_confidence": avg_confidence,
-                "average_segment_length": total_time / len(segments) if segments else 0
-            }
-        
-        return stats
+        return SegmentArray.from_speaker_dict(speakers).statistics()
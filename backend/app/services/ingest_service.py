@@ -0,0 +1,116 @@
+"""
+Bulk registration of stored uploads as calls.
+Designer: Abdullah Alawiss
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..models.call import Call
+from .upload_service import StoredUpload
+
+
+def insert_uploads(
+    db: Session,
+    uploads: Sequence[Tuple[StoredUpload, str]],
+    force_reprocess: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Create the Call rows for many (stored upload, original filename) pairs in
+    one INSERT ... RETURNING for new recordings and one for duplicates. Content
+    already known, either in the database or earlier in the same batch, is
+    linked as a duplicate.
+
+    Returns one dict per input, in order: call_id, status ("uploaded" or
+    "duplicate") and duplicate_of_id. Calls with status "uploaded" still need
+    processing dispatched. Only database work happens here: the caller
+    commits, then removes the files listed by duplicate_files (or every
+    stored file when the transaction fails).
+    """
+    if not uploads:
+        return []
+
+    originals: Dict[str, Tuple[int, str]] = {}
+    if not force_reprocess:
+        hashes = {stored.content_hash for stored, _ in uploads}
+        rows = db.query(Call.id, Call.file_path, Call.content_hash).filter(
+            Call.content_hash.in_(hashes),
+            Call.duplicate_of_id.is_(None),
+            Call.status != "failed"
+        ).order_by(Call.id).all()
+        for call_id, file_path, content_hash in rows:
+            originals.setdefault(content_hash, (call_id, file_path))
+
+    new_rows, new_positions = [], []
+    duplicate_positions = []
+    first_in_batch: Dict[str, int] = {}
+
+    for position, (stored, original_filename) in enumerate(uploads):
+        if not force_reprocess and (
+            stored.content_hash in originals or stored.content_hash in first_in_batch
+        ):
+            duplicate_positions.append(position)
+            continue
+
+        first_in_batch.setdefault(stored.content_hash, position)
+        new_positions.append(position)
+        new_rows.append(_call_row(stored, original_filename, stored.file_path, "uploaded", None))
+
+    results: List[Dict[str, Any]] = [None] * len(uploads)
+
+    if new_rows:
+        ids = db.execute(
+            insert(Call).returning(Call.id, sort_by_parameter_order=True),
+            new_rows
+        ).scalars().all()
+        for position, call_id in zip(new_positions, ids):
+            stored = uploads[position][0]
+            results[position] = {"call_id": call_id, "status": "uploaded", "duplicate_of_id": None}
+            originals.setdefault(stored.content_hash, (call_id, stored.file_path))
+
+    if duplicate_positions:
+        duplicate_rows = []
+        for position in duplicate_positions:
+            stored, original_filename = uploads[position]
+            original_id, original_path = originals[stored.content_hash]
+            duplicate_rows.append(_call_row(stored, original_filename, original_path, "duplicate", original_id))
+
+        ids = db.execute(
+            insert(Call).returning(Call.id, sort_by_parameter_order=True),
+            duplicate_rows
+        ).scalars().all()
+        for position, call_id, row in zip(duplicate_positions, ids, duplicate_rows):
+            results[position] = {
+                "call_id": call_id,
+                "status": "duplicate",
+                "duplicate_of_id": row["duplicate_of_id"]
+            }
+
+    return results
+
+
+def duplicate_files(uploads: Sequence[Tuple[StoredUpload, str]], results: List[Dict[str, Any]]) -> List[str]:
+    """Storage keys of the uploads insert_uploads linked as duplicates."""
+    return [stored.file_path for (stored, _), result in zip(uploads, results) if result["status"] == "duplicate"]
+
+
+def _call_row(
+    stored: StoredUpload,
+    original_filename: str,
+    file_path: str,
+    status: str,
+    duplicate_of_id: int
+) -> Dict[str, Any]:
+    # executemany needs the same keys on every row
+    return {
+        "filename": stored.filename,
+        "original_filename": original_filename,
+        "file_path": file_path,
+        "file_size": stored.file_size,
+        "format": stored.audio_format,
+        "status": status,
+        "content_hash": stored.content_hash,
+        "duplicate_of_id": duplicate_of_id
+    }
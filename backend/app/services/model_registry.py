@@ -0,0 +1,215 @@
+"""
+Per-process registry of loaded ML models (Whisper, pyannote).
+Designer: Abdullah Alawiss
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+from ..core.config import settings
+
+WARMUP_SECONDS = 1.0
+
+
+class ModelRegistry:
+    """
+    Loads each model once per process and hands out the shared instance.
+    Models are keyed by "<family>:<name>", e.g. "whisper:base" or
+    "pyannote:pyannote/speaker-diarization".
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[str], Any]] = {}
+        self._warmups: Dict[str, Callable[[Any], None]] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, family: str, loader: Callable[[str], Any], warmup: Optional[Callable[[Any], None]] = None) -> None:
+        """Register the loader (and optional warmup) for a model family."""
+        self._factories[family] = loader
+        if warmup is not None:
+            self._warmups[family] = warmup
+
+    def get(self, key: str) -> Any:
+        """Return the loaded model, loading it on first use."""
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self._load(key)
+            return self._models[key]
+
+    def preload(self, keys: Iterable[str], warmup: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Load (and optionally warm up) models ahead of the first task."""
+        for key in keys:
+            try:
+                model = self.get(key)
+                if warmup:
+                    self.warmup(key, model)
+            except Exception as e:
+                print(f"Warning: could not preload model {key}: {e}")
+                self._stats[key] = {"loaded": False, "error": str(e)}
+        return self.stats()
+
+    def warmup(self, key: str, model: Any = None) -> None:
+        """Run one tiny inference so lazy initialisation happens before real work."""
+        family, _ = _split_key(key)
+        warmup = self._warmups.get(family)
+        if warmup is None:
+            return
+
+        model = model if model is not None else self.get(key)
+        started = time.perf_counter()
+        warmup(model)
+        self._stats[key]["warmup_seconds"] = time.perf_counter() - started
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self._models
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Load telemetry per model plus the current resident memory of the process."""
+        return {
+            "pid": os.getpid(),
+            "resident_memory_bytes": resident_memory_bytes(),
+            "models": {key: dict(value) for key, value in self._stats.items()}
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+
+    def _load(self, key: str) -> Any:
+        family, name = _split_key(key)
+        loader = self._factories.get(family)
+        if loader is None:
+            raise KeyError(f"No loader registered for model family '{family}'")
+
+        rss_before = resident_memory_bytes()
+        started = time.perf_counter()
+        model = loader(name)
+        load_seconds = time.perf_counter() - started
+        rss_after = resident_memory_bytes()
+
+        self._stats[key] = {
+            "loaded": True,
+            "load_seconds": load_seconds,
+            "resident_memory_delta_bytes": max(0, rss_after - rss_before),
+            "loaded_at": time.time()
+        }
+        print(f"Loaded model {key} in {load_seconds:.2f}s (+{(rss_after - rss_before) / 2**20:.1f} MiB RSS)")
+        return model
+
+
+class MockWhisperModel:
+    """CPU-only stand-in with Whisper's transcribe() interface, for tests and development."""
+
+    def transcribe(self, audio: Any, **kwargs) -> Dict[str, Any]:
+        duration = len(audio) / 16000.0 if isinstance(audio, np.ndarray) else 0.0
+        text = "Hei, takk for at du ringte kundeservice."
+        return {
+            "text": text,
+            "language": kwargs.get("language") or "no",
+            "segments": [{"id": 0, "start": 0.0, "end": min(duration, 5.0) or 5.0, "text": text}]
+        }
+
+
+class MockDiarizationPipeline:
+    """CPU-only stand-in for pyannote's Pipeline: alternates two speakers every five seconds."""
+
+    class _Turn:
+        def __init__(self, start: float, end: float):
+            self.start = start
+            self.end = end
+
+    class _Annotation:
+        def __init__(self, duration: float):
+            self.duration = duration
+
+        def itertracks(self, yield_label: bool = False):
+            start, index = 0.0, 0
+            while start < self.duration:
+                end = min(start + 5.0, self.duration)
+                yield MockDiarizationPipeline._Turn(start, end), None, f"SPEAKER_{index % 2:02d}"
+                start, index = end, index + 1
+
+    def __call__(self, audio: Any) -> "_Annotation":
+        duration = 0.0
+        if isinstance(audio, dict) and "waveform" in audio:
+            duration = audio["waveform"].shape[-1] / float(audio["sample_rate"])
+        return self._Annotation(duration)
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux; best effort elsewhere
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _split_key(key: str):
+    family, _, name = key.partition(":")
+    return family, name
+
+
+def _load_whisper(name: str) -> Any:
+    if name == "mock":
+        return MockWhisperModel()
+
+    import whisper
+    return whisper.load_model(name)
+
+
+def _warmup_whisper(model: Any) -> None:
+    silence = np.zeros(int(16000 * WARMUP_SECONDS), dtype=np.float32)
+    model.transcribe(silence, language="no", verbose=None)
+
+
+def _load_pyannote(name: str) -> Any:
+    if name == "mock":
+        return MockDiarizationPipeline()
+
+    import torch
+    from pyannote.audio import Pipeline
+
+    pipeline = Pipeline.from_pretrained(name)
+    if pipeline is None:
+        raise RuntimeError(f"Could not load diarization pipeline '{name}'")
+
+    # Set device (GPU if available)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    return pipeline.to(device)
+
+
+def _warmup_pyannote(pipeline: Any) -> None:
+    if isinstance(pipeline, MockDiarizationPipeline):
+        pipeline({"waveform": np.zeros((1, 16000), dtype=np.float32), "sample_rate": 16000})
+        return
+
+    import torch
+    pipeline({"waveform": torch.zeros(1, int(16000 * WARMUP_SECONDS)), "sample_rate": 16000})
+
+
+def whisper_model_key() -> str:
+    return f"whisper:{settings.LOCAL_WHISPER_MODEL}"
+
+
+def diarization_model_key() -> str:
+    return f"pyannote:{settings.DIARIZATION_MODEL}"
+
+
+# Global registry instance (one per worker process)
+model_registry = ModelRegistry()
+model_registry.register("whisper", _load_whisper, _warmup_whisper)
+model_registry.register("pyannote", _load_pyannote, _warmup_pyannote)
@@ -0,0 +1,278 @@
+"""
+Shared OpenAI transcription client: pooled connections, cross-worker rate
+limiting, jittered retries and a circuit breaker.
+Designer: Abdullah Alawiss
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import httpx
+import openai
+
+from ..core.config import settings
+
+# Atomically refill the bucket from elapsed server time and take tokens.
+# Returns the seconds to wait before the request may be sent (0 when it was taken).
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+REDIS_RETRY_SECONDS = 30.0  # How long to stay on the per-process bucket after a Redis error
+
+# Transient failures worth another attempt; everything else is the request's fault
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,  # Includes APITimeoutError
+    openai.InternalServerError
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class RateLimitTimeout(Exception):
+    """Raised when no rate-limit token became available within the wait budget."""
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every worker through Redis, so the fleet as a whole
+    stays under the API's requests-per-minute limit. When Redis cannot be
+    reached the bucket degrades to a per-process one rather than blocking work.
+    """
+
+    def __init__(self, key: str, rate_per_second: float, capacity: float, redis_url: str = None):
+        self.key = key
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.redis_url = redis_url or settings.REDIS_URL
+        self._script = None
+        self._redis_retry_at = 0.0
+        self._local_tokens = capacity
+        self._local_ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0, max_wait: float = None) -> float:
+        """Block until tokens are available. Returns the seconds spent waiting."""
+        max_wait = settings.OPENAI_RATE_LIMIT_WAIT_SECONDS if max_wait is None else max_wait
+        waited = 0.0
+
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                return waited
+            if waited + wait > max_wait:
+                raise RateLimitTimeout(f"No rate-limit token for '{self.key}' within {max_wait:.0f}s")
+            time.sleep(wait)
+            waited += wait
+
+    def _take(self, tokens: float) -> float:
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                script = self._redis_script()
+                return float(script(keys=[self.key], args=[self.rate, self.capacity, tokens]))
+            except Exception as e:
+                print(f"Warning: Redis token bucket unavailable ({e}), limiting per process")
+                self._script = None
+                self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+        return self._take_local(tokens)
+
+    def _redis_script(self):
+        if self._script is None:
+            import redis
+            client = redis.Redis.from_url(self.redis_url, socket_timeout=2, socket_connect_timeout=2)
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    def _take_local(self, tokens: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._local_tokens = min(self.capacity, self._local_tokens + (now - self._local_ts) * self.rate)
+            self._local_ts = now
+            if self._local_tokens >= tokens:
+                self._local_tokens -= tokens
+                return 0.0
+            return (tokens - self._local_tokens) / self.rate
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. After failure_threshold consecutive failures it opens
+    and rejects calls for reset_seconds, then lets a single trial call through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = None, reset_seconds: float = None):
+        self.failure_threshold = failure_threshold or settings.OPENAI_CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = settings.OPENAI_CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._trial_in_flight):
+                raise CircuitOpenError("OpenAI API circuit is open; using fallback")
+            if state == "half_open":
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                print(f"OpenAI API circuit open after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Free the half-open trial slot after a call that says nothing about the API's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class OpenAITranscriptionClient:
+    """
+    One OpenAI client per worker process over a keep-alive connection pool.
+    The SDK's own retries are disabled; every attempt here first takes a
+    rate-limit token and reports its outcome to the circuit breaker.
+    """
+
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        bucket: TokenBucket = None,
+        breaker: CircuitBreaker = None,
+        max_retries: int = None
+    ):
+        self.http_client = httpx.Client(
+            timeout=httpx.Timeout(settings.OPENAI_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+                keepalive_expiry=60.0
+            )
+        )
+        self.client = openai.OpenAI(
+            api_key=api_key or settings.OPENAI_API_KEY,
+            base_url=base_url or settings.OPENAI_BASE_URL,
+            http_client=self.http_client,
+            max_retries=0
+        )
+        self.bucket = bucket or TokenBucket(
+            key="openai:transcriptions",
+            rate_per_second=settings.OPENAI_REQUESTS_PER_MINUTE / 60.0,
+            capacity=settings.OPENAI_RATE_LIMIT_BURST
+        )
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = settings.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+
+    def transcribe(self, file: Any, **params) -> Any:
+        """audio.transcriptions.create with rate limiting, retries and the breaker."""
+        def request():
+            if hasattr(file, "seek"):
+                file.seek(0)  # Retries resend the upload from the start
+            return self.client.audio.transcriptions.create(file=file, **params)
+
+        return self.call(request)
+
+    def call(self, request: Callable[[], Any]) -> Any:
+        attempt = 0
+
+        while True:
+            # Token first: a rate-limit timeout must not hold the half-open trial slot
+            self.bucket.acquire()
+            self.breaker.before_call()
+
+            try:
+                response = request()
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or self.breaker.state == "open":
+                    raise
+                delay = _retry_delay(e, attempt)
+                print(f"OpenAI request failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            except Exception:
+                # The request's own fault (bad input, auth, ...): neither closes nor re-opens
+                self.breaker.release_trial()
+                raise
+
+            self.breaker.record_success()
+            return response
+
+    def close(self) -> None:
+        self.http_client.close()
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff; a server-sent Retry-After wins when present."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), settings.OPENAI_RETRY_MAX_SECONDS)
+        except ValueError:
+            pass
+
+    ceiling = min(settings.OPENAI_RETRY_MAX_SECONDS, settings.OPENAI_RETRY_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+_client: Optional[OpenAITranscriptionClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_transcription_client() -> OpenAITranscriptionClient:
+    """Process-wide client; a forked worker builds its own rather than sharing sockets."""
+    global _client, _client_pid
+
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = OpenAITranscriptionClient()
+            _client_pid = os.getpid()
+        return _client
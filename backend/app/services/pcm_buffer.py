@@ -0,0 +1,247 @@
+"""
+In-memory PCM audio shared between pipeline stages.
+Designer: Abdullah Alawiss
+"""
+
+import io
+import struct
+import wave
+from contextlib import contextmanager
+from multiprocessing import shared_memory, resource_tracker
+from typing import Dict, Any, Iterator, Optional, Union
+
+import numpy as np
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+class PCMAudio:
+    """Mono 16-bit PCM samples. Slicing returns views, never copies."""
+
+    def __init__(self, samples: np.ndarray, sample_rate: int):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_wav(cls, file_path: str) -> "PCMAudio":
+        """Memory-map the sample data of a 16-bit mono WAV file."""
+        offset, length, sample_rate, channels, sample_width = _wav_data_chunk(file_path)
+        if channels != 1 or sample_width != SAMPLE_WIDTH:
+            raise ValueError(f"Expected 16-bit mono WAV, got {channels} channels / {sample_width * 8}-bit")
+
+        num_samples = length // SAMPLE_WIDTH
+        if num_samples == 0:
+            return cls(np.zeros(0, dtype=np.int16), sample_rate)
+
+        samples = np.memmap(file_path, dtype="<i2", mode="r", offset=offset, shape=(num_samples,))
+        return cls(samples, sample_rate)
+
+    @property
+    def num_samples(self) -> int:
+        return int(self.samples.shape[0])
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / float(self.sample_rate)
+
+    def slice(self, start: float, end: float) -> "PCMAudio":
+        """Return a view of the audio between two timestamps in seconds."""
+        first = max(0, int(round(start * self.sample_rate)))
+        last = min(self.num_samples, int(round(end * self.sample_rate)))
+        return PCMAudio(self.samples[first:max(first, last)], self.sample_rate)
+
+    def as_float32(self) -> np.ndarray:
+        """Samples scaled to [-1, 1], as expected by Whisper and pyannote."""
+        return self.samples.astype(np.float32) / 32768.0
+
+    def to_wav_bytes(self) -> bytes:
+        """Encode as an in-memory WAV file for backends that need a file upload."""
+        output = io.BytesIO()
+        self.write_wav(output)
+        return output.getvalue()
+
+    def write_wav(self, target: Any) -> None:
+        """Write a 16-bit mono WAV to a path or binary file object."""
+        with wave.open(target, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(np.ascontiguousarray(self.samples, dtype="<i2").tobytes())
+
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata in the same shape as AudioService.get_audio_metadata."""
+        return {
+            "duration": self.duration,
+            "size": self.num_samples * SAMPLE_WIDTH,
+            "sample_rate": self.sample_rate,
+            "channels": 1,
+            "codec": "pcm_s16le",
+            "bit_rate": self.sample_rate * SAMPLE_WIDTH * 8,
+            "format_name": "s16le",
+            "bit_depth": SAMPLE_WIDTH * 8
+        }
+
+
+class SharedPCMBuffer:
+    """
+    Normalized PCM held in a named shared-memory segment.
+    The creating process owns the segment and must unlink it; stage workers on
+    the same host attach by name through ref() and read the samples zero-copy.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, num_samples: int, sample_rate: int, owner: bool):
+        self._shm = shm
+        self.num_samples = num_samples
+        self.sample_rate = sample_rate
+        self.owner = owner
+
+    @classmethod
+    def create(cls, capacity_samples: int, sample_rate: int) -> "SharedPCMBuffer":
+        shm = shared_memory.SharedMemory(create=True, size=max(1, capacity_samples) * SAMPLE_WIDTH)
+        return cls(shm, 0, sample_rate, owner=True)
+
+    @classmethod
+    def from_samples(cls, audio: PCMAudio) -> "SharedPCMBuffer":
+        """Copy samples into a new segment."""
+        buffer = cls.create(audio.num_samples, audio.sample_rate)
+        target = np.ndarray((audio.num_samples,), dtype="<i2", buffer=buffer.writable_view())
+        target[:] = audio.samples
+        del target
+        buffer.num_samples = audio.num_samples
+        return buffer
+
+    @classmethod
+    def attach(cls, ref: Dict[str, Any]) -> "SharedPCMBuffer":
+        shm = shared_memory.SharedMemory(name=ref["shm_name"])
+        # Attaching registers the segment with this process's resource tracker,
+        # which would unlink it when the worker exits. Only the owner may unlink.
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, int(ref["num_samples"]), int(ref["sample_rate"]), owner=False)
+
+    @staticmethod
+    def unlink_ref(ref: Dict[str, Any]) -> None:
+        """Remove a segment by reference, from whichever process ends its lifetime."""
+        try:
+            shm = shared_memory.SharedMemory(name=ref["shm_name"])
+        except FileNotFoundError:
+            return
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def capacity_samples(self) -> int:
+        return self._shm.size // SAMPLE_WIDTH
+
+    def writable_view(self) -> memoryview:
+        """Raw byte view of the whole segment, for filling the buffer."""
+        return self._shm.buf
+
+    @property
+    def audio(self) -> PCMAudio:
+        samples = np.ndarray((self.num_samples,), dtype="<i2", buffer=self._shm.buf)
+        return PCMAudio(samples, self.sample_rate)
+
+    def ref(self) -> Dict[str, Any]:
+        """JSON-serializable reference that other processes can attach to."""
+        return {
+            "shm_name": self.name,
+            "num_samples": self.num_samples,
+            "sample_rate": self.sample_rate
+        }
+
+    def close(self) -> None:
+        try:
+            self._shm.close()
+        except BufferError:
+            # A numpy view is still alive; the mapping is released with it
+            pass
+
+    def release(self) -> None:
+        """Close the mapping and, for the owner, remove the segment."""
+        self.close()
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def detach(self) -> None:
+        """
+        Close the mapping but leave the segment for other processes. The owner
+        hands its unlink duty over; whoever holds ref() must call unlink_ref().
+        """
+        self.close()
+        if self.owner:
+            try:
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+            except Exception:
+                pass
+            self.owner = False
+
+    def __enter__(self) -> "SharedPCMBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+def _wav_data_chunk(file_path: str):
+    """Locate the data chunk of a PCM WAV file: (offset, length, sample_rate, channels, sample_width)."""
+    with open(file_path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError(f"Not a WAV file: {file_path}")
+
+        fmt: Optional[tuple] = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                raise ValueError(f"No data chunk in WAV file: {file_path}")
+
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt_data = f.read(chunk_size)
+                audio_format, channels, sample_rate = struct.unpack("<HHI", fmt_data[:8])
+                bits_per_sample = struct.unpack("<H", fmt_data[14:16])[0]
+                if audio_format not in (1, 0xFFFE):
+                    raise ValueError(f"WAV file is not PCM: {file_path}")
+                fmt = (sample_rate, channels, bits_per_sample // 8)
+                if chunk_size % 2:
+                    f.seek(1, io.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"WAV data chunk before fmt chunk: {file_path}")
+                offset = f.tell()
+                # ffmpeg writes a placeholder size when streaming; trust the file size instead
+                file_size = f.seek(0, io.SEEK_END)
+                length = min(chunk_size, file_size - offset) if chunk_size else file_size - offset
+                return (offset, length) + fmt
+            else:
+                f.seek(chunk_size + (chunk_size % 2), io.SEEK_CUR)
+
+
+@contextmanager
+def open_stage_audio(audio_path: str, pcm_ref: Optional[Dict[str, Any]] = None) -> Iterator[Union[str, PCMAudio]]:
+    """
+    Yield the input for a pipeline stage: a zero-copy view of the shared buffer
+    when the pipeline normalized into memory, otherwise the normalized file path.
+    """
+    if not pcm_ref:
+        yield audio_path
+        return
+
+    buffer = SharedPCMBuffer.attach(pcm_ref)
+    try:
+        yield buffer.audio
+    finally:
+        buffer.close()
@@ -12,12 +12,13 @@ class RedactionService:
     def redact_transcript(self, text: str, segments: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Redact sensitive data from transcript text.
+        Detection and redaction run in-process; this is called from inside a task.
         """
         # Detect personal data
-        detections = detect_personal_data.delay(text).get()
+        detections = detect_personal_data(text)
         
         # Apply redactions
-        redacted_result = apply_redactions.delay(text, detections).get()
+        redacted_result = apply_redactions(text, detections)
         
         # Also redact segments if provided
         redacted_segments = []
@@ -25,8 +26,8 @@ class RedactionService:
             for segment in segments:
                 segment_text = segment.get("text", "")
                 if segment_text:
-                    segment_detections = detect_personal_data.delay(segment_text).get()
-                    segment_redacted = apply_redactions.delay(segment_text, segment_detections).get()
+                    segment_detections = detect_personal_data(segment_text)
+                    segment_redacted = apply_redactions(segment_text, segment_detections)
                     
                     # Update segment with redacted text
                     redacted_segment = segment.copy()
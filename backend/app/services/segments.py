@@ -0,0 +1,295 @@
+"""
+Array-backed time segments shared by diarization and analysis.
+Designer: Abdullah Alawiss
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Keys held in the arrays; anything else on a segment dict is kept verbatim in `extras`
+ARRAY_KEYS = ("start", "end", "duration", "confidence", "speaker")
+
+
+class SegmentArray:
+    """
+    Struct-of-arrays segment container: float64 starts, ends, durations and
+    confidence plus an int16 speaker code per segment, instead of one dict per
+    segment. A 10k-segment call takes ~340 KB rather than several MB of dicts,
+    and merging, statistics and overlap are whole-array numpy operations.
+    Values are float64 so to_dicts() returns exactly what from_dicts() was given,
+    at any call length (float32 loses milliseconds past ~4.5 hours).
+    Missing confidence is stored as NaN and left out again by to_dicts().
+    """
+
+    __slots__ = ("starts", "ends", "durations", "confidence", "speakers", "speaker_names", "extras", "with_duration")
+
+    def __init__(
+        self,
+        starts: Any,
+        ends: Any,
+        confidence: Any = None,
+        speakers: Any = None,
+        speaker_names: Sequence[str] = (),
+        extras: Optional[List[Optional[Dict[str, Any]]]] = None,
+        with_duration: bool = True,
+        durations: Any = None
+    ):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        count = self.starts.shape[0]
+        # Kept as given (producers may round them); derived from the times otherwise
+        self.durations = self.ends - self.starts if durations is None else np.asarray(durations, dtype=np.float64)
+        self.confidence = (
+            np.full(count, np.nan, dtype=np.float64) if confidence is None
+            else np.asarray(confidence, dtype=np.float64)
+        )
+        self.speakers = (
+            np.full(count, -1, dtype=np.int16) if speakers is None
+            else np.asarray(speakers, dtype=np.int16)
+        )
+        self.speaker_names = list(speaker_names)
+        self.extras = extras
+        # Whether to_dicts() writes the derived "duration" key
+        self.with_duration = with_duration
+
+    @classmethod
+    def from_dicts(cls, segments: Iterable[Dict[str, Any]], speaker: str = None) -> "SegmentArray":
+        """Build from a list of segment dicts, all belonging to `speaker` when given."""
+        segments = list(segments)
+        names = [speaker] if speaker is not None else []
+        codes: Dict[str, int] = {speaker: 0} if speaker is not None else {}
+
+        starts = np.fromiter((s["start"] for s in segments), dtype=np.float64, count=len(segments))
+        ends = np.fromiter((s["end"] for s in segments), dtype=np.float64, count=len(segments))
+        durations = np.fromiter(
+            (s["duration"] if s.get("duration") is not None else s["end"] - s["start"] for s in segments),
+            dtype=np.float64,
+            count=len(segments)
+        )
+        confidence = np.fromiter(
+            (np.nan if s.get("confidence") is None else s["confidence"] for s in segments),
+            dtype=np.float64,
+            count=len(segments)
+        )
+
+        speakers = np.empty(len(segments), dtype=np.int16)
+        for i, segment in enumerate(segments):
+            name = segment.get("speaker", speaker)
+            if name is None:
+                speakers[i] = -1
+                continue
+            if name not in codes:
+                codes[name] = len(names)
+                names.append(name)
+            speakers[i] = codes[name]
+
+        extras = _collect_extras(segments)
+        with_duration = not segments or any("duration" in s for s in segments)
+        return cls(starts, ends, confidence, speakers, names, extras, with_duration, durations)
+
+    @classmethod
+    def from_speaker_dict(cls, speakers: Dict[str, List[Dict[str, Any]]]) -> "SegmentArray":
+        """Build from the diarization shape {speaker_id: [segment, ...]}."""
+        parts = [cls.from_dicts(segments, speaker=speaker_id) for speaker_id, segments in speakers.items()]
+        return cls.concatenate(parts)
+
+    @classmethod
+    def concatenate(cls, parts: Sequence["SegmentArray"]) -> "SegmentArray":
+        """Join several arrays, re-coding speakers onto one shared name table."""
+        names: List[str] = []
+        codes: Dict[str, int] = {}
+        speaker_arrays = []
+
+        for part in parts:
+            lookup = np.empty(len(part.speaker_names) + 1, dtype=np.int16)
+            lookup[-1] = -1  # index -1 keeps "no speaker"
+            for code, name in enumerate(part.speaker_names):
+                if name not in codes:
+                    codes[name] = len(names)
+                    names.append(name)
+                lookup[code] = codes[name]
+            speaker_arrays.append(lookup[part.speakers])
+
+        extras = None
+        if any(part.extras is not None for part in parts):
+            extras = []
+            for part in parts:
+                extras.extend(part.extras if part.extras is not None else [None] * len(part))
+
+        return cls(
+            np.concatenate([p.starts for p in parts]) if parts else [],
+            np.concatenate([p.ends for p in parts]) if parts else [],
+            np.concatenate([p.confidence for p in parts]) if parts else [],
+            np.concatenate(speaker_arrays) if parts else [],
+            names,
+            extras,
+            all(part.with_duration for part in parts),
+            np.concatenate([p.durations for p in parts]) if parts else []
+        )
+
+    def __len__(self) -> int:
+        return int(self.starts.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the numeric arrays."""
+        return (
+            self.starts.nbytes + self.ends.nbytes + self.durations.nbytes
+            + self.confidence.nbytes + self.speakers.nbytes
+        )
+
+    def take(self, index: Any) -> "SegmentArray":
+        """Subset (or reorder) by an index array or boolean mask."""
+        index = np.asarray(index)
+        extras = None
+        if self.extras is not None:
+            positions = np.flatnonzero(index) if index.dtype == bool else index
+            extras = [self.extras[i] for i in positions]
+        return SegmentArray(
+            self.starts[index], self.ends[index], self.confidence[index],
+            self.speakers[index], self.speaker_names, extras, self.with_duration, self.durations[index]
+        )
+
+    def for_speaker(self, speaker_id: str) -> "SegmentArray":
+        if speaker_id not in self.speaker_names:
+            return self.take(np.zeros(len(self), dtype=bool))
+        return self.take(self.speakers == self.speaker_names.index(speaker_id))
+
+    def sorted(self) -> "SegmentArray":
+        """Ordered by speaker, then start time."""
+        return self.take(np.lexsort((self.starts, self.speakers)))
+
+    def merge(self, max_gap: float = 0.5) -> "SegmentArray":
+        """
+        Merge each speaker's segments that overlap or are at most max_gap apart.
+        Returns a new array; confidence becomes the duration-weighted mean of
+        the merged pieces. Per-segment extras do not survive a merge.
+        """
+        if len(self) == 0:
+            return SegmentArray([], [], [], [], self.speaker_names, with_duration=self.with_duration)
+
+        ordered = self.sorted()
+        starts = ordered.starts
+        ends = ordered.ends
+
+        # Running end of the current run; reset wherever the speaker changes
+        new_speaker = np.concatenate(([True], ordered.speakers[1:] != ordered.speakers[:-1]))
+        offset = np.cumsum(new_speaker) * (ends.max() - starts.min() + max_gap + 1.0)
+        running_end = np.maximum.accumulate(ends + offset) - offset
+
+        new_run = new_speaker.copy()
+        new_run[1:] |= starts[1:] > running_end[:-1] + max_gap
+        run_starts = np.flatnonzero(new_run)
+
+        merged_starts = starts[run_starts]
+        merged_ends = np.maximum.reduceat(ends, run_starts)
+
+        known = ~np.isnan(ordered.confidence)
+        weights = np.where(known, np.maximum(ends - starts, 1e-6), 0.0)
+        weighted = np.add.reduceat(np.where(known, ordered.confidence, 0.0) * weights, run_starts)
+        total_weight = np.add.reduceat(weights, run_starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            merged_confidence = np.where(total_weight > 0, weighted / total_weight, np.nan)
+
+        return SegmentArray(
+            merged_starts, merged_ends, merged_confidence,
+            ordered.speakers[run_starts], self.speaker_names, with_duration=self.with_duration
+        )
+
+    def statistics(self) -> Dict[str, Dict[str, Any]]:
+        """Speaking time, segment count and confidence per speaker, via bincount."""
+        if len(self) == 0 or not self.speaker_names:
+            return {}
+
+        valid = self.speakers >= 0
+        codes = self.speakers[valid].astype(np.intp)
+        durations = self.durations[valid]
+        confidence = self.confidence[valid]
+        known = ~np.isnan(confidence)
+        size = len(self.speaker_names)
+
+        counts = np.bincount(codes, minlength=size)
+        total_time = np.bincount(codes, weights=durations, minlength=size)
+        confidence_sum = np.bincount(codes[known], weights=confidence[known], minlength=size)
+        confidence_count = np.bincount(codes[known], minlength=size)
+
+        stats = {}
+        for code, name in enumerate(self.speaker_names):
+            if counts[code] == 0:
+                continue
+            stats[name] = {
+                "total_speaking_time": float(total_time[code]),
+                "segment_count": int(counts[code]),
+                "average_confidence": float(confidence_sum[code] / confidence_count[code]) if confidence_count[code] else 0.0,
+                "average_segment_length": float(total_time[code] / counts[code])
+            }
+        return stats
+
+    def overlap_with(self, start: float, end: float) -> Dict[str, float]:
+        """Seconds each speaker overlaps the window [start, end)."""
+        overlap = np.clip(np.minimum(self.ends, end) - np.maximum(self.starts, start), 0.0, None)
+        valid = (self.speakers >= 0) & (overlap > 0)
+        if not valid.any():
+            return {}
+        seconds = np.bincount(
+            self.speakers[valid].astype(np.intp),
+            weights=overlap[valid],
+            minlength=len(self.speaker_names)
+        )
+        return {name: float(seconds[code]) for code, name in enumerate(self.speaker_names) if seconds[code] > 0}
+
+    def overlapped_speech_seconds(self) -> float:
+        """Total time during which two or more speakers talk at once."""
+        merged = self.merge(max_gap=0.0)
+        if len(merged) < 2:
+            return 0.0
+
+        times = np.concatenate((merged.starts, merged.ends))
+        deltas = np.concatenate((np.ones(len(merged)), -np.ones(len(merged))))
+        # Ends sort before starts at the same instant: touching turns do not overlap
+        order = np.lexsort((deltas, times))
+        times, active = times[order], np.cumsum(deltas[order])
+        return float(np.sum(np.diff(times)[active[:-1] >= 2]))
+
+    def interruption_count(self) -> int:
+        """Segments (in stored order) that start before the previous one has ended."""
+        if len(self) < 2:
+            return 0
+        return int(np.count_nonzero(self.starts[1:] < self.ends[:-1]))
+
+    def to_dicts(self, include_speaker: bool = False) -> List[Dict[str, Any]]:
+        """Back to the JSON shape: start, end, duration and confidence (when present) plus extras."""
+        starts = self.starts.tolist()
+        ends = self.ends.tolist()
+        durations = self.durations.tolist()
+        known = (~np.isnan(self.confidence)).tolist()
+        confidence = self.confidence.tolist()
+        speakers = self.speakers.tolist()
+
+        segments = []
+        for i in range(len(self)):
+            segment = {"start": starts[i], "end": ends[i]}
+            if self.with_duration:
+                segment["duration"] = durations[i]
+            if known[i]:
+                segment["confidence"] = confidence[i]
+            if include_speaker and speakers[i] >= 0:
+                segment["speaker"] = self.speaker_names[speakers[i]]
+            if self.extras is not None and self.extras[i]:
+                segment.update(self.extras[i])
+            segments.append(segment)
+        return segments
+
+    def to_speaker_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Back to the diarization shape {speaker_id: [segment, ...]}."""
+        return {
+            name: self.take(self.speakers == code).to_dicts()
+            for code, name in enumerate(self.speaker_names)
+            if np.any(self.speakers == code)
+        }
+
+
+def _collect_extras(segments: List[Dict[str, Any]]) -> Optional[List[Optional[Dict[str, Any]]]]:
+    extras = [{k: v for k, v in s.items() if k not in ARRAY_KEYS} or None for s in segments]
+    return extras if any(extras) else None
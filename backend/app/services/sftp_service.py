@@ -0,0 +1,205 @@
+"""
+SFTP ingestion: remote listing, manifest diffing and pooled parallel downloads.
+Designer: Abdullah Alawiss
+"""
+
+import os
+import posixpath
+import queue
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..core.config import settings
+from .upload_service import (
+    UPLOAD_CHUNK_SIZE,
+    StoredUpload,
+    UploadService,
+    UploadTooLarge,
+    UnsupportedAudioFormat
+)
+
+
+class RemoteFile:
+    """A regular file in the remote directory."""
+
+    def __init__(self, path: str, size: int, mtime: int):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def name(self) -> str:
+        return posixpath.basename(self.path)
+
+
+class SFTPConnectionPool:
+    """
+    Up to `size` SFTP clients shared by the download threads. Clients are
+    created on demand, reused while healthy and dropped after an error, so a
+    broken connection is replaced rather than handed to the next download.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = None):
+        self.connect = connect
+        self.size = size or settings.SFTP_POOL_SIZE
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    @contextmanager
+    def client(self) -> Iterator[Any]:
+        with self._slots:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                client = self.connect()
+
+            try:
+                yield client
+            except (UploadTooLarge, UnsupportedAudioFormat):
+                # Rejected content, not a connection problem
+                self._idle.put(client)
+                raise
+            except BaseException:
+                _close_client(client)
+                raise
+            else:
+                self._idle.put(client)
+
+    def close(self) -> None:
+        while True:
+            try:
+                _close_client(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class SFTPIngestService:
+    """
+    Lists the remote directory and downloads files straight into the upload
+    directory through UploadService, so they get the same size limit, format
+    sniffing and content hash as API uploads.
+    """
+
+    def __init__(self, pool: SFTPConnectionPool, remote_path: str = None, upload_service: UploadService = None):
+        self.pool = pool
+        self.remote_path = remote_path or settings.SFTP_REMOTE_PATH
+        self.upload_service = upload_service or UploadService()
+
+    def list_remote(self, min_age_seconds: int = None) -> List[RemoteFile]:
+        """Regular files in the remote directory that have stopped changing."""
+        min_age_seconds = settings.SFTP_MIN_FILE_AGE_SECONDS if min_age_seconds is None else min_age_seconds
+        settled_before = time.time() - min_age_seconds
+
+        with self.pool.client() as client:
+            entries = client.listdir_attr(self.remote_path)
+
+        files = [
+            RemoteFile(posixpath.join(self.remote_path, entry.filename), int(entry.st_size), int(entry.st_mtime))
+            for entry in entries
+            if entry.st_mode is not None and stat.S_ISREG(entry.st_mode) and entry.st_mtime <= settled_before
+        ]
+        files.sort(key=lambda f: (f.mtime, f.path))
+        return files
+
+    def download_all(self, files: List[RemoteFile]) -> List[Tuple[RemoteFile, Any]]:
+        """
+        Download files in parallel, one pooled connection per thread.
+        Returns (file, StoredUpload or the exception) pairs in input order.
+        """
+        if not files:
+            return []
+
+        def fetch(remote: RemoteFile):
+            try:
+                return remote, self.download(remote)
+            except Exception as e:
+                return remote, e
+
+        with ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="sftp") as executor:
+            return list(executor.map(fetch, files))
+
+    def download(self, remote: RemoteFile) -> StoredUpload:
+        if remote.size > self.upload_service.max_bytes:
+            raise UploadTooLarge(f"File too large. Maximum size: {self.upload_service.max_bytes} bytes")
+
+        with self.pool.client() as client:
+            with client.open(remote.path, "rb") as f:
+                if hasattr(f, "prefetch"):
+                    # Pipeline read requests instead of one round trip per chunk
+                    f.prefetch(remote.size)
+                return self.upload_service.save_iter(iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""))
+
+
+def diff_manifest(files: List[RemoteFile], manifest: Dict[str, Tuple[int, int]]) -> List[RemoteFile]:
+    """Files that are new or whose (size, mtime) changed since they were recorded."""
+    return [f for f in files if manifest.get(f.path) != (f.size, f.mtime)]
+
+
+def paramiko_connect(
+    host: str = None,
+    port: int = None,
+    username: str = None,
+    password: str = None
+) -> Callable[[], Any]:
+    """Client factory for a real SFTP server."""
+    def connect():
+        import paramiko
+
+        transport = paramiko.Transport((host or settings.SFTP_HOST, port or settings.SFTP_PORT))
+        transport.set_keepalive(30)
+        transport.connect(
+            username=username or settings.SFTP_USERNAME,
+            password=password or settings.SFTP_PASSWORD
+        )
+        return paramiko.SFTPClient.from_transport(transport)
+
+    return connect
+
+
+class LocalDirectoryClient:
+    """
+    The subset of paramiko's SFTPClient used here, over a local directory.
+    Stands in for an SFTP server in development and tests.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _local(self, path: str) -> str:
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def listdir_attr(self, path: str) -> List[Any]:
+        entries = []
+        for name in sorted(os.listdir(self._local(path))):
+            attrs = os.stat(os.path.join(self._local(path), name))
+            entries.append(_Attributes(name, attrs.st_size, attrs.st_mtime, attrs.st_mode))
+        return entries
+
+    def open(self, path: str, mode: str = "rb"):
+        return open(self._local(path), mode)
+
+    def close(self) -> None:
+        pass
+
+
+class _Attributes:
+    def __init__(self, filename: str, st_size: int, st_mtime: float, st_mode: Optional[int]):
+        self.filename = filename
+        self.st_size = st_size
+        self.st_mtime = st_mtime
+        self.st_mode = st_mode
+
+
+def _close_client(client: Any) -> None:
+    # paramiko's SFTPClient.close() leaves the underlying transport open
+    channel = client.get_channel() if hasattr(client, "get_channel") else None
+    try:
+        client.close()
+        if channel is not None:
+            channel.get_transport().close()
+    except Exception as e:
+        print(f"Warning: Closing SFTP connection failed: {e}")
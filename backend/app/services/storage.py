@@ -0,0 +1,309 @@
+"""
+Audio object storage: local filesystem or S3-compatible (MinIO) backends.
+Designer: Abdullah Alawiss
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, Optional
+
+from ..core.config import settings
+from .artifact_store import ArtifactStore
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class StorageBackend(ABC):
+    """
+    Where recordings live. Keys are what Call.file_path holds (e.g.
+    "uploads/<uuid>.wav"), so existing rows stay valid on either backend.
+    Callers that need a real file (ffmpeg, memmap) ask for local_path().
+    """
+
+    @abstractmethod
+    def put_file(self, local_path: str, key: str, remove_source: bool = False) -> int:
+        """Store a local file under key. Returns its size."""
+        ...
+
+    @abstractmethod
+    def upload_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Store a stream of byte chunks under key without holding it in memory. Returns its size."""
+        ...
+
+    @abstractmethod
+    def read_range(self, key: str, start: int = 0, length: int = None) -> bytes:
+        """Bytes [start, start + length) of an object; to the end when length is None."""
+        ...
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """A local file with the object's content."""
+        ...
+
+    @abstractmethod
+    def spool_path(self, key: str) -> str:
+        """Where to write a file that put_file() will then store under key."""
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove an object; a missing key is not an error."""
+        ...
+
+
+class LocalStorage(StorageBackend):
+    """Keys are paths on a local (or shared, e.g. NFS) filesystem."""
+
+    def __init__(self, root: str = None):
+        self.root = root or ""
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key) if self.root else key
+
+    def put_file(self, local_path: str, key: str, remove_source: bool = False) -> int:
+        path = self._path(key)
+        if os.path.abspath(local_path) != os.path.abspath(path):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if remove_source:
+                shutil.move(local_path, path)
+            else:
+                shutil.copyfile(local_path, path)
+        return os.path.getsize(path)
+
+    def upload_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return size
+
+    def read_range(self, key: str, start: int = 0, length: int = None) -> bytes:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read() if length is None else f.read(length)
+
+    def local_path(self, key: str) -> str:
+        path = self._path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Audio file not found: {key}")
+        return path
+
+    def spool_path(self, key: str) -> str:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible bucket (AWS S3 or MinIO). Writes go through multipart
+    upload in part_size pieces, so neither API nor worker memory grows with the
+    file. Reads are ranged GETs, and local_path() downloads into a bounded LRU
+    read-through cache, so a worker fetches each recording once no matter how
+    many stages read it.
+    """
+
+    def __init__(
+        self,
+        bucket: str = None,
+        endpoint_url: str = None,
+        access_key: str = None,
+        secret_key: str = None,
+        part_size: int = None,
+        cache: ArtifactStore = None,
+        client: Any = None
+    ):
+        self.bucket = bucket or settings.MINIO_BUCKET_NAME
+        self.part_size = max(part_size or settings.STORAGE_MULTIPART_CHUNK_SIZE, MIN_PART_SIZE)
+        self.cache = cache or ArtifactStore(settings.STORAGE_CACHE_DIR, settings.STORAGE_CACHE_MAX_BYTES)
+        self.client = client or _s3_client(endpoint_url, access_key, secret_key)
+        # Beside the cache, not in it (eviction would count it), and on the same
+        # filesystem so downloads are hard-linked into the cache rather than copied
+        self._spool_dir = f"{os.path.normpath(self.cache.root)}-spool"
+
+    def put_file(self, local_path: str, key: str, remove_source: bool = False) -> int:
+        with open(local_path, "rb") as f:
+            size = self.upload_stream(key, iter(lambda: f.read(READ_CHUNK_SIZE), b""))
+        if remove_source:
+            os.remove(local_path)
+        return size
+
+    def upload_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        upload_id = None
+        parts = []
+        buffer = bytearray()
+        size = 0
+
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                if len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)["UploadId"]
+                    parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+                    buffer.clear()
+
+            if upload_id is None:
+                # Smaller than one part: a single PUT is one request instead of three
+                self.client.put_object(Bucket=self.bucket, Key=key, Body=bytes(buffer))
+                return size
+
+            if buffer:
+                parts.append(self._upload_part(key, upload_id, len(parts) + 1, bytes(buffer)))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+            return size
+
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+                except Exception as e:
+                    print(f"Warning: Could not abort multipart upload of {key}: {e}")
+            raise
+
+    def _upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> dict:
+        response = self.client.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=data
+        )
+        return {"ETag": response["ETag"], "PartNumber": number}
+
+    def read_range(self, key: str, start: int = 0, length: int = None) -> bytes:
+        byte_range = f"bytes={start}-" if length is None else f"bytes={start}-{start + length - 1}"
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=byte_range)
+        return response["Body"].read()
+
+    def local_path(self, key: str) -> str:
+        cache_key = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        suffix = os.path.splitext(key)[1]
+
+        path = self.cache.get_file(cache_key, suffix)
+        if path:
+            return path
+
+        os.makedirs(self._spool_dir, exist_ok=True)
+        tmp_path = os.path.join(self._spool_dir, f"{uuid.uuid4().hex}{suffix}")
+        try:
+            response = self._get(key)
+            with open(tmp_path, "wb") as f:
+                for chunk in iter(lambda: response["Body"].read(READ_CHUNK_SIZE), b""):
+                    f.write(chunk)
+            return self.cache.put_file(cache_key, suffix, tmp_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def spool_path(self, key: str) -> str:
+        os.makedirs(self._spool_dir, exist_ok=True)
+        return os.path.join(self._spool_dir, f"{uuid.uuid4().hex}{os.path.splitext(key)[1]}")
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        return int(self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"])
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def _get(self, key: str) -> dict:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(f"Audio file not found: {key}")
+            raise
+
+
+def _s3_client(endpoint_url: str = None, access_key: str = None, secret_key: str = None):
+    import boto3
+    from botocore.config import Config
+
+    if endpoint_url is None:
+        scheme = "https" if settings.MINIO_SECURE else "http"
+        endpoint_url = settings.S3_ENDPOINT_URL or f"{scheme}://{settings.MINIO_ENDPOINT}"
+
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key or settings.MINIO_ACCESS_KEY,
+        aws_secret_access_key=secret_key or settings.MINIO_SECRET_KEY,
+        config=Config(
+            signature_version="s3v4",
+            max_pool_connections=settings.STORAGE_MAX_CONNECTIONS,
+            retries={"max_attempts": 3, "mode": "standard"}
+        )
+    )
+
+
+def _is_not_found(error: Exception) -> bool:
+    response = getattr(error, "response", None) or {}
+    return str(response.get("Error", {}).get("Code")) in ("404", "NoSuchKey", "NotFound")
+
+
+_storage: Optional[StorageBackend] = None
+_storage_pid: Optional[int] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Process-wide backend chosen by STORAGE_BACKEND ("local" or "s3")."""
+    global _storage, _storage_pid
+
+    if _storage is not None and _storage_pid == os.getpid():
+        return _storage
+
+    with _storage_lock:
+        if _storage is None or _storage_pid != os.getpid():
+            if settings.STORAGE_BACKEND == "s3":
+                _storage = S3Storage()
+            elif settings.STORAGE_BACKEND == "local":
+                _storage = LocalStorage()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+            _storage_pid = os.getpid()
+        return _storage
@@ -0,0 +1,290 @@
+"""
+Bulk import of transcript-only calls from a CSV call log plus text files.
+Designer: Abdullah Alawiss
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import os
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.call import Call, CallTranscript
+
+TRANSCRIPT_FORMAT = "txt"  # Call.format of imported calls; they have no audio
+
+CALL_COLUMNS = (
+    "id", "filename", "original_filename", "file_path", "file_size",
+    "duration_seconds", "status", "format", "content_hash", "created_at"
+)
+TRANSCRIPT_COLUMNS = ("call_id", "raw_text", "language", "whisper_model")
+
+
+class TranscriptImporter:
+    """
+    Streams a call-log CSV row by row, reads each row's transcript file and
+    inserts Call + CallTranscript rows batch_size at a time: COPY on Postgres,
+    a multi-row INSERT elsewhere. Memory is bounded by one batch whatever the
+    CSV length. Transcripts already imported (same content hash) are skipped,
+    so an interrupted import can simply be run again; imported calls that
+    ended up "failed" (analysis error, or the broker refused the dispatch)
+    are queued again instead.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        transcript_dir: str,
+        batch_size: int = None,
+        dispatch: Optional[Callable[[List[int]], None]] = None,
+        filename_column: str = "filename",
+        language: str = None
+    ):
+        self.db = db
+        self.transcript_dir = transcript_dir
+        self.batch_size = batch_size or settings.TRANSCRIPT_IMPORT_BATCH_SIZE
+        self.dispatch = dispatch
+        self.filename_column = filename_column
+        self.language = language or settings.REDACTION_LANGUAGE
+        self.stats = {"rows": 0, "imported": 0, "retried": 0, "already_imported": 0, "missing": 0, "empty": 0}
+
+    def import_csv(self, csv_file: TextIO) -> Dict[str, int]:
+        reader = csv.DictReader(csv_file)
+        if self.filename_column not in (reader.fieldnames or []):
+            raise ValueError(f"CSV has no '{self.filename_column}' column")
+
+        batch: List[Dict[str, Any]] = []
+        for row in reader:
+            self.stats["rows"] += 1
+            record = self._record(row)
+            if record is None:
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+        if batch:
+            self._flush(batch)
+
+        return dict(self.stats)
+
+    def _record(self, row: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        name = (row.get(self.filename_column) or "").strip()
+        path = os.path.join(self.transcript_dir, os.path.basename(name))
+        if not name or not os.path.isfile(path):
+            self.stats["missing"] += 1
+            return None
+
+        with open(path, "rb") as f:
+            data = f.read()
+        transcript = data.decode("utf-8", errors="replace").strip()
+        if not transcript:
+            self.stats["empty"] += 1
+            return None
+
+        return {
+            "original_filename": name,
+            "file_path": path,
+            "file_size": len(data),
+            "duration_seconds": _parse_float(row.get("duration_seconds")),
+            "created_at": _parse_timestamp(row.get("date"), row.get("time")) or datetime.utcnow(),
+            "content_hash": hashlib.sha256(data).hexdigest(),
+            "raw_text": transcript
+        }
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        existing: Dict[str, Tuple[int, str, str]] = {}
+        for call_id, content_hash, status, call_format in self.db.query(
+            Call.id, Call.content_hash, Call.status, Call.format
+        ).filter(
+            Call.content_hash.in_({record["content_hash"] for record in batch})
+        ).order_by(Call.id).all():
+            existing.setdefault(content_hash, (call_id, status, call_format))
+
+        records, retry_ids = [], []
+        for record in batch:
+            known = existing.get(record["content_hash"])
+            if known is None:
+                existing[record["content_hash"]] = (None, "processing", TRANSCRIPT_FORMAT)  # Same text twice in one batch
+                records.append(record)
+            elif known[1:] == ("failed", TRANSCRIPT_FORMAT) and known[0] not in retry_ids:
+                # An earlier import whose analysis failed or was never queued
+                retry_ids.append(known[0])
+            else:
+                self.stats["already_imported"] += 1
+
+        if not records and not retry_ids:
+            return
+
+        try:
+            call_ids = []
+            if records:
+                if self.db.get_bind().dialect.name == "postgresql":
+                    call_ids = self._copy_rows(records)
+                else:
+                    call_ids = self._insert_rows(records)
+            if retry_ids:
+                self.db.query(Call).filter(Call.id.in_(retry_ids)).update(
+                    {Call.status: "processing"}, synchronize_session=False
+                )
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        self.stats["imported"] += len(call_ids)
+        self.stats["retried"] += len(retry_ids)
+        self._dispatch(call_ids + retry_ids)
+
+    def _dispatch(self, call_ids: List[int]) -> None:
+        if not self.dispatch:
+            return
+        try:
+            self.dispatch(call_ids)
+        except Exception:
+            # Nothing would ever move them out of "processing"; as "failed"
+            # they are picked up again when the import is re-run
+            self.db.query(Call).filter(Call.id.in_(call_ids)).update(
+                {Call.status: "failed"}, synchronize_session=False
+            )
+            self.db.commit()
+            raise
+
+    def _call_values(self, call_id: Optional[int], record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": call_id,
+            "filename": f"import-{record['content_hash'][:32]}.{TRANSCRIPT_FORMAT}",
+            "original_filename": record["original_filename"],
+            "file_path": record["file_path"],
+            "file_size": record["file_size"],
+            "duration_seconds": record["duration_seconds"],
+            "status": "processing",
+            "format": TRANSCRIPT_FORMAT,
+            "content_hash": record["content_hash"],
+            "created_at": record["created_at"]
+        }
+
+    def _transcript_values(self, call_id: int, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "call_id": call_id,
+            "raw_text": record["raw_text"],
+            "language": self.language,
+            "whisper_model": "import"
+        }
+
+    def _copy_rows(self, records: List[Dict[str, Any]]) -> List[int]:
+        """COPY both tables; ids are reserved from the sequence first so transcripts can reference them."""
+        connection = self.db.connection()
+        call_ids = [
+            row[0] for row in connection.execute(
+                text("SELECT nextval(pg_get_serial_sequence('calls', 'id')) FROM generate_series(1, :n)"),
+                {"n": len(records)}
+            )
+        ]
+
+        calls = [self._call_values(call_id, record) for call_id, record in zip(call_ids, records)]
+        transcripts = [self._transcript_values(call_id, record) for call_id, record in zip(call_ids, records)]
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY calls ({', '.join(CALL_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                _csv_buffer(calls, CALL_COLUMNS)
+            )
+            cursor.copy_expert(
+                f"COPY call_transcripts ({', '.join(TRANSCRIPT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                _csv_buffer(transcripts, TRANSCRIPT_COLUMNS)
+            )
+        finally:
+            cursor.close()
+
+        return call_ids
+
+    def _insert_rows(self, records: List[Dict[str, Any]]) -> List[int]:
+        calls = []
+        for record in records:
+            values = self._call_values(None, record)
+            del values["id"]
+            calls.append(values)
+
+        call_ids = self.db.execute(
+            insert(Call).returning(Call.id, sort_by_parameter_order=True),
+            calls
+        ).scalars().all()
+        self.db.execute(
+            insert(CallTranscript),
+            [self._transcript_values(call_id, record) for call_id, record in zip(call_ids, records)]
+        )
+        return list(call_ids)
+
+
+def _csv_buffer(rows: List[Dict[str, Any]], columns) -> io.StringIO:
+    # In COPY's csv format an unquoted empty field is NULL, which is what csv.writer emits for None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row[column].isoformat() if isinstance(row[column], datetime) else row[column]
+            for column in columns
+        ])
+    buffer.seek(0)
+    return buffer
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _parse_timestamp(date: Optional[str], time: Optional[str]) -> Optional[datetime]:
+    if not date:
+        return None
+    try:
+        return datetime.fromisoformat(f"{date.strip()}T{(time or '00:00:00').strip()}")
+    except ValueError:
+        return None
+
+
+def main(argv: List[str] = None) -> int:
+    """python -m app.services.transcript_importer call_logs.csv [--transcripts DIR]"""
+    parser = argparse.ArgumentParser(description="Import transcript-only calls from a CSV call log")
+    parser.add_argument("csv_path", help="Call log CSV with a filename column")
+    parser.add_argument("--transcripts", help="Directory of transcript .txt files (default: the CSV's directory)")
+    parser.add_argument("--filename-column", default="filename")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--no-analysis", action="store_true", help="Only insert; do not queue analysis and GDPR")
+    args = parser.parse_args(argv)
+
+    from ..core.database import SessionLocal
+    from ..workers.import_tasks import dispatch_imported_calls
+
+    db = SessionLocal()
+    try:
+        importer = TranscriptImporter(
+            db,
+            args.transcripts or os.path.dirname(os.path.abspath(args.csv_path)),
+            batch_size=args.batch_size,
+            dispatch=None if args.no_analysis else dispatch_imported_calls,
+            filename_column=args.filename_column
+        )
+        with open(args.csv_path, newline="", encoding="utf-8") as f:
+            stats = importer.import_csv(f)
+    finally:
+        db.close()
+
+    print(f"Transcript import: {stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
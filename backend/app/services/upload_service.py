@@ -0,0 +1,338 @@
+"""
+Streaming upload storage: constant memory, early size abort, incremental
+hashing, format detection from magic bytes and resumable chunked sessions.
+Designer: Abdullah Alawiss
+"""
+
+import asyncio
+import hashlib
+import itertools
+import os
+import shutil
+import uuid
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
+
+import aiofiles
+from fastapi import UploadFile
+
+from ..core.config import settings
+from .storage import LocalStorage, StorageBackend, get_storage
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+SNIFF_BYTES = 64  # Enough for every signature below
+
+
+class UploadTooLarge(Exception):
+    """The upload went past MAX_CONTENT_LENGTH; the partial file has been removed."""
+
+
+class UnsupportedAudioFormat(Exception):
+    """The first bytes do not look like a supported audio container."""
+
+
+class StoredUpload:
+    """An upload written to disk."""
+
+    def __init__(self, filename: str, file_path: str, file_size: int, content_hash: str, audio_format: str):
+        self.filename = filename
+        self.file_path = file_path
+        self.file_size = file_size
+        self.content_hash = content_hash
+        self.audio_format = audio_format
+
+
+class UploadService:
+    """
+    Stores uploads chunk by chunk. At most one chunk is held in memory (plus
+    one multipart part for S3), the SHA-256 is computed on the way, the format
+    is taken from the file's magic bytes (not its name) and the write stops as
+    soon as the size limit is passed. With the local backend the file is
+    written into upload_dir, which is the storage itself; any other backend
+    gets the bytes through upload_stream(), so nothing is spooled on the API
+    node and any node can serve any upload.
+    """
+
+    def __init__(
+        self,
+        upload_dir: str = "uploads",
+        max_bytes: int = None,
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        storage: StorageBackend = None
+    ):
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes or settings.MAX_CONTENT_LENGTH
+        self.chunk_size = chunk_size
+        self.storage = storage or get_storage()
+
+    async def save_upload_file(self, file: UploadFile) -> StoredUpload:
+        """Store a multipart UploadFile."""
+        async def chunks():
+            while True:
+                chunk = await file.read(self.chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+        return await self.save_stream(chunks())
+
+    async def save_stream(self, chunks: AsyncIterator[bytes]) -> StoredUpload:
+        """Store an async stream of byte chunks, e.g. a raw request body."""
+        if not isinstance(self.storage, LocalStorage):
+            # upload_stream() blocks, so it runs in a worker thread that pulls
+            # the body from the event loop one chunk at a time
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._upload, _pull(chunks, loop))
+
+        writer = _UploadWriter(self.upload_dir, self.max_bytes)
+
+        try:
+            async with aiofiles.open(writer.partial_path, 'wb') as f:
+                async for chunk in chunks:
+                    data = writer.accept(chunk)
+                    if data:
+                        await f.write(data)
+                await f.write(writer.finish())
+            stored = writer.commit()
+        except BaseException:
+            writer.discard()
+            raise
+
+        # Hand the finished file to storage (a no-op for local storage) off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._publish, stored)
+        return stored
+
+    def save_iter(self, chunks: Iterable[bytes]) -> StoredUpload:
+        """Blocking variant of save_stream for worker threads (e.g. SFTP downloads)."""
+        if not isinstance(self.storage, LocalStorage):
+            return self._upload(chunks)
+
+        writer = _UploadWriter(self.upload_dir, self.max_bytes)
+
+        try:
+            with open(writer.partial_path, 'wb') as f:
+                for chunk in chunks:
+                    data = writer.accept(chunk)
+                    if data:
+                        f.write(data)
+                f.write(writer.finish())
+            stored = writer.commit()
+        except BaseException:
+            writer.discard()
+            raise
+
+        self._publish(stored)
+        return stored
+
+    def _upload(self, chunks: Iterable[bytes]) -> StoredUpload:
+        """Hash, size-check and sniff the chunks on their way into storage.upload_stream()."""
+        writer = _UploadWriter(self.upload_dir, self.max_bytes, spool=False)
+        chunks = iter(chunks)
+
+        # The key carries the format, so sniff before storage sees any bytes
+        for chunk in chunks:
+            head = writer.accept(chunk)
+            if head:
+                break
+        else:
+            head = writer.finish()
+
+        file_path = writer.file_path()
+        # An UploadTooLarge from accept() surfaces inside upload_stream(), which aborts the upload
+        self.storage.upload_stream(file_path, itertools.chain([head], map(writer.accept, chunks)))
+        return writer.stored(file_path)
+
+    def _publish(self, stored: StoredUpload) -> None:
+        """Move the spooled file into storage under its key (the upload's file_path)."""
+        try:
+            self.storage.put_file(stored.file_path, stored.file_path, remove_source=True)
+        except BaseException:
+            if os.path.exists(stored.file_path):
+                os.remove(stored.file_path)
+            raise
+
+
+class _UploadWriter:
+    """Size, hash and format state of one upload, shared by the async and blocking paths."""
+
+    def __init__(self, upload_dir: str, max_bytes: int, spool: bool = True):
+        if spool:
+            os.makedirs(upload_dir, exist_ok=True)
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self.name = str(uuid.uuid4())
+        self.partial_path = os.path.join(upload_dir, f"{self.name}.part")
+        self.digest = hashlib.sha256()
+        self.file_size = 0
+        self.head = b""
+        self.audio_format = None
+
+    def accept(self, chunk: bytes) -> bytes:
+        """Account for a chunk and return the bytes to write now."""
+        if not chunk:
+            return b""
+
+        self.file_size += len(chunk)
+        if self.file_size > self.max_bytes:
+            raise UploadTooLarge(f"File too large. Maximum size: {self.max_bytes} bytes")
+
+        if self.audio_format is None:
+            # Network chunks can be tiny; collect enough bytes to sniff first
+            self.head += chunk
+            if len(self.head) < SNIFF_BYTES:
+                return b""
+            self.audio_format = _require_format(self.head)
+            chunk, self.head = self.head, b""
+
+        self.digest.update(chunk)
+        return chunk
+
+    def finish(self) -> bytes:
+        """Bytes still held back for sniffing when the stream ended."""
+        if self.audio_format is not None:
+            return b""
+        self.audio_format = _require_format(self.head)
+        self.digest.update(self.head)
+        return self.head
+
+    def file_path(self) -> str:
+        """Storage key of the upload; needs the format, so only once it has been sniffed."""
+        return os.path.join(self.upload_dir, f"{self.name}.{self.audio_format}")
+
+    def stored(self, file_path: str) -> StoredUpload:
+        return StoredUpload(
+            os.path.basename(file_path),
+            file_path,
+            self.file_size,
+            self.digest.hexdigest(),
+            self.audio_format
+        )
+
+    def commit(self) -> StoredUpload:
+        file_path = self.file_path()
+        os.replace(self.partial_path, file_path)
+        return self.stored(file_path)
+
+    def discard(self) -> None:
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+def _pull(chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop) -> Iterator[bytes]:
+    """Iterate an async stream from a worker thread; each step runs on the loop that owns the stream."""
+    iterator = chunks.__aiter__()
+
+    async def next_chunk():
+        return await iterator.__anext__()
+
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(next_chunk(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+class ChunkMismatch(Exception):
+    """A chunk had the wrong size or checksum; it has been discarded."""
+
+
+class ChunkStore:
+    """
+    On-disk chunks of resumable upload sessions, one file per chunk index.
+    Each chunk is written to a temporary name and renamed into place only after
+    its size and checksum are verified, so parallel and repeated PUTs of the
+    same index are safe and a listed chunk is always complete.
+    """
+
+    def __init__(self, root: str = None, chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self.root = root or settings.UPLOAD_SESSION_DIR
+        self.chunk_size = chunk_size
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id)
+
+    async def write_chunk(
+        self,
+        session_id: str,
+        index: int,
+        chunks: AsyncIterator[bytes],
+        expected_size: int,
+        expected_sha256: str
+    ) -> int:
+        """Store one chunk from a byte stream. Returns its size."""
+        directory = self.session_dir(session_id)
+        os.makedirs(directory, exist_ok=True)
+        final_path = os.path.join(directory, f"{index:06d}.chunk")
+        tmp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                async for data in chunks:
+                    size += len(data)
+                    if size > expected_size:
+                        raise ChunkMismatch(f"Chunk {index} is larger than {expected_size} bytes")
+                    digest.update(data)
+                    await f.write(data)
+
+            if size != expected_size:
+                raise ChunkMismatch(f"Chunk {index} has {size} bytes, expected {expected_size}")
+            if digest.hexdigest() != expected_sha256.lower():
+                raise ChunkMismatch(f"Chunk {index} checksum mismatch")
+
+            os.replace(tmp_path, final_path)
+            return size
+
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def received(self, session_id: str) -> List[int]:
+        """Indexes of the chunks stored so far, sorted."""
+        directory = self.session_dir(session_id)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name.split(".")[0]) for name in os.listdir(directory) if name.endswith(".chunk"))
+
+    async def assembled(self, session_id: str, total_chunks: int) -> AsyncIterator[bytes]:
+        """The chunks in order, read back in bounded pieces."""
+        directory = self.session_dir(session_id)
+        for index in range(total_chunks):
+            async with aiofiles.open(os.path.join(directory, f"{index:06d}.chunk"), 'rb') as f:
+                while True:
+                    data = await f.read(self.chunk_size)
+                    if not data:
+                        break
+                    yield data
+
+    def remove(self, session_id: str) -> None:
+        shutil.rmtree(self.session_dir(session_id), ignore_errors=True)
+
+
+def sniff_audio_format(head: bytes) -> Optional[str]:
+    """Audio container from the first bytes of a file, or None if unrecognised."""
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        # MP4 family; audio-only uploads are M4A whatever the brand
+        return "m4a"
+    if head[:3] == b"ID3":
+        return "mp3"
+    if len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0 and (head[1] & 0x06) != 0:
+        # MPEG audio frame sync with a valid layer
+        return "mp3"
+    if head[:4] == b"OggS":
+        return "ogg"
+    return None
+
+
+def _require_format(head: bytes) -> str:
+    audio_format = sniff_audio_format(head)
+    if audio_format is None or audio_format not in settings.SUPPORTED_AUDIO_FORMATS:
+        raise UnsupportedAudioFormat(
+            f"Unsupported file format. Supported formats: {', '.join(settings.SUPPORTED_AUDIO_FORMATS)}"
+        )
+    return audio_format
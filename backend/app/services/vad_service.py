@@ -0,0 +1,163 @@
+"""
+Energy-based voice activity detection on normalized PCM.
+Designer: Abdullah Alawiss
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from .pcm_buffer import PCMAudio
+
+FRAME_SECONDS = 0.03
+
+
+class VADService:
+    """
+    Find speech regions from per-frame energy and zero-crossing rate.
+    Everything is computed on whole-array operations, so a one-hour call is
+    a handful of numpy passes rather than a Python loop per frame.
+    """
+
+    def __init__(
+        self,
+        energy_margin_db: float = None,
+        min_speech_seconds: float = None,
+        min_silence_seconds: float = None,
+        padding_seconds: float = None,
+        frame_seconds: float = FRAME_SECONDS
+    ):
+        self.energy_margin_db = settings.VAD_ENERGY_MARGIN_DB if energy_margin_db is None else energy_margin_db
+        self.min_speech_seconds = settings.VAD_MIN_SPEECH_SECONDS if min_speech_seconds is None else min_speech_seconds
+        self.min_silence_seconds = settings.VAD_MIN_SILENCE_SECONDS if min_silence_seconds is None else min_silence_seconds
+        self.padding_seconds = settings.VAD_PADDING_SECONDS if padding_seconds is None else padding_seconds
+        self.frame_seconds = frame_seconds
+
+    def detect_speech(self, audio: PCMAudio) -> List[Tuple[float, float]]:
+        """Return (start, end) speech regions in seconds, sorted and non-overlapping."""
+        is_speech, _ = self.frame_mask(audio)
+        return self.mask_to_regions(is_speech, audio.duration)
+
+    def frame_mask(self, audio: PCMAudio) -> Tuple[np.ndarray, np.ndarray]:
+        """Raw per-frame speech decision plus the frame energy in dB."""
+        energy, zcr = frame_features(audio, self.frame_seconds)
+        if energy.size == 0:
+            return np.zeros(0, dtype=bool), energy
+
+        energy_db = 10.0 * np.log10(energy + 1e-10)
+
+        # Adaptive threshold: a margin above the noise floor, never below absolute silence
+        noise_floor = np.percentile(energy_db, 10)
+        threshold = max(noise_floor + self.energy_margin_db, settings.VAD_ABSOLUTE_FLOOR_DB)
+
+        voiced = energy_db > threshold
+        # Unvoiced consonants are quieter but have a high zero-crossing rate
+        unvoiced = (energy_db > threshold - 6.0) & (zcr > 0.1) & (zcr < 0.5)
+        return voiced | unvoiced, energy_db
+
+    def mask_to_regions(self, is_speech: np.ndarray, duration: float) -> List[Tuple[float, float]]:
+        """Smooth a per-frame speech mask into padded (start, end) regions in seconds."""
+        starts, ends = _runs(is_speech)
+        if starts.size == 0:
+            return []
+
+        # Bridge short pauses, then drop blips that are too short to be speech
+        starts, ends = _merge_gaps(starts, ends, int(self.min_silence_seconds / self.frame_seconds))
+        keep = (ends - starts) >= int(self.min_speech_seconds / self.frame_seconds)
+        starts, ends = starts[keep], ends[keep]
+        if starts.size == 0:
+            return []
+
+        # Pad so word onsets and tails are not clipped
+        start_times = np.maximum(starts * self.frame_seconds - self.padding_seconds, 0.0)
+        end_times = np.minimum(ends * self.frame_seconds + self.padding_seconds, duration)
+        start_times, end_times = _merge_overlaps(start_times, end_times)
+
+        return [(float(s), float(e)) for s, e in zip(start_times, end_times)]
+
+    def extract_speech(self, audio: PCMAudio, regions: List[Tuple[float, float]]) -> PCMAudio:
+        """Concatenate the speech regions into one contiguous signal."""
+        pieces = [audio.slice(start, end).samples for start, end in regions]
+        samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.int16)
+        return PCMAudio(samples, audio.sample_rate)
+
+
+class SpeechTimeline:
+    """Maps timestamps on the speech-only signal back to the original recording."""
+
+    def __init__(self, regions: List[Tuple[float, float]]):
+        regions_array = np.asarray(regions, dtype=np.float64).reshape(-1, 2)
+        self.original_starts = regions_array[:, 0]
+        durations = regions_array[:, 1] - regions_array[:, 0]
+        self.compact_starts = np.concatenate(([0.0], np.cumsum(durations)[:-1])) if len(durations) else np.zeros(0)
+
+    def to_original(self, times: Any, is_end: bool = False) -> np.ndarray:
+        """Vectorized remap. Ends that fall exactly on a boundary stay in the earlier region."""
+        times = np.asarray(times, dtype=np.float64)
+        if self.compact_starts.size == 0:
+            return times
+
+        side = "left" if is_end else "right"
+        index = np.clip(np.searchsorted(self.compact_starts, times, side=side) - 1, 0, None)
+        return self.original_starts[index] + (times - self.compact_starts[index])
+
+    def remap_segments(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return copies of segments with start/end (and duration) on the original timeline."""
+        if not segments:
+            return segments
+
+        starts = self.to_original([s["start"] for s in segments])
+        ends = self.to_original([s["end"] for s in segments], is_end=True)
+
+        remapped = []
+        for segment, start, end in zip(segments, starts, ends):
+            segment = dict(segment)
+            segment["start"] = float(start)
+            segment["end"] = float(end)
+            if "duration" in segment:
+                segment["duration"] = float(end - start)
+            remapped.append(segment)
+        return remapped
+
+
+def frame_features(audio: PCMAudio, frame_seconds: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean-square energy and zero-crossing rate per non-overlapping frame."""
+    frame_length = max(1, int(frame_seconds * audio.sample_rate))
+    num_frames = audio.num_samples // frame_length
+    if num_frames == 0:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty
+
+    frames = audio.samples[:num_frames * frame_length].reshape(num_frames, frame_length)
+    scaled = frames.astype(np.float32) / 32768.0
+    energy = np.einsum("ij,ij->i", scaled, scaled) / frame_length
+
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_length - 1 or 1)
+
+    return energy, zcr.astype(np.float32)
+
+
+def frame_energy(audio: PCMAudio, frame_seconds: float) -> np.ndarray:
+    """Mean-square energy per non-overlapping frame."""
+    return frame_features(audio, frame_seconds)[0]
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start (inclusive) and end (exclusive) indices of runs of True."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _merge_gaps(starts: np.ndarray, ends: np.ndarray, min_gap: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge consecutive runs separated by less than min_gap."""
+    if starts.size <= 1:
+        return starts, ends
+    keep_gap = (starts[1:] - ends[:-1]) >= min_gap
+    return starts[np.concatenate(([True], keep_gap))], ends[np.concatenate((keep_gap, [True]))]
+
+
+def _merge_overlaps(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge sorted intervals that overlap after padding."""
+    return _merge_gaps(starts, ends, 1e-9)
@@ -0,0 +1,149 @@
+"""
+Celery tasks for the compressed archival audio tier.
+Designer: Abdullah Alawiss
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+from sqlalchemy import func, or_
+
+from ..core.celery_config import celery_app
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.call import Call, ProcessingTask
+from ..services.audio_service import AudioService
+from ..services.transcript_importer import TRANSCRIPT_FORMAT
+
+ARCHIVE_EXTENSION = "opus"
+
+@celery_app.task(bind=True, name="archive_old_calls")
+def archive_old_calls(self, min_age_days: int = None, batch_size: int = None) -> Dict[str, Any]:
+    """
+    Transcode the audio of completed calls older than ARCHIVE_AFTER_DAYS to Opus.
+    Stages decode whatever format file_path points at, so reprocessing an
+    archived call needs nothing special. Reports bytes saved.
+    """
+    if not settings.ARCHIVE_ENABLED:
+        return {"status": "disabled"}
+
+    min_age_days = settings.ARCHIVE_AFTER_DAYS if min_age_days is None else min_age_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=min_age_days)
+
+    db = SessionLocal()
+    audio_service = AudioService()
+
+    try:
+        task = ProcessingTask(
+            task_id=self.request.id or f"archive-{datetime.utcnow().isoformat()}",
+            task_type="archive",
+            status="running",
+            started_at=datetime.utcnow(),
+            current_step="archiving"
+        )
+        db.add(task)
+        db.commit()
+
+        # Duplicates share the original's file and follow it when it is archived
+        candidates = db.query(Call.id).filter(
+            Call.status == "completed",
+            Call.archived_at.is_(None),
+            Call.duplicate_of_id.is_(None),
+            or_(Call.format.is_(None), Call.format != TRANSCRIPT_FORMAT),  # Imported transcripts have no audio
+            Call.processed_at < cutoff
+        ).order_by(Call.processed_at).limit(batch_size).all()
+
+        archived, failed = 0, 0
+        bytes_before, bytes_after = 0, 0
+
+        for (call_id,) in candidates:
+            try:
+                saved = _archive_call(db, audio_service, call_id)
+            except Exception as e:
+                db.rollback()
+                failed += 1
+                print(f"Archiving call {call_id} failed: {e}")
+                continue
+
+            if saved:
+                archived += 1
+                bytes_before += saved[0]
+                bytes_after += saved[1]
+
+        result = {
+            "archived": archived,
+            "failed": failed,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_saved": bytes_before - bytes_after,
+            "total_bytes_saved": archive_bytes_saved(db)
+        }
+
+        task.status = "completed"
+        task.progress_percentage = 100
+        task.current_step = "completed"
+        task.completed_at = datetime.utcnow()
+        task.result = result
+        db.commit()
+
+        print(f"Archived {archived} calls, saved {result['bytes_saved'] / 2**20:.1f} MiB")
+        return result
+
+    except Exception as e:
+        db.rollback()
+        if 'task' in locals():
+            task.status = "failed"
+            task.error_message = str(e)
+            task.completed_at = datetime.utcnow()
+            db.commit()
+        raise e
+    finally:
+        db.close()
+
+def _archive_call(db, audio_service: AudioService, call_id: int):
+    """
+    Transcode one call's audio and repoint every call that shares the file.
+    Returns (bytes before, bytes after), or None when the call changed meanwhile.
+    The original is only deleted once the new key is committed.
+    """
+    storage = audio_service.storage
+    call = db.query(Call).filter(Call.id == call_id).first()
+    source_key = call.file_path
+    source_path = audio_service.source_path(source_key)
+    source_size = os.path.getsize(source_path)
+
+    target_key = f"{os.path.splitext(source_key)[0]}.{ARCHIVE_EXTENSION}"
+    target_path = storage.spool_path(target_key)
+    # Call.channels is the normalized (mono) layout; the archive keeps the source's channels
+    archived = audio_service.transcode_for_archive(source_path, target_path)
+    storage.put_file(target_path, target_key, remove_source=True)
+
+    # Re-check under a row lock: a reprocess may have started while transcoding
+    call = db.query(Call).filter(Call.id == call_id).with_for_update().first()
+    if call.status != "completed" or call.file_path != source_key or call.archived_at is not None:
+        db.rollback()
+        storage.delete(target_key)
+        return None
+
+    now = datetime.utcnow()
+    db.query(Call).filter(Call.file_path == source_key).update({
+        Call.file_path: target_key,
+        Call.format: ARCHIVE_EXTENSION,
+        Call.file_size: archived["size"],
+        Call.original_file_size: func.coalesce(Call.original_file_size, Call.file_size),
+        Call.archived_at: now
+    }, synchronize_session=False)
+    db.commit()
+
+    storage.delete(source_key)
+    return source_size, archived["size"]
+
+def archive_bytes_saved(db) -> int:
+    """Storage saved by the archival tier across all archived calls."""
+    saved = db.query(func.sum(Call.original_file_size - Call.file_size)).filter(
+        Call.archived_at.isnot(None),
+        Call.duplicate_of_id.is_(None)
+    ).scalar()
+    return int(saved or 0)
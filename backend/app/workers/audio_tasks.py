@@ -3,12 +3,13 @@ Celery tasks for audio processing (transcription, diarization).
 Designer: Abdullah Alawiss
 """
 
+import math
 import os
 import time
-import openai
 from datetime import datetime
-from typing import Dict, Any, List
-from celery import current_task
+from typing import Dict, Any, List, Union
+from celery import chain, current_task, group
+from celery.signals import worker_process_init
 from sqlalchemy.orm import Session
 
 from ..core.celery_config import celery_app
@@ -16,20 +17,61 @@ from ..core.database import SessionLocal
 from ..models.call import Call, CallTranscript, Speaker, ProcessingTask
 from ..services.audio_service import AudioService
 from ..services.diarization_service import DiarizationService
+from ..services.pcm_buffer import PCMAudio, SharedPCMBuffer, open_stage_audio
+from ..services.chunked_transcriber import ChunkedTranscriber, segment_dict
+from ..services.vad_service import VADService, SpeechTimeline
+from ..services.artifact_store import ArtifactStore, file_sha256
+from ..services.alignment_service import AlignmentService
+from ..services.segments import SegmentArray
+from ..services.model_registry import model_registry, whisper_model_key
+from ..services.openai_client import get_transcription_client
 from ..core.config import settings
 
 # Whisper local import disabled due to Python 3.13 compatibility
 WHISPER_AVAILABLE = False
-whisper = None
+
+# Bump a stage's version when its output format or algorithm changes,
+# so stale artifacts are no longer served from the store
+STAGE_VERSIONS = {"normalize": 1, "transcription": 1, "diarization": 1}
+
+# Planned parts land near, not exactly on, the byte budget; aim below it
+UPLOAD_SPLIT_MARGIN = 1.25
+
+# DAG steps and their share of the progress percentage
+PIPELINE_STEPS = {
+    "normalization": 10,
+    "transcription": 35,
+    "diarization": 25,
+    "alignment": 5,
+    "analysis": 15,
+    "gdpr_processing": 10
+}
+
+@worker_process_init.connect
+def preload_models(**kwargs):
+    """Load models once per worker process so tasks never pay the load time."""
+    if settings.PRELOAD_MODELS:
+        stats = model_registry.preload(settings.PRELOAD_MODELS, warmup=settings.MODEL_WARMUP)
+        print(f"Worker model pool ready: {stats}")
+
+@celery_app.task(bind=True, name="get_model_pool_stats")
+def get_model_pool_stats(self) -> Dict[str, Any]:
+    """Report load time and resident memory of the models in this worker process."""
+    return model_registry.stats()
 
 @celery_app.task(bind=True, name="process_audio_file")
 def process_audio_file(self, call_id: int) -> Dict[str, Any]:
     """
     Main task to process an audio file completely.
-    Steps: validate -> normalize -> transcribe -> diarize -> analyze -> persist
+    Validates and normalizes, then dispatches the rest of the pipeline as a DAG:
+    normalize -> {transcribe || diarize} -> align -> {analyze || redact} -> finalize.
+    Returns as soon as the DAG is dispatched; no task waits on another's result.
     """
     db = SessionLocal()
     task_id = self.request.id
+    normalized_path = None
+    pcm_buffer = None
+    dispatched = False
     
     try:
         # Update task status
@@ -39,7 +81,8 @@ def process_audio_file(self, call_id: int) -> Dict[str, Any]:
             task_type="full_processing",
             status="running",
             started_at=datetime.utcnow(),
-            current_step="initializing"
+            current_step="initializing",
+            result={"completed_steps": []}
         )
         db.add(task)
         db.commit()
@@ -55,115 +98,409 @@ def process_audio_file(self, call_id: int) -> Dict[str, Any]:
         # Step 1: Audio validation and normalization
         current_task.update_state(
             state="PROGRESS",
-            meta={"current_step": "audio_validation", "progress": 10}
+            meta={"current_step": "audio_validation", "progress": 0}
         )
         task.current_step = "audio_validation"
-        task.progress_percentage = 10
         db.commit()
         
         audio_service = AudioService()
-        normalized_path = audio_service.validate_and_normalize(call.file_path)
-        
-        # Get audio metadata
-        metadata = audio_service.get_audio_metadata(normalized_path)
+        pcm_ref = None
+        store, normalize_key = _stage_store(db, call, "normalize", _normalization_params())
+        stored_path = store.get_file(normalize_key, ".wav") if store else None
+        # Local copy of the recording; with object storage, from this worker's cache
+        source_path = audio_service.source_path(call.file_path)
+        
+        if settings.AUDIO_NORMALIZATION_MODE == "memory":
+            # Normalized PCM lives in shared memory; stages attach to it by name.
+            # A stored normalization is already 16kHz mono PCM and is copied in directly.
+            if stored_path:
+                pcm_buffer = SharedPCMBuffer.from_samples(PCMAudio.from_wav(stored_path))
+            else:
+                pcm_buffer = audio_service.validate_and_normalize_to_buffer(source_path)
+            pcm_ref = pcm_buffer.ref()
+            normalized_path = source_path
+            metadata = pcm_buffer.audio.metadata()
+        else:
+            # Named after the storage key, so it never lands inside the read-through cache
+            normalized_path = audio_service.normalized_path_for(call.file_path)
+            if not (store and store.link_file(normalize_key, ".wav", normalized_path)):
+                normalized_path = audio_service.validate_and_normalize(source_path, normalized_path)
+                if store:
+                    store.put_file(normalize_key, ".wav", normalized_path)
+            # Read from the normalized WAV header, no ffprobe
+            metadata = audio_service.get_audio_metadata(normalized_path)
+        
+        # Metadata is handed to every later stage so none of them probe again
         call.duration_seconds = metadata.get("duration")
         call.sample_rate = metadata.get("sample_rate")
         call.channels = metadata.get("channels")
         db.commit()
         
-        # Step 2: Transcription with Whisper
-        current_task.update_state(
-            state="PROGRESS", 
-            meta={"current_step": "transcription", "progress": 30}
-        )
-        task.current_step = "transcription"
-        task.progress_percentage = 30
-        db.commit()
+        # Voice activity detection: later stages only process speech
+        speech_regions = None
+        if settings.VAD_ENABLED:
+            speech_regions, normalized_path, pcm_buffer = _skip_silence(
+                normalized_path, pcm_buffer, source_path
+            )
+            if speech_regions is not None and pcm_buffer is not None:
+                pcm_ref = pcm_buffer.ref()
+                metadata = pcm_buffer.audio.metadata()
+            elif speech_regions is not None:
+                metadata = audio_service.get_audio_metadata(normalized_path)
         
-        transcript_result = transcribe_audio.delay(call_id, normalized_path).get()
+        # Downmixing hides stereo telephony; diarization needs to know about it
+        metadata["source_channels"] = audio_service.get_audio_metadata(source_path).get("channels")
         
-        # Step 3: Speaker Diarization
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current_step": "diarization", "progress": 60}
-        )
-        task.current_step = "diarization"
-        task.progress_percentage = 60
-        db.commit()
+        record_pipeline_step(call_id, "normalization")
         
-        diarization_result = diarize_audio.delay(call_id, normalized_path).get()
+        # Whatever the stages read is released by the finalize or error task
+        cleanup = {
+            "pcm_ref": pcm_ref,
+            "files": [normalized_path] if normalized_path != source_path else []
+        }
         
-        # Step 4: Analysis
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current_step": "analysis", "progress": 80}
+        from .analysis_tasks import analyze_call
+        from .gdpr_tasks import redact_sensitive_data
+        
+        stage_args = (call_id, normalized_path, metadata, pcm_ref, speech_regions)
+        workflow = chain(
+            group(transcribe_audio.si(*stage_args), diarize_audio.si(*stage_args)),
+            align_stage_results.s(call_id),
+            group(analyze_call.si(call_id), redact_sensitive_data.si(call_id)),
+            finalize_processing.s(call_id, task_id, cleanup)
         )
-        task.current_step = "analysis"
-        task.progress_percentage = 80
-        db.commit()
+        workflow.on_error(pipeline_failed.s(call_id, task_id, cleanup))
+        workflow.apply_async()
+        dispatched = True
         
-        from .analysis_tasks import analyze_call
-        analysis_result = analyze_call.delay(call_id).get()
+        # The stages attach to the segment by name; unlinking is now the DAG's job
+        if pcm_buffer is not None:
+            pcm_buffer.detach()
         
-        # Step 5: GDPR Processing
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current_step": "gdpr_processing", "progress": 90}
+        return {
+            "status": "dispatched",
+            "call_id": call_id,
+            "steps": list(PIPELINE_STEPS)
+        }
+        
+    except Exception as e:
+        # Handle errors
+        if 'call' in locals() and call:
+            call.status = "failed"
+            db.commit()
+        
+        if 'task' in locals():
+            task.status = "failed"
+            task.error_message = str(e)
+            task.completed_at = datetime.utcnow()
+            db.commit()
+        
+        raise e
+    
+    finally:
+        # Without a dispatched DAG nobody else will clean up the normalization output
+        if not dispatched:
+            if pcm_buffer is not None:
+                pcm_buffer.release()
+            if normalized_path and 'source_path' in locals() and normalized_path != source_path:
+                if os.path.exists(normalized_path):
+                    os.remove(normalized_path)
+        db.close()
+
+@celery_app.task(bind=True, name="align_stage_results")
+def align_stage_results(self, stage_results: List[Dict[str, Any]], call_id: int) -> Dict[str, Any]:
+    """
+    Join point of the parallel transcription and diarization branches:
+    attribute every transcript segment to the speaker who said it.
+    """
+    transcript_result, diarization_result = stage_results
+    db = SessionLocal()
+    
+    try:
+        transcript = db.query(CallTranscript).filter(CallTranscript.call_id == call_id).first()
+        if not transcript:
+            raise Exception(f"No transcript found for call {call_id}")
+        
+        speakers = db.query(Speaker).filter(Speaker.call_id == call_id).all()
+        
+        aligned_segments = AlignmentService().align(
+            transcript.segments or [],
+            {speaker.speaker_id: speaker.segments or [] for speaker in speakers},
+            {speaker.speaker_id: speaker.speaker_label for speaker in speakers}
         )
-        task.current_step = "gdpr_processing"
-        task.progress_percentage = 90
+        
+        transcript.aligned_segments = aligned_segments
         db.commit()
         
-        from .gdpr_tasks import redact_sensitive_data
-        gdpr_result = redact_sensitive_data.delay(call_id).get()
+        alignment_result = {
+            "segments_count": len(aligned_segments),
+            "unattributed_segments": sum(1 for s in aligned_segments if s["speaker"] is None),
+            "overlapping_speech_segments": sum(1 for s in aligned_segments if s["overlapping_speakers"])
+        }
+        
+        record_pipeline_step(call_id, "alignment", {
+            "transcript": transcript_result,
+            "diarization": diarization_result,
+            "alignment": alignment_result
+        })
+        
+        return dict(alignment_result, call_id=call_id)
+        
+    except Exception as e:
+        raise e
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="finalize_processing")
+def finalize_processing(
+    self,
+    stage_results: List[Dict[str, Any]],
+    call_id: int,
+    task_id: str,
+    cleanup: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """Last node of the DAG: mark the call completed and release the normalized audio."""
+    db = SessionLocal()
+    
+    try:
+        analysis_result, gdpr_result = stage_results
+        
+        call = db.query(Call).filter(Call.id == call_id).first()
+        if not call:
+            raise Exception(f"Call with ID {call_id} not found")
+        
+        task = db.query(ProcessingTask).filter(ProcessingTask.task_id == task_id).first()
         
         # Final step: Mark as completed
         call.status = "completed"
         call.processed_at = datetime.utcnow()
         
-        task.status = "completed"
-        task.progress_percentage = 100
-        task.current_step = "completed"
-        task.completed_at = datetime.utcnow()
-        task.result = {
-            "transcript": transcript_result,
-            "diarization": diarization_result, 
-            "analysis": analysis_result,
-            "gdpr": gdpr_result
-        }
+        processing_time = None
+        if task:
+            task.status = "completed"
+            task.progress_percentage = 100
+            task.current_step = "completed"
+            task.completed_at = datetime.utcnow()
+            task.result = dict(
+                task.result or {},
+                analysis=analysis_result,
+                gdpr=gdpr_result
+            )
+            if task.started_at:
+                processing_time = (task.completed_at - task.started_at).total_seconds()
         
         db.commit()
         
-        # Clean up temporary files
-        if os.path.exists(normalized_path) and normalized_path != call.file_path:
-            os.remove(normalized_path)
-        
         return {
             "status": "completed",
             "call_id": call_id,
-            "processing_time": time.time(),
-            "steps_completed": ["validation", "transcription", "diarization", "analysis", "gdpr"]
+            "processing_time": processing_time,
+            "steps_completed": list(PIPELINE_STEPS)
         }
         
     except Exception as e:
-        # Handle errors
-        if 'call' in locals():
+        raise e
+    finally:
+        _release_stage_inputs(cleanup)
+        db.close()
+
+@celery_app.task(name="pipeline_failed")
+def pipeline_failed(
+    request: Any,
+    exc: Exception,
+    traceback: str,
+    call_id: int,
+    task_id: str,
+    cleanup: Dict[str, Any] = None
+) -> None:
+    """
+    Error callback of the DAG. Runs once per failed node, so it must be idempotent.
+    Not bound: Celery only passes (request, exc, traceback) to errbacks whose
+    signature it can inspect, and a bound task's is hidden behind a partial.
+    """
+    db = SessionLocal()
+    
+    try:
+        call = db.query(Call).filter(Call.id == call_id).first()
+        if call:
             call.status = "failed"
-            db.commit()
         
-        if 'task' in locals():
+        task = db.query(ProcessingTask).filter(ProcessingTask.task_id == task_id).first()
+        if task and task.status != "failed":
             task.status = "failed"
-            task.error_message = str(e)
+            task.error_message = f"{getattr(request, 'task', 'stage')}: {exc}"
             task.completed_at = datetime.utcnow()
-            db.commit()
         
-        raise e
+        db.commit()
+    finally:
+        _release_stage_inputs(cleanup)
+        db.close()
+
+def _release_stage_inputs(cleanup: Dict[str, Any] = None) -> None:
+    """Remove the shared-memory segment and temporary files the stages read from."""
+    if not cleanup:
+        return
+    
+    if cleanup.get("pcm_ref"):
+        SharedPCMBuffer.unlink_ref(cleanup["pcm_ref"])
     
+    for path in cleanup.get("files") or []:
+        if os.path.exists(path):
+            os.remove(path)
+
+def record_pipeline_step(call_id: int, step: str, result: Dict[str, Any] = None) -> None:
+    """
+    Mark one DAG step as done on the call's running full_processing task.
+    Parallel branches finish in any order, so progress is the summed weight of
+    the completed steps rather than the position of the latest one.
+    No-op when the stage runs outside a pipeline (e.g. a manual re-analysis).
+    """
+    db = SessionLocal()
+    
+    try:
+        task = (
+            db.query(ProcessingTask)
+            .filter(
+                ProcessingTask.call_id == call_id,
+                ProcessingTask.task_type == "full_processing",
+                ProcessingTask.status == "running"
+            )
+            .order_by(ProcessingTask.id.desc())
+            .with_for_update()
+            .first()
+        )
+        if not task:
+            return
+        
+        state = dict(task.result or {})
+        completed = [s for s in state.get("completed_steps", []) if s != step] + [step]
+        state["completed_steps"] = completed
+        if result:
+            state.update(result)
+        
+        task.result = state
+        task.current_step = step
+        task.progress_percentage = min(99, sum(PIPELINE_STEPS.get(s, 0) for s in completed))
+        db.commit()
     finally:
         db.close()
 
+def _input_hash(db: Session, call: Call) -> str:
+    """
+    Content hash of the audio the stages read. The upload's hash is computed
+    once and kept on the call; an archived call is read from its Opus
+    transcode, so that file is hashed instead and its outputs get keys of
+    their own rather than overwriting the original's.
+    """
+    if call.archived_at is not None:
+        return file_sha256(AudioService().source_path(call.file_path))
+    if not call.content_hash:
+        call.content_hash = file_sha256(AudioService().source_path(call.file_path))
+        db.commit()
+    return call.content_hash
+
+def _stage_store(db: Session, call: Call, stage: str, params: Dict[str, Any]):
+    """Artifact store and key for one stage, or (None, None) when the store is disabled."""
+    if not settings.ARTIFACT_STORE_ENABLED:
+        return None, None
+    store = ArtifactStore()
+    return store, store.make_key(_input_hash(db, call), stage, params)
+
+def _normalization_params() -> Dict[str, Any]:
+    return {
+        "version": STAGE_VERSIONS["normalize"],
+        "sample_rate": 16000,
+        "channels": 1,
+        "codec": "pcm_s16le"
+    }
+
+def _vad_params() -> Dict[str, Any]:
+    if not settings.VAD_ENABLED:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "min_silence_ratio": settings.VAD_MIN_SILENCE_RATIO,
+        "energy_margin_db": settings.VAD_ENERGY_MARGIN_DB,
+        "absolute_floor_db": settings.VAD_ABSOLUTE_FLOOR_DB,
+        "min_speech_seconds": settings.VAD_MIN_SPEECH_SECONDS,
+        "min_silence_seconds": settings.VAD_MIN_SILENCE_SECONDS,
+        "padding_seconds": settings.VAD_PADDING_SECONDS
+    }
+
+def _transcription_params() -> Dict[str, Any]:
+    use_api = bool(getattr(settings, 'OPENAI_API_KEY', None))
+    return {
+        "version": STAGE_VERSIONS["transcription"],
+        "normalize": _normalization_params(),
+        "backend": "openai" if use_api else "local",
+        "model": "whisper-1" if use_api else settings.LOCAL_WHISPER_MODEL,
+        "upload_codec": f"{settings.OPENAI_UPLOAD_CODEC}@{settings.OPENAI_UPLOAD_BITRATE}" if use_api else None,
+        "language": "no",
+        "vad": _vad_params(),
+        "chunking": {
+            "enabled": settings.TRANSCRIPTION_CHUNKING_ENABLED,
+            "window_seconds": settings.TRANSCRIPTION_CHUNK_SECONDS,
+            "overlap_seconds": settings.TRANSCRIPTION_CHUNK_OVERLAP_SECONDS
+        }
+    }
+
+def _diarization_params() -> Dict[str, Any]:
+    return {
+        "version": STAGE_VERSIONS["diarization"],
+        "normalize": _normalization_params(),
+        "model": settings.DIARIZATION_MODEL,
+        "vad": _vad_params(),
+        "stereo": {
+            "enabled": settings.STEREO_DIARIZATION_ENABLED,
+            "agent_channel": settings.STEREO_AGENT_CHANNEL,
+            "crosstalk_db": settings.STEREO_CROSSTALK_DB
+        }
+    }
+
+def _skip_silence(normalized_path: str, pcm_buffer: SharedPCMBuffer, source_path: str):
+    """
+    Run VAD on the normalized audio and swap it for a speech-only version.
+    Returns (speech_regions, normalized_path, pcm_buffer); speech_regions is None
+    (and the inputs are returned unchanged) when there is too little silence to cut.
+    """
+    audio = pcm_buffer.audio if pcm_buffer is not None else PCMAudio.from_wav(normalized_path)
+    vad = VADService()
+    regions = vad.detect_speech(audio)
+    
+    speech_seconds = sum(end - start for start, end in regions)
+    if not regions or audio.duration == 0 or 1 - speech_seconds / audio.duration < settings.VAD_MIN_SILENCE_RATIO:
+        return None, normalized_path, pcm_buffer
+    
+    speech = vad.extract_speech(audio, regions)
+    del audio
+    
+    if pcm_buffer is not None:
+        compact = SharedPCMBuffer.from_samples(speech)
+        pcm_buffer.release()
+        return [list(region) for region in regions], normalized_path, compact
+    
+    speech_path = f"{os.path.splitext(normalized_path)[0]}_speech.wav"
+    try:
+        speech.write_wav(speech_path)
+    except Exception:
+        if os.path.exists(speech_path):
+            os.remove(speech_path)
+        raise
+    
+    if normalized_path != source_path and os.path.exists(normalized_path):
+        os.remove(normalized_path)
+    
+    return [list(region) for region in regions], speech_path, None
+
 @celery_app.task(bind=True, name="transcribe_audio")
-def transcribe_audio(self, call_id: int, audio_path: str) -> Dict[str, Any]:
+def transcribe_audio(
+    self,
+    call_id: int,
+    audio_path: str,
+    metadata: Dict[str, Any] = None,
+    pcm_ref: Dict[str, Any] = None,
+    speech_regions: List[List[float]] = None
+) -> Dict[str, Any]:
     """Transcribe audio using OpenAI Whisper API or local whisper as fallback."""
     db = SessionLocal()
     
@@ -174,39 +511,68 @@ def transcribe_audio(self, call_id: int, audio_path: str) -> Dict[str, Any]:
         
         start_time = time.time()
         
-        # Try OpenAI API first (more reliable for production)
-        if hasattr(settings, 'OPENAI_API_KEY') and settings.OPENAI_API_KEY:
-            try:
-                result = transcribe_with_openai_api(audio_path)
-            except Exception as e:
-                print(f"OpenAI API failed: {e}, falling back to local whisper")
-                result = transcribe_with_local_whisper(audio_path)
-        else:
-            # Fallback to local whisper or mock
-            result = transcribe_with_local_whisper(audio_path)
+        # Same audio with the same parameters was transcribed before: reuse it
+        store, store_key = _stage_store(db, call, "transcription", _transcription_params())
+        result = store.get_json(store_key) if store else None
+        
+        if result is None:
+            with open_stage_audio(audio_path, pcm_ref) as audio:
+                duration = (metadata or {}).get("duration") or 0.0
+                
+                if settings.TRANSCRIPTION_CHUNKING_ENABLED and duration > settings.TRANSCRIPTION_CHUNK_SECONDS:
+                    # Long recordings are split at pauses and transcribed in parallel
+                    result = transcribe_in_chunks(audio)
+                # Try OpenAI API first (more reliable for production)
+                elif hasattr(settings, 'OPENAI_API_KEY') and settings.OPENAI_API_KEY:
+                    try:
+                        result = transcribe_with_openai_api(audio)
+                    except Exception as e:
+                        print(f"OpenAI API failed: {e}, falling back to local whisper")
+                        result = dict(transcribe_with_local_whisper(audio, metadata), degraded=True)
+                else:
+                    # Fallback to local whisper or mock
+                    result = transcribe_with_local_whisper(audio, metadata)
+            
+            segments = [segment_dict(segment) for segment in result.get("segments") or []]
+            if speech_regions:
+                # Timestamps refer to the speech-only signal; map them back onto the call
+                segments = SpeechTimeline(speech_regions).remap_segments(segments)
+            result = dict(result, segments=segments)
+            
+            # Mock output is a placeholder, never worth serving again; a fallback
+            # result would be served under the key of the model that failed
+            degraded = result.get("degraded") or str(result.get("model", "")).startswith("mock")
+            if store and not degraded:
+                store.put_json(store_key, result)
         
+        segments = result["segments"]
         processing_time = time.time() - start_time
         
-        # Create transcript record
-        transcript = CallTranscript(
-            call_id=call_id,
-            raw_text=result["text"],
-            language=result.get("language", "no"),
-            confidence=result.get("confidence", 0.0),
-            segments=result.get("segments", []),
-            whisper_model=result.get("model", "unknown"),
-            processing_time_seconds=processing_time
-        )
+        # Create transcript record, replacing the one from an earlier run
+        transcript = db.query(CallTranscript).filter(CallTranscript.call_id == call_id).first()
+        if not transcript:
+            transcript = CallTranscript(call_id=call_id)
+            db.add(transcript)
+        
+        transcript.raw_text = result["text"]
+        transcript.processed_text = None
+        transcript.language = result.get("language", "no")
+        transcript.confidence = result.get("confidence", 0.0)
+        transcript.segments = segments
+        transcript.aligned_segments = None
+        transcript.whisper_model = result.get("model", "unknown")
+        transcript.processing_time_seconds = processing_time
         
-        db.add(transcript)
         db.commit()
         db.refresh(transcript)
         
+        record_pipeline_step(call_id, "transcription")
+        
         return {
             "transcript_id": transcript.id,
             "text": result["text"],
             "language": result.get("language"),
-            "segments_count": len(result.get("segments", [])),
+            "segments_count": len(segments),
             "processing_time": processing_time
         }
         
@@ -215,34 +581,75 @@ def transcribe_audio(self, call_id: int, audio_path: str) -> Dict[str, Any]:
     finally:
         db.close()
 
-def transcribe_with_openai_api(audio_path: str) -> Dict[str, Any]:
-    """Transcribe using OpenAI Whisper API."""
-    client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-    
-    with open(audio_path, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            language="no",
-            response_format="verbose_json",
-            timestamp_granularities=["segment"]
+def transcribe_in_chunks(audio: Union[str, PCMAudio]) -> Dict[str, Any]:
+    """Transcribe normalized audio as silence-aligned chunks with a bounded pool."""
+    if not isinstance(audio, PCMAudio):
+        # Memory-mapped: chunks are sliced from the page cache, not read up front
+        audio = PCMAudio.from_wav(audio)
+    
+    if hasattr(settings, 'OPENAI_API_KEY') and settings.OPENAI_API_KEY:
+        # The client already retries with backoff; a failing chunk goes straight to the fallback
+        transcriber = ChunkedTranscriber(
+            backend=transcribe_with_openai_api,
+            fallback=transcribe_with_local_whisper,
+            max_retries=0
+        )
+    else:
+        # Local inference is compute bound; parallel chunks would only contend
+        transcriber = ChunkedTranscriber(backend=transcribe_with_local_whisper, max_workers=1)
+    
+    return transcriber.transcribe(audio)
+
+def transcribe_with_openai_api(audio: Union[str, PCMAudio]) -> Dict[str, Any]:
+    """
+    Transcribe using OpenAI Whisper API. Accepts a file path or in-memory PCM.
+    The upload is compressed first; audio still over the API's size limit is
+    split at pauses into parts that fit and stitched back onto one timeline.
+    """
+    if not isinstance(audio, PCMAudio):
+        audio = PCMAudio.from_wav(audio)
+    
+    audio_service = AudioService()
+    try:
+        file_name, payload = audio_service.encode_for_upload(audio)
+    except ValueError as e:
+        print(f"Upload compression failed: {e}, sending WAV")
+        file_name, payload = audio_service.encode_for_upload(audio, codec="wav")
+    
+    if len(payload) > settings.OPENAI_UPLOAD_MAX_BYTES:
+        parts = math.ceil(len(payload) * UPLOAD_SPLIT_MARGIN / settings.OPENAI_UPLOAD_MAX_BYTES)
+        print(f"Upload is {len(payload)} bytes, splitting {audio.duration:.0f}s of audio into {parts} parts")
+        transcriber = ChunkedTranscriber(
+            backend=transcribe_with_openai_api,
+            window_seconds=audio.duration / parts,
+            max_retries=0
         )
+        return transcriber.transcribe(audio)
+    
+    transcript = get_transcription_client().transcribe(
+        (file_name, payload),
+        model="whisper-1",
+        language="no",
+        response_format="verbose_json",
+        timestamp_granularities=["segment"]
+    )
     
     return {
         "text": transcript.text,
         "language": transcript.language or "no",
         "confidence": 0.9,  # OpenAI doesn't provide confidence scores
         "segments": getattr(transcript, 'segments', []),
-        "model": "whisper-1-api"
+        "model": "whisper-1-api",
+        "upload_bytes": len(payload)
     }
 
-def transcribe_with_local_whisper(audio_path: str) -> Dict[str, Any]:
+def transcribe_with_local_whisper(audio: Union[str, PCMAudio], metadata: Dict[str, Any] = None) -> Dict[str, Any]:
     """Transcribe using local whisper model or mock."""
-    if WHISPER_AVAILABLE:
+    if WHISPER_AVAILABLE or settings.LOCAL_WHISPER_MODEL == "mock":
         try:
-            model = whisper.load_model("base")  # Use smaller model for free tier
+            model = model_registry.get(whisper_model_key())  # Loaded once per worker
             result = model.transcribe(
-                audio_path,
+                audio.as_float32() if isinstance(audio, PCMAudio) else audio,
                 language="no",
                 task="transcribe",
                 verbose=False
@@ -253,24 +660,19 @@ def transcribe_with_local_whisper(audio_path: str) -> Dict[str, Any]:
                 "language": result.get("language", "no"),
                 "confidence": 0.8,
                 "segments": result.get("segments", []),
-                "model": "whisper-base-local"
+                "model": f"whisper-{settings.LOCAL_WHISPER_MODEL}-local"
             }
         except Exception as e:
             print(f"Local whisper failed: {e}, using mock transcription")
-            return create_mock_transcription(audio_path)
+            return create_mock_transcription(audio, metadata)
     else:
         print("Whisper not available, using mock transcription")
-        return create_mock_transcription(audio_path)
+        return create_mock_transcription(audio, metadata)
 
-def create_mock_transcription(audio_path: str) -> Dict[str, Any]:
+def create_mock_transcription(audio: Union[str, PCMAudio], metadata: Dict[str, Any] = None) -> Dict[str, Any]:
     """Create mock transcription for development/testing."""
-    # Get audio duration
-    try:
-        import ffmpeg
-        probe = ffmpeg.probe(audio_path)
-        duration = float(probe['format']['duration'])
-    except:
-        duration = 120.0
+    # Get audio duration from the metadata probed upstream
+    duration = (metadata or {}).get("duration") or 120.0
     
     mock_text = """
     Agent: Hei, takk for at du ringte Telenor kundeservice. Mitt navn er Sarah, hvordan kan jeg hjelpe deg i dag?
@@ -305,7 +707,14 @@ def create_mock_transcription(audio_path: str) -> Dict[str, Any]:
     }
 
 @celery_app.task(bind=True, name="diarize_audio") 
-def diarize_audio(self, call_id: int, audio_path: str) -> Dict[str, Any]:
+def diarize_audio(
+    self,
+    call_id: int,
+    audio_path: str,
+    metadata: Dict[str, Any] = None,
+    pcm_ref: Dict[str, Any] = None,
+    speech_regions: List[List[float]] = None
+) -> Dict[str, Any]:
     """Perform speaker diarization on audio."""
     db = SessionLocal()
     
@@ -314,17 +723,45 @@ def diarize_audio(self, call_id: int, audio_path: str) -> Dict[str, Any]:
         if not call:
             raise Exception(f"Call with ID {call_id} not found")
         
-        # Perform diarization
-        diarization_service = DiarizationService()
-        diarization_result = diarization_service.diarize(audio_path)
+        # Same audio with the same parameters was diarized before: reuse it
+        store, store_key = _stage_store(db, call, "diarization", _diarization_params())
+        diarization_result = store.get_json(store_key) if store else None
+        
+        if diarization_result is None and settings.STEREO_DIARIZATION_ENABLED and (metadata or {}).get("source_channels") == 2:
+            # Agent and customer on separate channels: no pyannote needed.
+            # Works on the original file, so timestamps are already global.
+            audio_service = AudioService()
+            diarization_result = audio_service.channel_speaker_segments(audio_service.source_path(call.file_path))
+            if diarization_result is not None and store:
+                store.put_json(store_key, diarization_result)
+        
+        if diarization_result is None:
+            # Perform diarization
+            diarization_service = DiarizationService()
+            with open_stage_audio(audio_path, pcm_ref) as audio:
+                diarization_result = diarization_service.diarize(audio, metadata)
+            
+            if speech_regions:
+                timeline = SpeechTimeline(speech_regions)
+                diarization_result = {
+                    speaker_id: timeline.remap_segments(segments)
+                    for speaker_id, segments in diarization_result.items()
+                }
+            
+            # Mock segments (no pipeline, or the pipeline failed) are never stored
+            if store and not diarization_service.used_mock:
+                store.put_json(store_key, diarization_result)
         
         speakers_created = []
         
+        # Speakers from an earlier run would otherwise be aligned against the new transcript
+        db.query(Speaker).filter(Speaker.call_id == call_id).delete()
+        
+        speaker_stats = SegmentArray.from_speaker_dict(diarization_result).statistics()
+        
         # Process each speaker
         for speaker_id, segments in diarization_result.items():
-            total_speaking_time = sum(
-                segment["end"] - segment["start"] for segment in segments
-            )
+            total_speaking_time = speaker_stats.get(speaker_id, {}).get("total_speaking_time", 0.0)
             
             # Determine speaker label (basic heuristic)
             speaker_label = "Agent" if speaker_id == "SPEAKER_00" else "Customer"
@@ -347,6 +784,8 @@ def diarize_audio(self, call_id: int, audio_path: str) -> Dict[str, Any]:
         
         db.commit()
         
+        record_pipeline_step(call_id, "diarization")
+        
         return {
             "speakers_count": len(speakers_created),
             "speakers": speakers_created
@@ -359,32 +798,5 @@ def diarize_audio(self, call_id: int, audio_path: str) -> Dict[str, Any]:
 
 @celery_app.task(bind=True, name="extract_audio_metadata")
 def extract_audio_metadata(self, file_path: str) -> Dict[str, Any]:
-    """Extract metadata from audio file using ffmpeg."""
-    
-    try:
-        probe = ffmpeg.probe(file_path)
-        
-        # Get audio stream info
-        audio_stream = next(
-            (stream for stream in probe['streams'] if stream['codec_type'] == 'audio'),
-            None
-        )
-        
-        if not audio_stream:
-            raise Exception("No audio stream found in file")
-        
-        metadata = {
-            "duration": float(probe['format']['duration']),
-            "size": int(probe['format']['size']),
-            "bit_rate": int(probe['format'].get('bit_rate', 0)),
-            "format_name": probe['format']['format_name'],
-            "sample_rate": int(audio_stream.get('sample_rate', 0)),
-            "channels": int(audio_stream.get('channels', 0)),
-            "codec": audio_stream.get('codec_name'),
-            "bit_depth": audio_stream.get('bits_per_sample')
-        }
-        
-        return metadata
-        
-    except Exception as e:
-        raise Exception(f"Failed to extract metadata: {str(e)}")
+    """Extract metadata from audio file (cached, shares AudioService's probe)."""
+    return AudioService().get_audio_metadata(file_path)
@@ -4,14 +4,17 @@ Designer: Abdullah Alawiss
 """
 
 import re
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
+from celery import chord
 
 from ..core.celery_config import celery_app
+from ..core.config import settings
 from ..core.database import SessionLocal
-from ..models.call import Call, CallTranscript
-from ..services.redaction_service import RedactionService
+from ..models.call import Call, CallTranscript, ProcessingTask
 
 @celery_app.task(bind=True, name="redact_sensitive_data")
 def redact_sensitive_data(self, call_id: int) -> Dict[str, Any]:
@@ -31,6 +34,7 @@ def redact_sensitive_data(self, call_id: int) -> Dict[str, Any]:
             raise Exception(f"No transcript found for call {call_id}")
         
         # Initialize redaction service
+        from ..services.redaction_service import RedactionService
         redaction_service = RedactionService()
         
         # Redact the transcript
@@ -43,6 +47,9 @@ def redact_sensitive_data(self, call_id: int) -> Dict[str, Any]:
         transcript.processed_text = redacted_result["redacted_text"]
         db.commit()
         
+        from .audio_tasks import record_pipeline_step
+        record_pipeline_step(call_id, "gdpr_processing")
+        
         return {
             "call_id": call_id,
             "redactions_applied": redacted_result["redactions_count"],
@@ -56,6 +63,237 @@ def redact_sensitive_data(self, call_id: int) -> Dict[str, Any]:
     finally:
         db.close()
 
+@celery_app.task(bind=True, name="bulk_reredact_transcripts")
+def bulk_reredact_transcripts(
+    self,
+    batch_size: int = None,
+    workers: int = None,
+    resume: bool = True
+) -> Dict[str, Any]:
+    """
+    Regenerate processed_text for every transcript after the PII detectors change.
+    Transcripts are taken in id-ordered batches; each batch is split into shards
+    redacted by parallel subtasks (a chord), which write back with one bulk UPDATE
+    each. The chord callback checkpoints the last id on a ProcessingTask row and
+    queues the next batch, so an interrupted run continues where it stopped.
+    Nothing waits on subtask results, so this is safe under the prefork pool.
+    While a run is in progress, triggering another one does nothing.
+    """
+    batch_size = batch_size or settings.REDACTION_BATCH_SIZE
+    workers = workers or settings.REDACTION_WORKERS
+    db = SessionLocal()
+    
+    try:
+        checkpoint, in_flight = _load_redaction_checkpoint(db, self.request.id, resume)
+        if checkpoint is None:
+            return {
+                "ruleset_version": (in_flight.result or {}).get("ruleset_version"),
+                "checkpoint_task_id": in_flight.task_id,
+                "status": "already_running"
+            }
+        
+        state = dict(checkpoint.result or {})
+        state.update({
+            "total": db.query(func.count(CallTranscript.id)).scalar() or 0,
+            "run_started_at": time.time(),
+            "updated_at": time.time(),
+            "processed_at_run_start": state.get("processed", 0)
+        })
+        checkpoint.result = state
+        db.commit()
+        
+        dispatched = _dispatch_redaction_batch(db, checkpoint, batch_size, workers)
+        return {
+            "ruleset_version": settings.REDACTION_RULESET_VERSION,
+            "checkpoint_task_id": checkpoint.task_id,
+            "status": "running" if dispatched else "completed",
+            "resumed_from_id": state.get("last_id", 0)
+        }
+        
+    except Exception as e:
+        db.rollback()
+        if 'checkpoint' in locals():
+            checkpoint.status = "failed"
+            checkpoint.error_message = str(e)
+            db.commit()
+        raise e
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="redact_transcript_batch")
+def redact_transcript_batch(self, transcript_ids: List[int]) -> int:
+    """Redact one shard of transcripts in this process and write them back in one bulk UPDATE."""
+    db = SessionLocal()
+    
+    try:
+        rows = db.query(CallTranscript.id, CallTranscript.raw_text).filter(
+            CallTranscript.id.in_(transcript_ids)
+        ).all()
+        if rows:
+            db.execute(
+                update(CallTranscript),
+                [{"id": row.id, "processed_text": redact_text(row.raw_text)["redacted_text"]} for row in rows]
+            )
+            db.commit()
+        return len(rows)
+        
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="continue_bulk_redaction")
+def continue_bulk_redaction(
+    self,
+    shard_counts: List[int],
+    checkpoint_id: int,
+    last_id: int,
+    batch_size: int,
+    workers: int
+) -> Dict[str, Any]:
+    """Chord callback: checkpoint the finished batch, report progress and queue the next one."""
+    db = SessionLocal()
+    
+    try:
+        checkpoint = db.query(ProcessingTask).filter(ProcessingTask.id == checkpoint_id).first()
+        if checkpoint is None or checkpoint.status != "running":
+            return {"status": "stopped"}
+        
+        state = dict(checkpoint.result or {})
+        processed = state.get("processed", 0) + sum(shard_counts)
+        total = state.get("total", 0)
+        elapsed = time.time() - state.get("run_started_at", time.time())
+        processed_this_run = processed - state.get("processed_at_run_start", 0)
+        
+        state.update({
+            "last_id": last_id,
+            "processed": processed,
+            "updated_at": time.time(),
+            "transcripts_per_second": round(processed_this_run / elapsed, 2) if elapsed > 0 else 0.0
+        })
+        checkpoint.result = state
+        checkpoint.progress_percentage = min(int(processed / total * 100), 99) if total else 99
+        checkpoint.current_step = f"redacted up to transcript {last_id}"
+        db.commit()
+        
+        dispatched = _dispatch_redaction_batch(db, checkpoint, batch_size, workers)
+        return {"status": "running" if dispatched else "completed", **state}
+        
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="fail_bulk_redaction")
+def fail_bulk_redaction(self, checkpoint_id: int) -> None:
+    """Error callback of a batch chord; the checkpoint keeps the last finished batch for resume."""
+    db = SessionLocal()
+    
+    try:
+        db.query(ProcessingTask).filter(ProcessingTask.id == checkpoint_id).update({
+            ProcessingTask.status: "failed",
+            ProcessingTask.error_message: "A redaction shard failed; run again to resume"
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _dispatch_redaction_batch(db: Session, checkpoint: ProcessingTask, batch_size: int, workers: int) -> bool:
+    """Queue the batch after the checkpoint as a chord of shards, or mark the run completed."""
+    last_id = (checkpoint.result or {}).get("last_id", 0)
+    transcript_ids = [
+        transcript_id for (transcript_id,) in db.query(CallTranscript.id).filter(
+            CallTranscript.id > last_id
+        ).order_by(CallTranscript.id).limit(batch_size).all()
+    ]
+    
+    if not transcript_ids:
+        checkpoint.status = "completed"
+        checkpoint.progress_percentage = 100
+        checkpoint.current_step = "completed"
+        checkpoint.completed_at = datetime.utcnow()
+        db.commit()
+        return False
+    
+    callback = continue_bulk_redaction.s(checkpoint.id, transcript_ids[-1], batch_size, workers)
+    chord(
+        redact_transcript_batch.si(shard) for shard in shard_ids(transcript_ids, workers)
+    )(callback.on_error(fail_bulk_redaction.si(checkpoint.id)))
+    return True
+
+def _load_redaction_checkpoint(
+    db: Session,
+    task_id: str,
+    resume: bool
+) -> Tuple[Optional[ProcessingTask], Optional[ProcessingTask]]:
+    """
+    Claim the failed bulk redaction run for the current ruleset, or start a new one.
+    Returns (checkpoint, None), or (None, the running checkpoint) while another
+    run is still making progress: two chains over the same transcripts would
+    redact them twice and race on the checkpoint. A run that has not
+    checkpointed for REDACTION_STALL_SECONDS (its worker died) counts as failed.
+    """
+    running = db.query(ProcessingTask).filter(
+        ProcessingTask.task_type == "bulk_redaction",
+        ProcessingTask.status == "running"
+    ).with_for_update().order_by(ProcessingTask.id.desc()).all()
+    
+    for in_flight in running:
+        if time.time() - (in_flight.result or {}).get("updated_at", 0) < settings.REDACTION_STALL_SECONDS:
+            db.rollback()
+            return None, in_flight
+        in_flight.status = "failed"
+        in_flight.error_message = "No progress; taken over by a new run"
+    db.flush()
+    
+    checkpoint = None
+    
+    if resume:
+        latest = db.query(ProcessingTask).filter(
+            ProcessingTask.task_type == "bulk_redaction",
+            ProcessingTask.status == "failed"
+        ).order_by(ProcessingTask.id.desc()).first()
+        
+        if latest and (latest.result or {}).get("ruleset_version") == settings.REDACTION_RULESET_VERSION:
+            checkpoint = latest
+            checkpoint.task_id = task_id
+            checkpoint.error_message = None
+    
+    if checkpoint is None:
+        checkpoint = ProcessingTask(
+            task_id=task_id,
+            task_type="bulk_redaction",
+            started_at=datetime.utcnow(),
+            result={
+                "ruleset_version": settings.REDACTION_RULESET_VERSION,
+                "last_id": 0,
+                "processed": 0
+            }
+        )
+        db.add(checkpoint)
+    
+    checkpoint.status = "running"
+    db.commit()
+    return checkpoint, None
+
+def shard_ids(ids: List[int], shards: int) -> List[List[int]]:
+    """Split ids into at most `shards` contiguous, near-equal parts."""
+    shards = max(1, min(shards, len(ids)))
+    size, extra = divmod(len(ids), shards)
+    parts, start = [], 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        parts.append(ids[start:end])
+        start = end
+    return parts
+
+def redact_text(text: str) -> Dict[str, Any]:
+    """Detect and redact personal data in the current process, without dispatching subtasks."""
+    detections = detect_personal_data(text)
+    return apply_redactions(text, detections)
+
 @celery_app.task(bind=True, name="detect_personal_data")
 def detect_personal_data(self, text: str) -> Dict[str, Any]:
     """
@@ -250,7 +488,7 @@ def pseudonymize_data(self, call_id: int) -> Dict[str, Any]:
         pseudonym_mapping = {}
         
         # Detect personal data
-        detections = detect_personal_data.delay(transcript.raw_text).get()
+        detections = detect_personal_data(transcript.raw_text)
         
         # Create consistent pseudonyms
         for detection_type, detection_list in detections["detections"].items():
@@ -277,12 +515,21 @@ def pseudonymize_data(self, call_id: int) -> Dict[str, Any]:
         db.close()
 
 def validate_norwegian_id(id_number: str) -> bool:
-    """Validate Norwegian personal ID number using checksum."""
+    """Validate Norwegian personal ID number (fødselsnummer) using both mod-11 control digits."""
     if len(id_number) != 11 or not id_number.isdigit():
         return False
     
-    # Simplified validation - implement full algorithm for production
-    return True
+    digits = [int(d) for d in id_number]
+    
+    def control_digit(weights: List[int]) -> int:
+        remainder = sum(w * d for w, d in zip(weights, digits)) % 11
+        return 0 if remainder == 0 else 11 - remainder
+    
+    k1 = control_digit([3, 7, 6, 1, 8, 9, 4, 5, 2])
+    k2 = control_digit([5, 4, 3, 2, 7, 6, 5, 4, 3, 2])
+    
+    # A control digit of 10 is never issued
+    return k1 == digits[9] and k2 == digits[10]
 
 def validate_credit_card(card_number: str) -> bool:
     """Validate credit card number using Luhn algorithm."""
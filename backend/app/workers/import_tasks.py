@@ -0,0 +1,108 @@
+"""
+Celery tasks for transcript-only call imports.
+Designer: Abdullah Alawiss
+"""
+
+from datetime import datetime
+from typing import Dict, Any, List
+
+from celery import group
+
+from ..core.celery_config import celery_app
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.call import Call, ProcessingTask
+from ..services.storage import get_storage
+from ..services.transcript_importer import TranscriptImporter
+from .analysis_tasks import analyze_call
+from .gdpr_tasks import redact_sensitive_data
+
+@celery_app.task(bind=True, name="import_transcripts")
+def import_transcripts(self, csv_key: str, transcript_dir: str) -> Dict[str, Any]:
+    """Import a call-log CSV uploaded through the API (held in storage under csv_key)."""
+    db = SessionLocal()
+    storage = get_storage()
+
+    try:
+        task = ProcessingTask(
+            task_id=self.request.id or f"import-{datetime.utcnow().isoformat()}",
+            task_type="transcript_import",
+            status="running",
+            started_at=datetime.utcnow(),
+            current_step="importing"
+        )
+        db.add(task)
+        db.commit()
+
+        importer = TranscriptImporter(db, transcript_dir, dispatch=dispatch_imported_calls)
+        with open(storage.local_path(csv_key), newline="", encoding="utf-8") as f:
+            result = importer.import_csv(f)
+
+        task.status = "completed"
+        task.progress_percentage = 100
+        task.current_step = "completed"
+        task.completed_at = datetime.utcnow()
+        task.result = result
+        db.commit()
+
+        return result
+
+    except Exception as e:
+        db.rollback()
+        if 'task' in locals():
+            task.status = "failed"
+            task.error_message = str(e)
+            task.completed_at = datetime.utcnow()
+            db.commit()
+        raise e
+    finally:
+        storage.delete(csv_key)
+        db.close()
+
+@celery_app.task(bind=True, name="analyze_imported_calls")
+def analyze_imported_calls(self, call_ids: List[int]) -> Dict[str, Any]:
+    """
+    Analysis and GDPR redaction for imported calls; there is no audio to
+    normalize, transcribe or diarize. Runs the stages in-process for a chunk
+    of calls per message and settles their status with two bulk UPDATEs.
+    """
+    completed, failed = [], []
+
+    for call_id in call_ids:
+        try:
+            analyze_call(call_id)
+            redact_sensitive_data(call_id)
+            completed.append(call_id)
+        except Exception as e:
+            failed.append(call_id)
+            print(f"Analysis of imported call {call_id} failed: {e}")
+
+    db = SessionLocal()
+
+    try:
+        if completed:
+            db.query(Call).filter(Call.id.in_(completed)).update({
+                Call.status: "completed",
+                Call.processed_at: datetime.utcnow()
+            }, synchronize_session=False)
+        if failed:
+            db.query(Call).filter(Call.id.in_(failed)).update(
+                {Call.status: "failed"}, synchronize_session=False
+            )
+        db.commit()
+
+        return {"completed": len(completed), "failed": len(failed)}
+
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+def dispatch_imported_calls(call_ids: List[int]) -> None:
+    """Queue analysis for one inserted batch as a single group of chunked tasks."""
+    chunk = settings.TRANSCRIPT_IMPORT_DISPATCH_CHUNK
+    group(
+        analyze_imported_calls.si(call_ids[i:i + chunk])
+        for i in range(0, len(call_ids), chunk)
+    ).apply_async()
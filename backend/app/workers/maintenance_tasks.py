@@ -0,0 +1,106 @@
+"""
+Celery tasks for housekeeping of upload state: expired sessions and parked calls.
+Designer: Abdullah Alawiss
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, Any
+
+from ..core.celery_config import celery_app
+from ..core.database import SessionLocal
+from ..models.call import Call, UploadSession
+from ..services.admission import AdmissionController
+from ..services.upload_service import ChunkStore
+
+@celery_app.task(bind=True, name="cleanup_upload_sessions")
+def cleanup_upload_sessions(self) -> Dict[str, Any]:
+    """
+    Expire resumable upload sessions past their expires_at and delete their
+    chunks, plus any chunk directory left behind by a finished session.
+    """
+    db = SessionLocal()
+    chunk_store = ChunkStore()
+
+    try:
+        now = datetime.utcnow()
+        # A session stuck in "finalizing" past its expiry belongs to a crashed request
+        expired = db.query(UploadSession).filter(
+            UploadSession.status.in_(["open", "finalizing"]),
+            UploadSession.expires_at < now
+        ).all()
+
+        for session in expired:
+            session.status = "expired"
+            chunk_store.remove(session.session_id)
+        db.commit()
+
+        # Directories whose session is no longer open (e.g. a chunk PUT racing finalization)
+        orphaned = 0
+        if os.path.isdir(chunk_store.root):
+            directories = set(os.listdir(chunk_store.root))
+            open_ids = {
+                session_id for (session_id,) in db.query(UploadSession.session_id).filter(
+                    UploadSession.session_id.in_(directories),
+                    UploadSession.status.in_(["open", "finalizing"])
+                ).all()
+            } if directories else set()
+
+            for session_id in directories - open_ids:
+                chunk_store.remove(session_id)
+                orphaned += 1
+
+        result = {"expired_sessions": len(expired), "orphaned_directories": orphaned}
+        print(f"Upload session cleanup: {result}")
+        return result
+
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="release_pending_calls")
+def release_pending_calls(self) -> Dict[str, Any]:
+    """
+    Feeder for uploads parked by admission control: each run queues the
+    oldest pending calls, just enough to bring the processing queues back to
+    the low watermark, so release follows the rate the workers drain them.
+    """
+    budget = AdmissionController().release_budget()
+    if budget <= 0:
+        return {"released": 0}
+
+    db = SessionLocal()
+
+    try:
+        # SKIP LOCKED: overlapping runs take disjoint calls instead of double-queuing
+        call_ids = [
+            call_id for (call_id,) in db.query(Call.id)
+            .filter(Call.status == "pending")
+            .order_by(Call.id)
+            .limit(budget)
+            .with_for_update(skip_locked=True)
+            .all()
+        ]
+        if not call_ids:
+            db.rollback()
+            return {"released": 0}
+
+        db.query(Call).filter(Call.id.in_(call_ids)).update(
+            {Call.status: "uploaded"}, synchronize_session=False
+        )
+        db.commit()
+
+        from celery import group
+        from .audio_tasks import process_audio_file
+        group(process_audio_file.si(call_id) for call_id in call_ids).apply_async()
+
+        print(f"Released {len(call_ids)} pending calls")
+        return {"released": len(call_ids)}
+
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        db.close()
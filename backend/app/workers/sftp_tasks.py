@@ -0,0 +1,183 @@
+"""
+Celery tasks for incremental ingestion of recordings from SFTP.
+Designer: Abdullah Alawiss
+"""
+
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Tuple
+
+from ..core.celery_config import celery_app
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.call import SftpManifestEntry
+from ..services.admission import AdmissionController, dispatch_or_park
+from ..services.ingest_service import duplicate_files, insert_uploads
+from ..services.sftp_service import (
+    RemoteFile,
+    SFTPConnectionPool,
+    SFTPIngestService,
+    diff_manifest,
+    paramiko_connect
+)
+from ..services.storage import get_storage
+from ..services.upload_service import StoredUpload, UploadTooLarge, UnsupportedAudioFormat
+
+MANIFEST_LOOKUP_BATCH = 1000  # Keeps the IN (...) list of one query bounded
+
+SYNC_LOCK_KEY = "sftp:sync"
+
+@celery_app.task(bind=True, name="app.workers.sftp_tasks.sync_sftp_files")
+def sync_sftp_files(self, max_files: int = None) -> Dict[str, Any]:
+    """
+    Fetch recordings that appeared on the SFTP server since the last run.
+    Only one sync runs at a time; an overlapping beat tick returns immediately.
+    """
+    if not settings.SFTP_HOST:
+        return {"status": "disabled"}
+
+    # Files stay on the server, so under backpressure just fetch them on a later run
+    if settings.ADMISSION_MODE == "reject" and not AdmissionController().check().admit:
+        return {"status": "skipped", "reason": "processing queue is full"}
+
+    lock = _sync_lock()
+    if lock is not None and not lock.acquire(blocking=False):
+        return {"status": "skipped", "reason": "previous sync still running"}
+
+    try:
+        return sync_remote_directory(paramiko_connect(), max_files=max_files)
+    finally:
+        if lock is not None:
+            try:
+                lock.release()
+            except Exception:
+                pass
+
+def sync_remote_directory(connect: Callable[[], Any], remote_path: str = None, max_files: int = None) -> Dict[str, Any]:
+    """
+    List the remote directory, download what the manifest has not seen (or
+    has seen with another size/mtime), insert the calls in bulk, record the
+    manifest and dispatch processing (parked under ADMISSION_MODE "park").
+    `connect` returns an SFTP client, so tests can pass a LocalDirectoryClient
+    factory.
+    """
+    max_files = max_files or settings.SFTP_MAX_FILES_PER_SYNC
+    db = SessionLocal()
+    pool = SFTPConnectionPool(connect)
+    ingest = SFTPIngestService(pool, remote_path)
+
+    try:
+        remote_files = ingest.list_remote()
+        pending = diff_manifest(remote_files, _load_manifest(db, [f.path for f in remote_files]))[:max_files]
+
+        outcomes = ingest.download_all(pending)
+
+        stored: List[Tuple[RemoteFile, StoredUpload]] = []
+        rejected: List[Tuple[RemoteFile, Exception]] = []
+        failed = 0
+        for remote, outcome in outcomes:
+            if isinstance(outcome, StoredUpload):
+                stored.append((remote, outcome))
+            elif isinstance(outcome, (UploadTooLarge, UnsupportedAudioFormat)):
+                rejected.append((remote, outcome))
+            else:
+                # Connection or I/O error: not recorded, so the next sync retries it
+                failed += 1
+                print(f"SFTP download of {remote.path} failed: {outcome}")
+
+        uploads = [(upload, remote.name) for remote, upload in stored]
+        storage = get_storage()
+
+        # Calls and manifest rows commit together: a call without its manifest
+        # row would be downloaded and registered again by the next sync
+        try:
+            registered = insert_uploads(db, uploads)
+
+            now = datetime.utcnow()
+            entries = [
+                {
+                    "remote_path": remote.path,
+                    "size": remote.size,
+                    "mtime": remote.mtime,
+                    "status": "downloaded",
+                    "call_id": registration["call_id"],
+                    "error_message": None,
+                    "fetched_at": now
+                }
+                for (remote, _), registration in zip(stored, registered)
+            ] + [
+                {
+                    "remote_path": remote.path,
+                    "size": remote.size,
+                    "mtime": remote.mtime,
+                    "status": "rejected",
+                    "call_id": None,
+                    "error_message": str(error),
+                    "fetched_at": now
+                }
+                for remote, error in rejected
+            ]
+            _record_manifest(db, entries)
+            db.commit()
+        except Exception:
+            db.rollback()
+            for upload, _ in uploads:
+                storage.delete(upload.file_path)
+            raise
+
+        # Duplicates reuse the original's file; their own copy is no longer needed
+        for key in duplicate_files(uploads, registered):
+            storage.delete(key)
+
+        new_call_ids = [r["call_id"] for r in registered if r["status"] == "uploaded"]
+        parked = bool(new_call_ids) and dispatch_or_park(db, new_call_ids) is None
+
+        result = {
+            "listed": len(remote_files),
+            "pending": len(pending),
+            "downloaded": len(stored),
+            "duplicates": sum(1 for r in registered if r["status"] == "duplicate"),
+            "parked": len(new_call_ids) if parked else 0,
+            "rejected": len(rejected),
+            "failed": failed,
+            "bytes": sum(upload.file_size for _, upload in stored)
+        }
+        print(f"SFTP sync: {result}")
+        return result
+
+    except Exception as e:
+        db.rollback()
+        raise e
+    finally:
+        pool.close()
+        db.close()
+
+def _load_manifest(db, paths: List[str]) -> Dict[str, Tuple[int, int]]:
+    manifest = {}
+    for i in range(0, len(paths), MANIFEST_LOOKUP_BATCH):
+        rows = db.query(SftpManifestEntry.remote_path, SftpManifestEntry.size, SftpManifestEntry.mtime).filter(
+            SftpManifestEntry.remote_path.in_(paths[i:i + MANIFEST_LOOKUP_BATCH])
+        ).all()
+        manifest.update({path: (size, mtime) for path, size, mtime in rows})
+    return manifest
+
+def _record_manifest(db, entries: List[Dict[str, Any]]) -> None:
+    """Replace the manifest rows of the given paths; the caller commits."""
+    if not entries:
+        return
+    paths = [entry["remote_path"] for entry in entries]
+    for i in range(0, len(paths), MANIFEST_LOOKUP_BATCH):
+        db.query(SftpManifestEntry).filter(
+            SftpManifestEntry.remote_path.in_(paths[i:i + MANIFEST_LOOKUP_BATCH])
+        ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(SftpManifestEntry, entries)
+
+def _sync_lock():
+    """Redis lock against overlapping syncs, or None when Redis is unreachable."""
+    try:
+        import redis
+        client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        client.ping()
+        return client.lock(SYNC_LOCK_KEY, timeout=3600)
+    except Exception as e:
+        print(f"Warning: Redis unavailable ({e}), SFTP sync runs without a lock")
+        return None
@@ -0,0 +1,87 @@
+"""
+Mixed-traffic load test: tail latency of fast endpoints while slow ones run.
+Designer: Abdullah Alawiss
+"""
+
+import argparse
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import requests
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run(base_url: str, fast_path: str, slow_path: str, fast_clients: int, slow_clients: int, duration: float) -> Dict[str, Dict[str, float]]:
+    """
+    fast_clients keep requesting fast_path and slow_clients slow_path for
+    `duration` seconds. With blocking queries in the handlers, one slow
+    request holds the worker's event loop and the fast path's p99 grows to
+    the slow query's duration; with the async session it stays flat.
+    """
+    latencies: Dict[str, List[float]] = {fast_path: [], slow_path: []}
+    errors: Dict[str, int] = {fast_path: 0, slow_path: 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(path: str) -> None:
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = session.get(base_url + path, timeout=60).ok
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies[path].append(elapsed)
+                else:
+                    errors[path] += 1
+
+    threads = [threading.Thread(target=client, args=(fast_path,)) for _ in range(fast_clients)]
+    threads += [threading.Thread(target=client, args=(slow_path,)) for _ in range(slow_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        path: {
+            "requests": len(samples),
+            "errors": errors[path],
+            "p50_ms": round(_percentile(samples, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(samples, 0.99) * 1000, 1)
+        }
+        for path, samples in latencies.items()
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    """python scripts/latency_benchmark.py --url http://localhost:8000"""
+    parser = argparse.ArgumentParser(description="Tail latency of fast endpoints under mixed traffic")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--fast-path", default="/api/v1/calls/?limit=20")
+    parser.add_argument("--slow-path", default="/api/v1/analysis/stats")
+    parser.add_argument("--fast-clients", type=int, default=20)
+    parser.add_argument("--slow-clients", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    results = run(args.url.rstrip("/"), args.fast_path, args.slow_path, args.fast_clients, args.slow_clients, args.duration)
+    for path, result in results.items():
+        print(
+            f"{path:<40} {result['requests']:>6} req  {result['errors']} errors  "
+            f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Concurrency benchmark for the database connection pool.
+Designer: Abdullah Alawiss
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, text
+
+# Run from anywhere: the app package lives next to this directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.database import checkout_stats, engine_options
+
+
+def run(url: str, pool_size: int, threads: int, duration: float, query_ms: float) -> Dict[str, Any]:
+    """
+    `threads` workers each check out a connection, run a query that takes
+    query_ms on the server (pg_sleep; a client-side sleep elsewhere) and give
+    it back, for `duration` seconds. Returns requests/sec and checkout waits.
+    """
+    postgres = url.startswith("postgresql")
+    engine = create_engine(url, **engine_options(url, pool_size=pool_size, max_overflow=0, echo=False))
+    query = text("SELECT pg_sleep(:s)") if postgres else text("SELECT 1")
+    checkout_stats.reset()
+
+    completed: List[int] = [0] * threads
+    deadline = time.monotonic() + duration
+
+    def worker(index: int) -> None:
+        while time.monotonic() < deadline:
+            with engine.connect() as conn:
+                conn.execute(query, {"s": query_ms / 1000})
+                if not postgres:
+                    time.sleep(query_ms / 1000)
+            completed[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - started
+    engine.dispose()
+
+    return {
+        "pool_size": pool_size,
+        "threads": threads,
+        "requests_per_sec": round(sum(completed) / elapsed, 1),
+        **checkout_stats.snapshot()
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    """python scripts/pool_benchmark.py [--pool-sizes 1 5 10 20] [--threads 40]"""
+    parser = argparse.ArgumentParser(description="Measure throughput against connection pool size")
+    parser.add_argument("--url", default=settings.DATABASE_URL)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--threads", type=int, default=40, help="Concurrent requests (the API thread pool is 40)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per pool size")
+    parser.add_argument("--query-ms", type=float, default=10.0, help="Time each request holds its connection")
+    args = parser.parse_args(argv)
+
+    if ":memory:" in args.url or args.url in ("sqlite://", "sqlite:///"):
+        parser.error("an in-memory SQLite database has a single shared connection; use a file or Postgres URL")
+
+    # pool_size 1 is what the old StaticPool engine amounted to
+    for pool_size in args.pool_sizes:
+        result = run(args.url, pool_size, args.threads, args.duration, args.query_ms)
+        print(
+            f"pool_size={result['pool_size']:>3}  {result['requests_per_sec']:>8} req/s  "
+            f"avg wait {result['avg_wait_ms']} ms  max wait {result['max_wait_ms']} ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
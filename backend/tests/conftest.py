@@ -0,0 +1,83 @@
+"""
+Shared test setup.
+Designer: Abdullah Alawiss
+"""
+
+import os
+
+import pytest
+
+# Settings are read at import time; point the app at a throwaway database
+# before any test module imports it
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+@pytest.fixture
+def db():
+    """Session on a fresh schema, created from the models."""
+    from app.core.database import Base, SessionLocal, engine
+    import app.models.call  # noqa: F401  (registers the tables)
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def api_db(tmp_path, monkeypatch):
+    """
+    Sync session on a file database that the API client below shares. The
+    in-memory default cannot be shared between the sync and async engines.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.database import Base
+    from app.services import admission
+    import app.models.call  # noqa: F401  (registers the tables)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # Dispatch runs in a worker thread on a session of its own
+    monkeypatch.setattr(admission, "SessionLocal", session_factory)
+
+    session = session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def client(api_db, tmp_path, monkeypatch):
+    """TestClient for the v1 API; stored uploads land in tmp_path/uploads."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.api.api_v1.api import api_router
+    from app.core.config import settings
+    from app.core.database import async_database_url, get_async_db
+
+    # NullPool: aiosqlite connections must not outlive the client's event loop
+    async_engine = create_async_engine(async_database_url(str(api_db.bind.url)), poolclass=NullPool)
+    async_session = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+    async def override_get_async_db():
+        async with async_session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    monkeypatch.chdir(tmp_path)
+
+    with TestClient(app) as test_client:
+        yield test_client
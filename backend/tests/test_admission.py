@@ -0,0 +1,161 @@
+"""
+Tests for queue-depth admission control and the pending-call feeder.
+Designer: Abdullah Alawiss
+"""
+
+import pytest
+
+from app.core.config import settings
+from app.models.call import Call
+from app.services.admission import AdmissionController, AdmissionDecision, dispatch_or_park
+from app.workers import audio_tasks, maintenance_tasks
+
+CAPACITY = 4  # Worker slots; with the default watermarks: admit up to 80 queued, refill to 20
+
+
+def _wav(payload: bytes) -> bytes:
+    return b"RIFF" + len(payload).to_bytes(4, "little") + b"WAVE" + payload
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Broker queue depth the controller sees; set queue["depth"] (None: broker unreachable)."""
+    state = {"depth": 0}
+    monkeypatch.setattr(AdmissionController, "queue_depth", lambda self: state["depth"])
+    monkeypatch.setattr(AdmissionController, "worker_capacity", lambda self: CAPACITY)
+    return state
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Call ids sent to process_audio_file, singly or as a group."""
+    call_ids = []
+
+    class Result:
+        id = "task-id"
+
+    def delay(call_id):
+        call_ids.append(call_id)
+        return Result()
+
+    class Group:
+        def __init__(self, signatures):
+            self.signatures = list(signatures)
+
+        def apply_async(self):
+            call_ids.extend(s.args[0] for s in self.signatures)
+            return Result()
+
+    monkeypatch.setattr(audio_tasks.process_audio_file, "delay", delay)
+    monkeypatch.setattr("celery.group", Group)
+    return call_ids
+
+
+def _add_calls(db, count: int, status: str = "uploaded"):
+    calls = [
+        Call(filename=f"{status}-{i}.wav", original_filename="call.wav", file_path=f"uploads/{status}-{i}.wav",
+             file_size=10, status=status)
+        for i in range(count)
+    ]
+    db.add_all(calls)
+    db.commit()
+    return [c.id for c in calls]
+
+
+def test_below_the_high_watermark_work_is_admitted(queue):
+    queue["depth"] = 80
+
+    decision = AdmissionController().check()
+
+    assert (decision.admit, decision.queue_depth, decision.capacity) == (True, 80, CAPACITY)
+
+
+def test_above_the_high_watermark_retry_after_covers_the_drain_to_the_low_watermark(queue):
+    queue["depth"] = 100
+
+    decision = AdmissionController().check()
+
+    assert not decision.admit
+    # 80 messages above the low watermark, 4 slots, 30 s each
+    assert decision.retry_after == 600
+
+
+def test_unreadable_broker_admits_and_releases_nothing(queue):
+    queue["depth"] = None
+
+    assert AdmissionController().check().admit
+    assert AdmissionController().release_budget() == 0
+
+
+@pytest.mark.parametrize("depth, budget", [(0, 20), (15, 5), (20, 0), (90, 0)])
+def test_release_budget_refills_to_the_low_watermark(queue, depth, budget):
+    queue["depth"] = depth
+
+    assert AdmissionController().release_budget() == budget
+
+
+def test_reject_mode_answers_429_with_retry_after(client, api_db, queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MODE", "reject")
+    queue["depth"] = 100
+
+    response = client.post("/api/v1/upload/stream", params={"filename": "call.wav"}, content=_wav(b"\x00" * 100))
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "600"
+    assert api_db.query(Call).count() == 0
+    assert not (tmp_path / "uploads").exists()  # Refused before the body was read
+
+
+def test_park_mode_accepts_the_upload_as_pending(client, api_db, queue, published, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MODE", "park")
+    queue["depth"] = 100
+
+    response = client.post("/api/v1/upload/stream", params={"filename": "call.wav"}, content=_wav(b"\x00" * 100))
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+    assert api_db.query(Call).one().status == "pending"
+    assert published == []
+
+
+def test_park_mode_keeps_order_behind_calls_already_waiting(db, queue, published, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MODE", "park")
+    _add_calls(db, 1, status="pending")
+    new_ids = _add_calls(db, 2)
+
+    # The queues have room, but an earlier call is still parked
+    assert dispatch_or_park(db, new_ids, AdmissionDecision(True, 0, CAPACITY)) is None
+
+    assert {c.status for c in db.query(Call)} == {"pending"}
+    assert published == []
+
+
+def test_park_mode_dispatches_when_there_is_room(db, queue, published, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MODE", "park")
+    new_ids = _add_calls(db, 3)
+
+    assert dispatch_or_park(db, new_ids) == "task-id"
+
+    assert published == new_ids
+    assert {c.status for c in db.query(Call)} == {"uploaded"}
+
+
+def test_feeder_releases_the_oldest_pending_calls_up_to_the_budget(db, queue, published):
+    queue["depth"] = 18  # Room for 2
+    pending = _add_calls(db, 3, status="pending")
+
+    assert maintenance_tasks.release_pending_calls() == {"released": 2}
+
+    assert published == pending[:2]
+    db.expire_all()
+    assert [c.status for c in db.query(Call).order_by(Call.id)] == ["uploaded", "uploaded", "pending"]
+
+
+def test_feeder_does_nothing_while_the_queues_are_full(db, queue, published):
+    queue["depth"] = 50
+    _add_calls(db, 2, status="pending")
+
+    assert maintenance_tasks.release_pending_calls() == {"released": 0}
+
+    assert published == []
+    assert {c.status for c in db.query(Call)} == {"pending"}
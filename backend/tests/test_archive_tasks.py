@@ -0,0 +1,106 @@
+"""
+Tests for the Opus archival tier.
+Designer: Abdullah Alawiss
+"""
+
+import shutil
+import wave
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.call import Call
+from app.services import audio_service
+from app.workers import archive_tasks
+
+SAMPLE_RATE = 8000
+
+
+class FakeFfmpeg:
+    """Stands in for ffmpeg-python: records the output options and writes a placeholder file."""
+
+    Error = audio_service.ffmpeg.Error
+
+    def __init__(self):
+        self.outputs = []
+
+    def input(self, path):
+        return self
+
+    def output(self, path, **options):
+        self.outputs.append((path, options))
+        return self
+
+    def global_args(self, *args):
+        return self
+
+    def overwrite_output(self):
+        return self
+
+    def run(self, **kwargs):
+        path, _ = self.outputs[-1]
+        with open(path, "wb") as f:
+            f.write(b"OggS")
+        return b"", b""
+
+
+def _stereo_wav(path, seconds: float = 2.0):
+    rng = np.random.default_rng(0)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(rng.integers(-8000, 8000, (int(seconds * SAMPLE_RATE), 2)).astype("<i2").tobytes())
+
+
+@pytest.fixture
+def stereo_call(db, tmp_path, monkeypatch):
+    """A completed, old enough call whose stored recording is stereo; normalization left channels=1."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(archive_tasks.settings, "ARCHIVE_ENABLED", True)
+    (tmp_path / "uploads").mkdir()
+    _stereo_wav(tmp_path / "uploads" / "call.wav")
+
+    call = Call(
+        filename="call.wav",
+        original_filename="call.wav",
+        file_path="uploads/call.wav",
+        file_size=(tmp_path / "uploads" / "call.wav").stat().st_size,
+        status="completed",
+        channels=1,
+        format="wav",
+        processed_at=datetime.utcnow() - timedelta(days=365)
+    )
+    db.add(call)
+    db.commit()
+    return call
+
+
+def test_archive_keeps_the_source_channels(db, stereo_call, monkeypatch):
+    fake = FakeFfmpeg()
+    monkeypatch.setattr(audio_service, "ffmpeg", fake)
+    monkeypatch.setattr(
+        audio_service,
+        "_probe_metadata",
+        lambda path: {"duration": 2.0, "channels": fake.outputs[-1][1]["ac"], "codec": "opus", "size": 4}
+    )
+
+    result = archive_tasks.archive_old_calls(min_age_days=30)
+
+    assert result["archived"] == 1
+    assert fake.outputs[-1][1]["ac"] == 2
+    db.expire_all()
+    call = db.get(Call, stereo_call.id)
+    assert (call.file_path, call.format) == ("uploads/call.opus", "opus")
+
+
+@pytest.mark.skipif(not shutil.which("ffmpeg"), reason="needs the ffmpeg binary")
+def test_archived_stereo_recording_is_still_stereo(db, stereo_call, tmp_path):
+    audio_service._cached_metadata.cache_clear()
+
+    assert archive_tasks.archive_old_calls(min_age_days=30)["archived"] == 1
+
+    archived = audio_service._probe_metadata(str(tmp_path / "uploads" / "call.opus"))
+    assert archived["channels"] == 2
+    assert not (tmp_path / "uploads" / "call.wav").exists()
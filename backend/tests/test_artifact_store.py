@@ -0,0 +1,98 @@
+"""
+Tests for artifact store size accounting and LRU eviction.
+Designer: Abdullah Alawiss
+"""
+
+import os
+
+from app.services.artifact_store import ArtifactStore, EVICT_TARGET_RATIO
+
+ARTIFACT = "x" * 98  # 100 bytes once JSON-encoded
+
+
+def _store(tmp_path, max_bytes, rescan_seconds=3600):
+    store = ArtifactStore(str(tmp_path / "artifacts"), max_bytes, rescan_seconds)
+    scans = []
+    entries = store._entries
+
+    def counting_entries():
+        scans.append(1)
+        return entries()
+
+    store._entries = counting_entries
+    return store, scans
+
+
+def _put(store, name, mtime=None):
+    key = ArtifactStore.make_key(name, "test", {})
+    store.put_json(key, ARTIFACT)
+    if mtime is not None:
+        os.utime(store._path(key, ".json"), (mtime, mtime))
+    return key
+
+
+def test_writes_under_the_limit_scan_only_once(tmp_path):
+    store, scans = _store(tmp_path, max_bytes=100_000)
+
+    for i in range(50):
+        _put(store, f"input-{i}")
+
+    assert len(scans) == 1  # The first write measures the store
+    assert ArtifactStore._usage[os.path.abspath(store.root)][0] == store.usage_bytes() == 5000
+
+
+def test_overwriting_a_key_is_not_counted_twice(tmp_path):
+    store, _ = _store(tmp_path, max_bytes=100_000)
+
+    for _ in range(3):
+        _put(store, "same-input")
+
+    assert ArtifactStore._usage[os.path.abspath(store.root)][0] == 100
+
+
+def test_crossing_the_limit_evicts_least_recently_used_down_to_target(tmp_path):
+    store, scans = _store(tmp_path, max_bytes=1000)
+    keys = [_put(store, f"input-{i}", mtime=1_000_000 + i) for i in range(10)]
+    assert len(scans) == 1
+
+    newest = _put(store, "input-new")
+
+    assert len(scans) == 2
+    assert store.usage_bytes() <= 1000 * EVICT_TARGET_RATIO
+    assert store.get_json(keys[0]) is None
+    assert store.get_json(keys[1]) is None
+    assert store.get_json(keys[-1]) == ARTIFACT
+    assert store.get_json(newest) == ARTIFACT
+
+
+def test_recently_read_artifacts_survive_eviction(tmp_path):
+    store, _ = _store(tmp_path, max_bytes=1000)
+    keys = [_put(store, f"input-{i}", mtime=1_000_000 + i) for i in range(10)]
+
+    store.get_json(keys[0])  # Touch: now the most recently used
+    _put(store, "input-new")
+
+    assert store.get_json(keys[0]) == ARTIFACT
+    assert store.get_json(keys[1]) is None
+
+
+def test_stale_total_is_measured_again_from_disk(tmp_path):
+    store, scans = _store(tmp_path, max_bytes=1000, rescan_seconds=0)
+    other_process = ArtifactStore(store.root, max_bytes=0)
+    for i in range(10):
+        _put(other_process, f"elsewhere-{i}", mtime=1_000_000 + i)
+
+    _put(store, "input-new")
+
+    assert len(scans) == 1
+    assert store.usage_bytes() <= 1000 * EVICT_TARGET_RATIO
+
+
+def test_unbounded_store_never_scans(tmp_path):
+    store, scans = _store(tmp_path, max_bytes=0)
+
+    for i in range(5):
+        _put(store, f"input-{i}")
+
+    assert scans == []
+    assert store.usage_bytes() == 500
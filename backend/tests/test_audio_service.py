@@ -0,0 +1,160 @@
+"""
+Tests for audio metadata probing and stereo channel diarization.
+Designer: Abdullah Alawiss
+"""
+
+import wave
+
+import numpy as np
+import pytest
+
+from app.services import audio_service
+from app.services.audio_service import AudioService
+
+SAMPLE_RATE = 8000
+
+
+def _write_wav(path, samples: np.ndarray, channels: int = 1, sample_rate: int = SAMPLE_RATE, sample_width: int = 2):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(np.ascontiguousarray(samples).tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def no_ffprobe(monkeypatch):
+    probed = []
+
+    def probe(file_path):
+        probed.append(file_path)
+        return {"duration": 1.0, "size": 1, "sample_rate": 44100, "channels": 2, "codec": "mp3",
+                "bit_rate": 128000, "format_name": "mp3", "bit_depth": None}
+
+    monkeypatch.setattr(audio_service, "_probe_metadata", probe)
+    audio_service._cached_metadata.cache_clear()
+    yield probed
+    audio_service._cached_metadata.cache_clear()
+
+
+def test_pcm_wav_metadata_comes_from_the_header(tmp_path, no_ffprobe):
+    path = _write_wav(tmp_path / "call.wav", np.zeros((SAMPLE_RATE * 3, 2), dtype="<i2"), channels=2)
+
+    metadata = AudioService().get_audio_metadata(path)
+
+    assert no_ffprobe == []
+    assert metadata["duration"] == 3.0
+    assert (metadata["sample_rate"], metadata["channels"], metadata["bit_depth"]) == (SAMPLE_RATE, 2, 16)
+    assert (metadata["codec"], metadata["format_name"]) == ("pcm_s16le", "wav")
+    assert metadata["bit_rate"] == SAMPLE_RATE * 2 * 16
+    assert metadata["size"] == (tmp_path / "call.wav").stat().st_size
+
+
+def test_8_bit_wav_is_reported_as_unsigned(tmp_path, no_ffprobe):
+    path = _write_wav(tmp_path / "call.wav", np.full(SAMPLE_RATE, 128, dtype=np.uint8), sample_width=1)
+
+    assert AudioService().get_audio_metadata(path)["codec"] == "pcm_u8"
+
+
+def test_non_pcm_files_fall_back_to_ffprobe(tmp_path, no_ffprobe):
+    mp3 = tmp_path / "call.mp3"
+    mp3.write_bytes(b"ID3" + b"\0" * 64)
+    float_wav = tmp_path / "float.wav"
+    float_wav.write_bytes(b"RIFF\x24\0\0\0WAVEfmt \x10\0\0\0\x03\0\x01\0" + b"\0" * 24)
+
+    AudioService().get_audio_metadata(str(mp3))
+    AudioService().get_audio_metadata(str(float_wav))
+
+    assert no_ffprobe == [str(mp3), str(float_wav)]
+
+
+def test_metadata_is_probed_once_and_returned_as_copies(tmp_path, no_ffprobe):
+    mp3 = tmp_path / "call.mp3"
+    mp3.write_bytes(b"ID3")
+    service = AudioService()
+
+    first = service.get_audio_metadata(str(mp3))
+    first["channels"] = 1
+    second = service.get_audio_metadata(str(mp3))
+
+    assert len(no_ffprobe) == 1
+    assert second["channels"] == 2
+
+
+def test_missing_file_raises_value_error(tmp_path):
+    with pytest.raises(ValueError):
+        AudioService().get_audio_metadata(str(tmp_path / "missing.wav"))
+
+
+def _channel(rng, seconds: float, *speech):
+    """Near-silent noise with a 300 Hz tone of the given amplitude over each (start, end, amplitude)."""
+    n = int(seconds * SAMPLE_RATE)
+    signal = rng.normal(0, 3, n)
+    t = np.arange(n) / SAMPLE_RATE
+    for start, end, amplitude in speech:
+        span = slice(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE))
+        signal[span] += amplitude * np.sin(2 * np.pi * 300 * t[span])
+    return signal.astype("<i2")
+
+
+def _stereo(tmp_path, left, right):
+    return _write_wav(tmp_path / "stereo.wav", np.stack([left, right], axis=1), channels=2)
+
+
+def _spans(segments):
+    return [(round(s["start"], 1), round(s["end"], 1)) for s in segments]
+
+
+def test_each_channel_becomes_one_speaker(tmp_path):
+    rng = np.random.default_rng(0)
+    path = _stereo(tmp_path, _channel(rng, 6, (1, 2, 8000)), _channel(rng, 6, (3, 5, 8000)))
+
+    speakers = AudioService().channel_speaker_segments(path)
+
+    assert _spans(speakers["SPEAKER_00"]) == [(0.8, 2.2)]
+    assert _spans(speakers["SPEAKER_01"]) == [(2.8, 5.2)]
+    assert all(s["duration"] == s["end"] - s["start"] for s in speakers["SPEAKER_01"])
+
+
+def test_agent_channel_setting_swaps_the_speakers(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_service.settings, "STEREO_AGENT_CHANNEL", "right")
+    rng = np.random.default_rng(0)
+    path = _stereo(tmp_path, _channel(rng, 6, (1, 2, 8000)), _channel(rng, 6, (3, 5, 8000)))
+
+    speakers = AudioService().channel_speaker_segments(path)
+
+    assert _spans(speakers["SPEAKER_00"]) == [(2.8, 5.2)]
+    assert _spans(speakers["SPEAKER_01"]) == [(0.8, 2.2)]
+
+
+def test_crosstalk_echo_is_not_a_second_speaker(tmp_path):
+    rng = np.random.default_rng(0)
+    # The customer's line picks up the agent at -20 dB
+    path = _stereo(tmp_path, _channel(rng, 6, (1, 2, 8000)), _channel(rng, 6, (1, 2, 800), (3, 5, 8000)))
+
+    speakers = AudioService().channel_speaker_segments(path)
+
+    assert _spans(speakers["SPEAKER_00"]) == [(0.8, 2.2)]
+    assert _spans(speakers["SPEAKER_01"]) == [(2.8, 5.2)]
+
+
+def test_silent_channel_has_no_segments(tmp_path):
+    rng = np.random.default_rng(0)
+    path = _stereo(tmp_path, _channel(rng, 4, (1, 2, 8000)), _channel(rng, 4))
+
+    assert list(AudioService().channel_speaker_segments(path)) == ["SPEAKER_00"]
+
+
+def test_mono_and_upmixed_recordings_are_not_split(tmp_path):
+    rng = np.random.default_rng(0)
+    mono = _channel(rng, 4, (1, 2, 8000))
+    mono_path = _write_wav(tmp_path / "mono.wav", mono)
+    upmixed_path = _stereo(tmp_path, mono, mono)
+    # Upmixed with a level difference: the channels differ but their envelopes move together
+    scaled_path = _write_wav(tmp_path / "scaled.wav", np.stack([mono, (mono * 0.9).astype("<i2")], axis=1), channels=2)
+
+    service = AudioService()
+    assert service.channel_speaker_segments(mono_path) is None
+    assert service.channel_speaker_segments(upmixed_path) is None
+    assert service.channel_speaker_segments(scaled_path) is None
@@ -0,0 +1,116 @@
+"""
+Tests for the processing pipeline tasks.
+Designer: Abdullah Alawiss
+"""
+
+import numpy as np
+import pytest
+from celery import chain
+
+from app.core.celery_config import celery_app
+from app.core.config import settings
+from app.models.call import Call, CallTranscript, ProcessingTask
+from app.services.pcm_buffer import PCMAudio
+from app.workers import audio_tasks
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture
+def long_call(db, tmp_path, monkeypatch):
+    """A 25 s call that is transcribed as three chunks, with the artifact store under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "TRANSCRIPTION_CHUNK_SECONDS", 10)
+    monkeypatch.setattr(settings, "TRANSCRIPTION_MAX_CONCURRENCY", 1)
+
+    rng = np.random.default_rng(0)
+    PCMAudio(rng.integers(-8000, 8000, 25 * SAMPLE_RATE).astype(np.int16), SAMPLE_RATE).write_wav("call.wav")
+    call = Call(filename="call.wav", original_filename="call.wav", file_path="call.wav", file_size=1, content_hash="a" * 64)
+    db.add(call)
+    db.commit()
+    return call
+
+
+def _cached_transcription(db, call):
+    store, key = audio_tasks._stage_store(db, call, "transcription", audio_tasks._transcription_params())
+    return store.get_json(key)
+
+
+def _api_failing_on(monkeypatch, failing_call: int):
+    calls = []
+
+    def api(audio):
+        calls.append(audio)
+        if len(calls) == failing_call:
+            raise ConnectionError("API unavailable")
+        return {"text": "api", "segments": [], "model": "whisper-1-api"}
+
+    monkeypatch.setattr(audio_tasks, "transcribe_with_openai_api", api)
+    monkeypatch.setattr(
+        audio_tasks,
+        "transcribe_with_local_whisper",
+        lambda audio, metadata=None: {"text": "mock", "segments": [], "model": "mock-transcription"}
+    )
+
+
+def test_mixed_model_transcript_is_labelled_and_not_cached(db, long_call, monkeypatch):
+    _api_failing_on(monkeypatch, failing_call=2)
+
+    audio_tasks.transcribe_audio(long_call.id, "call.wav", {"duration": 25.0})
+
+    transcript = db.query(CallTranscript).one()
+    assert transcript.whisper_model == "whisper-1-api+mock-transcription"
+    assert _cached_transcription(db, long_call) is None
+
+
+def test_transcript_from_one_model_is_cached(db, long_call, monkeypatch):
+    _api_failing_on(monkeypatch, failing_call=0)
+
+    audio_tasks.transcribe_audio(long_call.id, "call.wav", {"duration": 25.0})
+
+    assert db.query(CallTranscript).one().whisper_model == "whisper-1-api"
+    assert _cached_transcription(db, long_call)["chunk_models"] == ["whisper-1-api"] * 3
+
+
+
+@pytest.fixture
+def eager(monkeypatch):
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(celery_app.conf, "task_eager_propagates", False)
+
+
+def test_failed_stage_marks_the_call_failed_and_releases_its_inputs(db, tmp_path, monkeypatch, eager):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "ARTIFACT_STORE_ENABLED", False)
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+
+    def broken_whisper(audio, metadata=None):
+        raise RuntimeError("model crashed")
+
+    monkeypatch.setattr(audio_tasks, "transcribe_with_local_whisper", broken_whisper)
+
+    PCMAudio(np.zeros(SAMPLE_RATE, dtype=np.int16), SAMPLE_RATE).write_wav("call_normalized.wav")
+    call = Call(filename="call.wav", original_filename="call.wav", file_path="call.wav", file_size=1, status="processing")
+    task = ProcessingTask(task_id="pipeline-id", task_type="full_processing", status="running")
+    db.add_all([call, task])
+    db.commit()
+
+    # The tail of the DAG process_audio_file dispatches, with the same error callback
+    cleanup = {"pcm_ref": None, "files": ["call_normalized.wav"]}
+    workflow = chain(
+        audio_tasks.transcribe_audio.si(call.id, "call_normalized.wav", {"duration": 1.0}),
+        audio_tasks.finalize_processing.s(call.id, task.task_id, cleanup)
+    )
+    workflow.on_error(audio_tasks.pipeline_failed.s(call.id, task.task_id, cleanup))
+
+    # An eager chain re-raises the stage error once the errback has run
+    with pytest.raises(RuntimeError, match="model crashed"):
+        workflow.apply_async()
+
+    db.expire_all()
+    assert db.get(Call, call.id).status == "failed"
+    task = db.get(ProcessingTask, task.id)
+    assert task.status == "failed"
+    assert task.error_message.endswith("model crashed")
+    assert not (tmp_path / "call_normalized.wav").exists()
@@ -0,0 +1,122 @@
+"""
+Tests for the batch upload endpoint.
+Designer: Abdullah Alawiss
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from app.api.api_v1.endpoints import upload
+from app.core.config import settings
+from app.models.call import Call
+
+
+def _wav(payload: bytes) -> bytes:
+    return b"RIFF" + len(payload).to_bytes(4, "little") + b"WAVE" + payload
+
+
+@pytest.fixture
+def dispatches(monkeypatch):
+    """Each dispatch_new_calls call, as (call ids, decision); returns a group id."""
+    calls = []
+
+    def dispatch(ids, decision=None):
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        calls.append((list(ids), decision))
+        return "group-id"
+
+    monkeypatch.setattr(upload, "dispatch_new_calls", dispatch)
+    return calls
+
+
+def _batch(client, *files, **params):
+    return client.post(
+        "/api/v1/upload/batch",
+        params=params,
+        files=[("files", (name, data, "application/octet-stream")) for name, data in files]
+    )
+
+
+def _stored_files(tmp_path):
+    return sorted(p.name for p in (tmp_path / "uploads").iterdir())
+
+
+def test_batch_inserts_every_call_and_dispatches_one_group(client, api_db, dispatches, tmp_path):
+    files = [(f"call{i}.wav", _wav(bytes([i]) * 100)) for i in range(3)]
+
+    response = _batch(client, *files)
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["original_filename"] for r in results] == ["call0.wav", "call1.wav", "call2.wav"]
+    assert {r["status"] for r in results} == {"uploaded"}
+    assert dispatches == [([r["call_id"] for r in results], None)]
+
+    calls = api_db.query(Call).order_by(Call.id).all()
+    assert [c.content_hash for c in calls] == [hashlib.sha256(data).hexdigest() for _, data in files]
+    assert len(_stored_files(tmp_path)) == 3
+
+
+def test_duplicates_in_the_batch_and_the_database_are_linked(client, api_db, dispatches, tmp_path):
+    known, fresh = _wav(b"\x01" * 100), _wav(b"\x02" * 100)
+    original_id = _batch(client, ("first.wav", known)).json()[0]["call_id"]
+
+    results = _batch(client, ("again.wav", known), ("new.wav", fresh), ("new-copy.wav", fresh)).json()
+
+    assert [r["status"] for r in results] == ["duplicate", "uploaded", "duplicate"]
+    assert str(original_id) in results[0]["message"]
+    assert str(results[1]["call_id"]) in results[2]["message"]
+    assert dispatches[-1] == ([results[1]["call_id"]], None)
+
+    copy = api_db.get(Call, results[2]["call_id"])
+    assert copy.file_path == api_db.get(Call, results[1]["call_id"]).file_path
+    # The duplicates' own copies are removed; one file per distinct recording remains
+    assert len(_stored_files(tmp_path)) == 2
+
+
+def test_failed_files_keep_their_place_in_the_response(client, api_db, dispatches):
+    results = _batch(
+        client,
+        ("a.wav", _wav(b"\x01" * 100)),
+        ("notes.txt", b"not audio at all, just text" * 4),
+        ("b.wav", _wav(b"\x02" * 100))
+    ).json()
+
+    assert [r["status"] for r in results] == ["uploaded", "failed", "uploaded"]
+    assert results[1]["call_id"] == 0
+    assert results[1]["original_filename"] == "notes.txt"
+    assert api_db.query(Call).count() == 2
+    assert dispatches == [([results[0]["call_id"], results[2]["call_id"]], None)]
+
+
+def test_parked_calls_are_reported_as_pending(client, monkeypatch):
+    monkeypatch.setattr(upload, "dispatch_new_calls", lambda ids, decision=None: None)
+
+    results = _batch(client, ("a.wav", _wav(b"\x01" * 100)), ("b.wav", _wav(b"\x02" * 100))).json()
+
+    assert {r["status"] for r in results} == {"pending"}
+    assert results[0]["message"] == upload.PENDING_MESSAGE
+
+
+def test_failed_insert_removes_every_stored_file(client, api_db, dispatches, tmp_path, monkeypatch):
+    def broken_insert(db, uploads, force_reprocess=False):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(upload, "insert_uploads", broken_insert)
+
+    response = _batch(client, ("a.wav", _wav(b"\x01" * 100)), ("b.wav", _wav(b"\x02" * 100)))
+
+    assert response.status_code == 500
+    assert _stored_files(tmp_path) == []
+    assert dispatches == []
+
+
+def test_too_many_files_are_refused(client, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_UPLOAD_MAX_FILES", 2)
+
+    response = _batch(client, *((f"{i}.wav", _wav(bytes([i]) * 10)) for i in range(3)))
+
+    assert response.status_code == 400
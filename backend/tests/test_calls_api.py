@@ -0,0 +1,98 @@
+"""
+Tests for deleting calls that other uploads are duplicates of.
+Designer: Abdullah Alawiss
+"""
+
+from datetime import datetime
+
+import pytest
+
+from app.api.api_v1.endpoints import calls
+from app.models.call import Call, CallAnalysis, CallTranscript, Speaker
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    call_ids = []
+
+    def dispatch(ids, decision=None):
+        call_ids.extend(ids)
+        return "task-id"
+
+    monkeypatch.setattr(calls, "dispatch_new_calls", dispatch)
+    return call_ids
+
+
+def _call(db, name: str, status: str, duplicate_of: Call = None) -> Call:
+    call = Call(
+        filename=name,
+        original_filename=name,
+        file_path="uploads/original.wav",
+        file_size=10,
+        status=status,
+        content_hash="a" * 64,
+        duplicate_of_id=duplicate_of.id if duplicate_of else None
+    )
+    db.add(call)
+    db.commit()
+    return call
+
+
+def _original_with_duplicates(db, status: str):
+    original = _call(db, "original.wav", status)
+    first = _call(db, "first.wav", "duplicate", original)
+    second = _call(db, "second.wav", "duplicate", original)
+    return original, first, second
+
+
+def test_deleting_a_completed_original_hands_its_results_to_a_duplicate(client, api_db, dispatched):
+    original, first, second = _original_with_duplicates(api_db, "completed")
+    original.processed_at = datetime(2026, 1, 1)
+    original.duration_seconds = 42.0
+    api_db.add_all([
+        CallTranscript(call_id=original.id, raw_text="hei"),
+        CallAnalysis(call_id=original.id, overall_result="good"),
+        Speaker(call_id=original.id, speaker_id="SPEAKER_00", segments=[])
+    ])
+    api_db.commit()
+    original_id = original.id
+
+    assert client.delete(f"/api/v1/calls/{original_id}").status_code == 200
+
+    api_db.expire_all()
+    assert api_db.get(Call, original_id) is None
+    heir = api_db.get(Call, first.id)
+    assert (heir.status, heir.duplicate_of_id, heir.duration_seconds) == ("completed", None, 42.0)
+    assert api_db.get(Call, second.id).duplicate_of_id == first.id
+    assert api_db.query(CallTranscript).one().call_id == first.id
+    assert api_db.query(CallAnalysis).one().call_id == first.id
+    assert api_db.query(Speaker).one().call_id == first.id
+    assert dispatched == []
+
+    # The remaining duplicate reads the results through the promoted call
+    assert client.get(f"/api/v1/calls/{second.id}/transcript").json()["raw_text"] == "hei"
+
+
+def test_deleting_an_unfinished_original_dispatches_a_duplicate(client, api_db, dispatched):
+    original, first, second = _original_with_duplicates(api_db, "failed")
+
+    assert client.delete(f"/api/v1/calls/{original.id}").status_code == 200
+
+    api_db.expire_all()
+    heir = api_db.get(Call, first.id)
+    assert (heir.status, heir.duplicate_of_id) == ("uploaded", None)
+    assert api_db.get(Call, second.id).duplicate_of_id == first.id
+    assert dispatched == [first.id]
+
+
+def test_deleting_a_call_without_duplicates(client, api_db, dispatched):
+    call = _call(api_db, "only.wav", "completed")
+    api_db.add(CallTranscript(call_id=call.id, raw_text="hei"))
+    api_db.commit()
+
+    assert client.delete(f"/api/v1/calls/{call.id}").status_code == 200
+    assert client.delete(f"/api/v1/calls/{call.id}").status_code == 404
+
+    assert api_db.query(Call).count() == 0
+    assert api_db.query(CallTranscript).count() == 0
+    assert dispatched == []
@@ -0,0 +1,164 @@
+"""
+Tests for chunk planning and stitching in the chunked transcriber.
+Designer: Abdullah Alawiss
+"""
+
+import numpy as np
+
+from app.services.chunked_transcriber import AudioChunk, ChunkedTranscriber, merge_overlapping_text
+from app.services.pcm_buffer import PCMAudio
+
+SAMPLE_RATE = 16000
+
+
+def _speech_with_pauses(duration: float, pauses):
+    """Loud noise everywhere except the given (start, end) pauses, which are silent."""
+    rng = np.random.default_rng(0)
+    samples = rng.integers(-8000, 8000, int(duration * SAMPLE_RATE)).astype(np.int16)
+    for start, end in pauses:
+        samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] = 0
+    return PCMAudio(samples, SAMPLE_RATE)
+
+
+def _transcriber(**kwargs):
+    options = dict(window_seconds=10, overlap_seconds=1.0, search_seconds=3.0, max_retries=0)
+    options.update(kwargs)
+    return ChunkedTranscriber(backend=lambda audio: {"text": "", "segments": []}, **options)
+
+
+def test_short_audio_is_one_chunk():
+    chunks = _transcriber().plan_chunks(_speech_with_pauses(8.0, []))
+
+    assert len(chunks) == 1
+    assert (chunks[0].start, chunks[0].end) == (0.0, 8.0)
+
+
+def test_cuts_move_to_the_pause_before_each_window_end():
+    audio = _speech_with_pauses(25.0, [(8.5, 8.8), (17.0, 17.3)])
+    chunks = _transcriber().plan_chunks(audio)
+
+    assert len(chunks) == 3
+    assert 8.5 <= chunks[0].own_end <= 8.8
+    assert 17.0 <= chunks[1].own_end <= 17.3
+
+
+def test_chunks_own_a_contiguous_timeline_and_overlap_their_neighbours():
+    audio = _speech_with_pauses(25.0, [(8.5, 8.8), (17.0, 17.3)])
+    chunks = _transcriber().plan_chunks(audio)
+
+    assert chunks[0].own_start == 0.0
+    assert chunks[-1].own_end == audio.duration
+    for previous, following in zip(chunks, chunks[1:]):
+        assert previous.own_end == following.own_start
+        assert previous.end == min(audio.duration, previous.own_end + 1.0)
+        assert following.start == max(0.0, following.own_start - 1.0)
+
+
+def test_cut_falls_back_to_window_end_without_a_pause():
+    # Search window shorter than one energy frame: nothing to choose from
+    chunks = _transcriber(search_seconds=0.0).plan_chunks(_speech_with_pauses(25.0, []))
+
+    assert [round(c.own_end, 6) for c in chunks] == [10.0, 20.0, 25.0]
+
+
+def test_overlap_segment_is_kept_by_the_chunk_owning_its_midpoint():
+    chunks = [AudioChunk(0, 0.0, 11.0, 0.0, 10.0), AudioChunk(1, 9.0, 20.0, 10.0, 20.0)]
+    results = [
+        {"segments": [
+            {"start": 0.0, "end": 9.0, "text": "første del"},
+            {"start": 9.2, "end": 10.4, "text": "midt i"},  # midpoint 9.8: chunk 0
+            {"start": 10.1, "end": 11.0, "text": "overlapp"}  # midpoint 10.55: chunk 1
+        ]},
+        {"segments": [
+            {"start": 0.2, "end": 1.4, "text": "midt i"},  # global 9.2-10.4
+            {"start": 1.1, "end": 2.0, "text": "overlapp"},  # global 10.1-11.0
+            {"start": 2.5, "end": 10.0, "text": "siste del"}
+        ]}
+    ]
+
+    stitched = _transcriber().stitch(chunks, results)
+
+    assert [s["text"] for s in stitched["segments"]] == ["første del", "midt i", "overlapp", "siste del"]
+    assert [s["id"] for s in stitched["segments"]] == [0, 1, 2, 3]
+    assert stitched["segments"][3]["start"] == 11.5  # Shifted by the chunk start
+    assert stitched["text"] == "første del midt i overlapp siste del"
+    assert stitched["chunks"] == 2
+
+
+def test_same_utterance_split_across_the_cut_is_kept_once():
+    chunks = [AudioChunk(0, 0.0, 11.0, 0.0, 10.0), AudioChunk(1, 9.0, 20.0, 10.0, 20.0)]
+    results = [
+        {"segments": [{"start": 8.0, "end": 9.9, "text": "Hei, dette er Telenor."}]},
+        {"segments": [{"start": 0.8, "end": 1.5, "text": "dette er Telenor"}]}  # global 9.8-10.5
+    ]
+
+    stitched = _transcriber().stitch(chunks, results)
+
+    assert [s["text"] for s in stitched["segments"]] == ["Hei, dette er Telenor."]
+
+
+def test_merge_overlapping_text_drops_the_repeated_words():
+    assert merge_overlapping_text("vi ringer fra Telia om", "Telia om avtalen din") == "vi ringer fra Telia om avtalen din"
+
+
+def test_merge_overlapping_text_ignores_case_and_punctuation():
+    assert merge_overlapping_text("Hei, det er Kari.", "kari, som ringte") == "Hei, det er Kari. som ringte"
+
+
+def test_merge_overlapping_text_without_overlap_concatenates():
+    assert merge_overlapping_text("første", "andre") == "første andre"
+    assert merge_overlapping_text("", "andre") == "andre"
+    assert merge_overlapping_text("første", " ") == "første"
+
+
+def test_merge_overlapping_text_only_looks_max_words_back():
+    previous = "a b c d e"
+    assert merge_overlapping_text(previous, "b c d e f", max_words=3) == "a b c d e b c d e f"
+    assert merge_overlapping_text(previous, "b c d e f", max_words=4) == "a b c d e f"
+
+
+def test_chunk_that_falls_back_marks_the_result_degraded():
+    audio = _speech_with_pauses(25.0, [(8.5, 8.8), (17.0, 17.3)])
+    calls = []
+
+    def backend(chunk_audio):
+        calls.append(chunk_audio)
+        if len(calls) == 2:
+            raise ConnectionError("API unavailable")
+        return {"text": "api", "segments": [], "model": "whisper-1-api"}
+
+    transcriber = _transcriber(max_workers=1)
+    transcriber.backend = backend
+    transcriber.fallback = lambda chunk_audio: {"text": "mock", "segments": [], "model": "mock-transcription"}
+
+    result = transcriber.transcribe(audio)
+
+    assert result["chunk_models"] == ["whisper-1-api", "mock-transcription", "whisper-1-api"]
+    assert result["model"] == "whisper-1-api+mock-transcription"
+    assert result["degraded"]
+
+
+def test_chunks_from_one_model_are_not_degraded():
+    audio = _speech_with_pauses(25.0, [(8.5, 8.8), (17.0, 17.3)])
+    transcriber = _transcriber()
+    transcriber.backend = lambda chunk_audio: {"text": "api", "segments": [], "model": "whisper-1-api"}
+
+    result = transcriber.transcribe(audio)
+
+    assert result["model"] == "whisper-1-api"
+    assert result["chunk_models"] == ["whisper-1-api"] * 3
+    assert not result["degraded"]
+
+
+def test_single_chunk_fallback_is_degraded():
+    def backend(chunk_audio):
+        raise ConnectionError("API unavailable")
+
+    transcriber = _transcriber()
+    transcriber.backend = backend
+    transcriber.fallback = lambda chunk_audio: {"text": "local", "segments": [], "model": "whisper-base-local"}
+
+    result = transcriber.transcribe(_speech_with_pauses(8.0, []))
+
+    assert (result["model"], result["degraded"]) == ("whisper-base-local", True)
+    assert "fallback" not in result
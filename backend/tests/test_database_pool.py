@@ -0,0 +1,144 @@
+"""
+Tests for the instrumented connection pool and its fork handling.
+Designer: Abdullah Alawiss
+"""
+
+import os
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import StaticPool
+
+from app.core import database
+from app.core.database import (
+    SLOW_CHECKOUT_SECONDS,
+    CheckoutStats,
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    checkout_stats,
+    engine_options
+)
+
+
+@pytest.fixture
+def pooled_engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(url, **engine_options(url, pool_size=1, max_overflow=0, pool_timeout=0.2))
+    checkout_stats.reset()
+    yield engine
+    engine.dispose()
+    checkout_stats.reset()
+
+
+def test_checkout_stats_totals():
+    stats = CheckoutStats()
+    stats.record(0.002)
+    stats.record(SLOW_CHECKOUT_SECONDS + 0.1)
+    stats.record(0.5, timed_out=True)
+
+    snapshot = stats.snapshot()
+
+    assert snapshot["checkouts"] == 3
+    assert snapshot["slow_checkouts"] == 2
+    assert snapshot["timeouts"] == 1
+    assert snapshot["max_wait_ms"] == 500.0
+    assert snapshot["avg_wait_ms"] == pytest.approx((0.002 + SLOW_CHECKOUT_SECONDS + 0.1 + 0.5) / 3 * 1000)
+
+    stats.reset()
+    assert stats.snapshot() == {"checkouts": 0, "slow_checkouts": 0, "timeouts": 0, "avg_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+
+def test_engine_options_pick_the_pool():
+    assert engine_options("sqlite://")["poolclass"] is StaticPool
+    assert engine_options("sqlite:///:memory:")["poolclass"] is StaticPool
+    assert engine_options("sqlite:///calls.db")["poolclass"] is InstrumentedQueuePool
+    assert engine_options("postgresql://db/calls")["poolclass"] is InstrumentedQueuePool
+    assert engine_options("postgresql://db/calls", asyncio=True)["poolclass"] is InstrumentedAsyncQueuePool
+    assert engine_options("postgresql://db/calls", pool_size=3)["pool_size"] == 3
+
+
+def test_uncontended_checkouts_are_counted_without_wait(pooled_engine):
+    for _ in range(5):
+        with pooled_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    snapshot = checkout_stats.snapshot()
+    assert snapshot["checkouts"] == 5
+    assert snapshot["slow_checkouts"] == 0
+    assert snapshot["timeouts"] == 0
+
+
+def test_waiting_for_a_connection_is_recorded(pooled_engine):
+    held = threading.Event()
+
+    def hold_connection():
+        with pooled_engine.connect():
+            held.set()
+            time.sleep(0.15)
+
+    holder = threading.Thread(target=hold_connection)
+    holder.start()
+    held.wait()
+    with pooled_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    holder.join()
+
+    snapshot = checkout_stats.snapshot()
+    assert snapshot["checkouts"] == 2
+    assert snapshot["slow_checkouts"] == 1
+    assert snapshot["max_wait_ms"] >= 100
+
+
+def test_checkout_timeout_is_recorded(pooled_engine):
+    with pooled_engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            pooled_engine.connect()
+
+    snapshot = checkout_stats.snapshot()
+    assert snapshot["timeouts"] == 1
+    assert snapshot["max_wait_ms"] >= 200
+
+
+def test_fork_hook_disposes_pools_without_closing_connections(monkeypatch):
+    disposed = []
+
+    class FakeEngine:
+        def __init__(self, name):
+            self.name = name
+            self.sync_engine = self
+
+        def dispose(self, close=True):
+            disposed.append((self.name, close))
+
+    monkeypatch.setattr(database, "engine", FakeEngine("sync"))
+    monkeypatch.setattr(database, "async_engine", FakeEngine("async"))
+    checkout_stats.record(1.0)
+
+    database._reset_pool_after_fork()
+
+    assert disposed == [("sync", False), ("async", False)]
+    assert checkout_stats.snapshot()["checkouts"] == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_starts_with_a_fresh_pool():
+    parent_pool = database.engine.pool
+    checkout_stats.record(0.01)
+
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        fresh = database.engine.pool is not parent_pool and checkout_stats.snapshot()["checkouts"] == 0
+        os.write(write_end, b"1" if fresh else b"0")
+        os._exit(0)
+
+    os.close(write_end)
+    result = os.read(read_end, 1)
+    os.close(read_end)
+    os.waitpid(pid, 0)
+    checkout_stats.reset()
+
+    assert result == b"1"
+    assert database.engine.pool is parent_pool  # The parent's pool is untouched
@@ -0,0 +1,138 @@
+"""
+Tests for the Norwegian ID check and the checkpointed bulk re-redaction.
+Designer: Abdullah Alawiss
+"""
+
+import time
+
+import pytest
+
+from app.core.celery_config import celery_app
+from app.core.config import settings
+from app.models.call import Call, CallTranscript, ProcessingTask
+from app.workers import gdpr_tasks
+from app.workers.gdpr_tasks import _load_redaction_checkpoint, shard_ids, validate_norwegian_id
+
+VALID_FNR = "15088410049"
+
+
+@pytest.fixture
+def eager(monkeypatch):
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(celery_app.conf, "task_eager_propagates", True)
+
+
+@pytest.fixture
+def transcripts(db):
+    for i in range(7):
+        call = Call(filename=f"call-{i}.wav", original_filename=f"call-{i}.wav", file_path=f"uploads/call-{i}.wav", file_size=1)
+        db.add(call)
+        db.flush()
+        db.add(CallTranscript(call_id=call.id, raw_text=f"Ring meg på 9123456{i} takk"))
+    db.commit()
+    return db
+
+
+def _checkpoint(db, status, last_id=0, ruleset=None, updated_at=None):
+    checkpoint = ProcessingTask(
+        task_id=f"bulk-{status}-{last_id}",
+        task_type="bulk_redaction",
+        status=status,
+        result={
+            "ruleset_version": ruleset or settings.REDACTION_RULESET_VERSION,
+            "last_id": last_id,
+            "processed": last_id,
+            "updated_at": time.time() if updated_at is None else updated_at
+        }
+    )
+    db.add(checkpoint)
+    db.commit()
+    return checkpoint
+
+
+def test_valid_norwegian_id_passes_both_control_digits():
+    assert validate_norwegian_id(VALID_FNR)
+
+
+@pytest.mark.parametrize("number", [
+    VALID_FNR[:9] + "5" + VALID_FNR[10],  # Wrong first control digit
+    VALID_FNR[:10] + "0",  # Wrong second control digit
+    "1508841004",  # Too short
+    "1508841004a"
+])
+def test_invalid_norwegian_ids_are_rejected(number):
+    assert not validate_norwegian_id(number)
+
+
+def test_shard_ids_splits_into_contiguous_near_equal_parts():
+    assert shard_ids(list(range(10)), 3) == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert shard_ids([1, 2], 4) == [[1], [2]]
+    assert shard_ids([1, 2, 3], 0) == [[1, 2, 3]]
+
+
+def test_failed_run_is_resumed(db):
+    failed = _checkpoint(db, "failed", last_id=5)
+
+    checkpoint, in_flight = _load_redaction_checkpoint(db, "new-task", resume=True)
+
+    assert in_flight is None
+    assert checkpoint.id == failed.id
+    assert (checkpoint.status, checkpoint.task_id, checkpoint.result["last_id"]) == ("running", "new-task", 5)
+
+
+def test_failed_run_of_an_older_ruleset_starts_over(db):
+    old = _checkpoint(db, "failed", last_id=5, ruleset="0")
+
+    checkpoint, _ = _load_redaction_checkpoint(db, "new-task", resume=True)
+
+    assert checkpoint.id != old.id
+    assert checkpoint.result["last_id"] == 0
+
+
+def test_run_in_progress_is_not_joined(db):
+    running = _checkpoint(db, "running", last_id=5)
+
+    checkpoint, in_flight = _load_redaction_checkpoint(db, "new-task", resume=True)
+
+    assert checkpoint is None
+    assert in_flight.id == running.id
+    assert db.query(ProcessingTask).count() == 1
+
+
+def test_stalled_run_is_taken_over(db):
+    stalled = _checkpoint(db, "running", last_id=5, updated_at=time.time() - settings.REDACTION_STALL_SECONDS - 1)
+
+    checkpoint, in_flight = _load_redaction_checkpoint(db, "new-task", resume=True)
+
+    assert in_flight is None
+    assert checkpoint.id == stalled.id
+    assert (checkpoint.status, checkpoint.result["last_id"]) == ("running", 5)
+
+
+def test_second_trigger_while_running_dispatches_nothing(transcripts, monkeypatch):
+    _checkpoint(transcripts, "running", last_id=2)
+    monkeypatch.setattr(gdpr_tasks, "chord", lambda *args, **kwargs: pytest.fail("dispatched a second chain"))
+
+    result = gdpr_tasks.bulk_reredact_transcripts.apply().get()
+
+    assert result["status"] == "already_running"
+
+
+def test_bulk_run_redacts_every_transcript_in_batches(transcripts, eager):
+    gdpr_tasks.bulk_reredact_transcripts.apply(kwargs={"batch_size": 3, "workers": 2}).get()
+
+    checkpoint = transcripts.query(ProcessingTask).filter(ProcessingTask.task_type == "bulk_redaction").one()
+    transcripts.refresh(checkpoint)
+    assert checkpoint.status == "completed"
+    assert checkpoint.result["processed"] == 7
+    assert all("9123456" not in t.processed_text for t in transcripts.query(CallTranscript))
+
+
+def test_bulk_run_resumes_after_the_checkpoint(transcripts, eager):
+    ids = sorted(t.id for t in transcripts.query(CallTranscript))
+    _checkpoint(transcripts, "failed", last_id=ids[3])
+
+    gdpr_tasks.bulk_reredact_transcripts.apply(kwargs={"batch_size": 2, "workers": 2}).get()
+
+    redacted = {t.id for t in transcripts.query(CallTranscript) if t.processed_text}
+    assert redacted == set(ids[4:])
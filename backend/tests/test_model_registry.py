@@ -0,0 +1,124 @@
+"""
+Tests for the per-process model registry and the mock diarization flag.
+Designer: Abdullah Alawiss
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.diarization_service import DiarizationService
+from app.services.model_registry import MockDiarizationPipeline, ModelRegistry, model_registry
+from app.services.pcm_buffer import PCMAudio
+from app.workers import audio_tasks
+
+
+@pytest.fixture
+def counting_registry():
+    loads = []
+    warmups = []
+
+    def load(name):
+        loads.append(name)
+        return object()
+
+    registry = ModelRegistry()
+    registry.register("fake", load, warmups.append)
+    return registry, loads, warmups
+
+
+@pytest.fixture
+def shared_registry():
+    model_registry.clear()
+    yield model_registry
+    model_registry.clear()
+
+
+def test_model_is_loaded_once_and_shared(counting_registry):
+    registry, loads, _ = counting_registry
+
+    first = registry.get("fake:small")
+    second = registry.get("fake:small")
+
+    assert first is second
+    assert loads == ["small"]
+    assert registry.stats()["models"]["fake:small"]["loaded"] is True
+
+
+def test_concurrent_first_use_loads_once(counting_registry):
+    registry, loads, _ = counting_registry
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("fake:small"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["small"]
+    assert len({id(model) for model in results}) == 1
+
+
+def test_preload_loads_and_warms_up(counting_registry):
+    registry, loads, warmups = counting_registry
+
+    stats = registry.preload(["fake:small"], warmup=True)
+
+    assert loads == ["small"]
+    assert len(warmups) == 1
+    assert "warmup_seconds" in stats["models"]["fake:small"]
+    registry.get("fake:small")
+    assert loads == ["small"]
+
+
+def test_preload_records_failures_instead_of_raising(counting_registry):
+    registry, _, _ = counting_registry
+
+    stats = registry.preload(["unknown:model"])
+
+    assert stats["models"]["unknown:model"]["loaded"] is False
+    assert not registry.is_loaded("unknown:model")
+
+
+def test_worker_process_init_hook_preloads_configured_models(shared_registry, monkeypatch):
+    monkeypatch.setattr(settings, "PRELOAD_MODELS", ["pyannote:mock", "whisper:mock"])
+    monkeypatch.setattr(settings, "MODEL_WARMUP", True)
+
+    audio_tasks.preload_models()
+
+    assert shared_registry.is_loaded("pyannote:mock")
+    assert shared_registry.is_loaded("whisper:mock")
+    assert "warmup_seconds" in shared_registry.stats()["models"]["whisper:mock"]
+
+
+def test_worker_process_init_hook_without_models_loads_nothing(shared_registry, monkeypatch):
+    monkeypatch.setattr(settings, "PRELOAD_MODELS", [])
+
+    audio_tasks.preload_models()
+
+    assert shared_registry.stats()["models"] == {}
+
+
+def test_mock_diarization_model_is_flagged_as_mock(shared_registry, monkeypatch):
+    monkeypatch.setattr(settings, "DIARIZATION_MODEL", "mock")
+    audio = PCMAudio(np.zeros(16000 * 12, dtype=np.int16), 16000)
+
+    service = DiarizationService()
+    speakers = service.diarize(audio)
+
+    assert isinstance(service.pipeline, MockDiarizationPipeline)
+    assert set(speakers) == {"SPEAKER_00", "SPEAKER_01"}
+    assert service.used_mock is True
+
+
+def test_real_pipeline_result_is_not_flagged():
+    class Pipeline:
+        # Same output as the mock, but not the registry's stand-in
+        def __call__(self, audio):
+            return MockDiarizationPipeline()(audio)
+
+    service = DiarizationService(pipeline=Pipeline())
+    service.diarize(PCMAudio(np.zeros(16000 * 6, dtype=np.int16), 16000))
+
+    assert service.used_mock is False
@@ -0,0 +1,105 @@
+"""
+Tests for the OpenAI client's circuit breaker transitions.
+Designer: Abdullah Alawiss
+"""
+
+import httpx
+import openai
+import pytest
+
+from app.services.openai_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    OpenAITranscriptionClient,
+    RateLimitTimeout
+)
+
+API_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/audio/transcriptions")
+
+
+class FakeBucket:
+    def __init__(self):
+        self.exhausted = False
+
+    def acquire(self, tokens: float = 1.0, max_wait: float = None) -> float:
+        if self.exhausted:
+            raise RateLimitTimeout("no token")
+        return 0.0
+
+
+def _bad_request():
+    raise openai.BadRequestError("unsupported file", response=httpx.Response(400, request=API_REQUEST), body=None)
+
+
+def _connection_error():
+    raise openai.APIConnectionError(request=API_REQUEST)
+
+
+@pytest.fixture
+def half_open_client():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    breaker.opened_at -= 30  # Reset period over: half-open
+    client = OpenAITranscriptionClient(api_key="test", bucket=FakeBucket(), breaker=breaker, max_retries=0)
+    yield client
+    client.close()
+
+
+def test_open_circuit_rejects_calls():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure()
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_trial_closes_the_circuit(half_open_client):
+    assert half_open_client.call(lambda: "ok") == "ok"
+    assert half_open_client.breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_circuit(half_open_client):
+    with pytest.raises(openai.APIConnectionError):
+        half_open_client.call(_connection_error)
+
+    assert half_open_client.breaker.state == "open"
+
+
+def test_non_retryable_error_frees_the_trial_slot(half_open_client):
+    with pytest.raises(openai.BadRequestError):
+        half_open_client.call(_bad_request)
+
+    assert half_open_client.breaker.state == "half_open"
+    assert half_open_client.call(lambda: "ok") == "ok"
+    assert half_open_client.breaker.state == "closed"
+
+
+def test_unexpected_exception_frees_the_trial_slot(half_open_client):
+    def broken():
+        raise ValueError("not an API error")
+
+    with pytest.raises(ValueError):
+        half_open_client.call(broken)
+
+    assert half_open_client.call(lambda: "ok") == "ok"
+
+
+def test_rate_limit_timeout_does_not_take_the_trial_slot(half_open_client):
+    half_open_client.bucket.exhausted = True
+    with pytest.raises(RateLimitTimeout):
+        half_open_client.call(lambda: "never sent")
+
+    half_open_client.bucket.exhausted = False
+    assert half_open_client.call(lambda: "ok") == "ok"
+    assert half_open_client.breaker.state == "closed"
@@ -0,0 +1,121 @@
+"""
+Query-plan check for the hot query paths: each must be served by an index.
+Designer: Abdullah Alawiss
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, desc, or_, select, text
+from sqlalchemy.engine import Connection
+
+from app.models.call import Call, CallAnalysis, CallTranscript, ProcessingTask, Speaker
+from app.services.transcript_importer import TRANSCRIPT_FORMAT
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The statements the endpoints and workers run, with representative parameters
+HOT_QUERIES: Dict[str, Callable[[], Any]] = {
+    "calls_list": lambda: select(Call).order_by(desc(Call.created_at)).limit(100),
+    "calls_by_status": lambda: select(Call).where(Call.status == "completed").order_by(desc(Call.created_at)).limit(100),
+    "violations": lambda: select(Call).join(CallAnalysis).where(
+        CallAnalysis.overall_result == "bad"
+    ).order_by(desc(Call.created_at)).limit(50),
+    "tasks_list": lambda: select(ProcessingTask).order_by(desc(ProcessingTask.created_at)).limit(50),
+    "tasks_by_status": lambda: select(ProcessingTask).where(
+        ProcessingTask.status == "running"
+    ).order_by(desc(ProcessingTask.created_at)).limit(50),
+    "transcript_by_call": lambda: select(CallTranscript).where(CallTranscript.call_id == 1),
+    "analysis_by_call": lambda: select(CallAnalysis).where(CallAnalysis.call_id == 1),
+    "speakers_by_call": lambda: select(Speaker).where(Speaker.call_id == 1),
+    "running_task_for_call": lambda: select(ProcessingTask).where(
+        ProcessingTask.call_id == 1,
+        ProcessingTask.task_type == "full_processing",
+        ProcessingTask.status == "running"
+    ).order_by(ProcessingTask.id.desc()).limit(1),
+    "duplicates_of_call": lambda: select(Call.id).where(Call.duplicate_of_id == 1),
+    "pending_calls": lambda: select(Call.id).where(Call.status == "pending").order_by(Call.id).limit(100),
+    "archive_candidates": lambda: select(Call.id).where(
+        Call.status == "completed",
+        Call.archived_at.is_(None),
+        Call.duplicate_of_id.is_(None),
+        or_(Call.format.is_(None), Call.format != TRANSCRIPT_FORMAT),
+        Call.processed_at < datetime(2026, 1, 1)
+    ).order_by(Call.processed_at).limit(100),
+}
+
+
+def _full_scans_postgres(conn: Connection, sql: str) -> List[str]:
+    # With sequential scans priced out, the planner still picks one only when
+    # no index can serve the query, so the check does not depend on table size
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    scans = []
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(node.get("Relation Name", "?"))
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def _full_scans_sqlite(conn: Connection, sql: str) -> List[str]:
+    # "SCAN t" reads the whole table; "SEARCH t USING INDEX" and "SCAN t USING INDEX" do not
+    scans = []
+    for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+        detail = row[-1]
+        if detail.startswith("SCAN ") and " USING " not in detail:
+            scans.append(detail.split()[1])
+    return scans
+
+
+def check_plans(url: str) -> Dict[str, List[str]]:
+    """Tables each hot query reads in full; an empty list means index access only."""
+    engine = create_engine(url)
+    results = {}
+    try:
+        with engine.connect() as conn:
+            full_scans = _full_scans_postgres if conn.dialect.name == "postgresql" else _full_scans_sqlite
+            for name, build in HOT_QUERIES.items():
+                sql = str(build().compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+                with conn.begin():
+                    results[name] = full_scans(conn, sql)
+    finally:
+        engine.dispose()
+    return results
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def migrated_url(request, tmp_path, monkeypatch):
+    """A database upgraded to head by the migrations (not create_all), downgraded afterwards."""
+    if request.param == "postgresql":
+        url = os.getenv("TEST_POSTGRES_URL")
+        if not url:
+            pytest.skip("TEST_POSTGRES_URL is not set")
+    else:
+        url = f"sqlite:///{tmp_path / 'plans.db'}"
+
+    # alembic/env.py takes the URL from DATABASE_URL
+    monkeypatch.setenv("DATABASE_URL", url)
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+
+    command.upgrade(config, "head")
+    try:
+        yield url
+    finally:
+        command.downgrade(config, "base")
+
+
+def test_hot_queries_use_indexes(migrated_url):
+    full_scans = {name: scans for name, scans in check_plans(migrated_url).items() if scans}
+
+    assert full_scans == {}
@@ -0,0 +1,105 @@
+"""
+Tests for the array-backed segment container.
+Designer: Abdullah Alawiss
+"""
+
+import pytest
+
+from app.services.segments import SegmentArray
+
+SEGMENTS = [
+    {"start": 0.0, "end": 5.2, "duration": 5.2, "confidence": 0.9},
+    {"start": 12.1, "end": 18.7, "duration": 6.6, "confidence": 0.8765432},
+    {"start": 25.3, "end": 35.8, "duration": 10.5, "confidence": None, "text": "hei", "words": [1, 2]}
+]
+
+
+def test_dicts_round_trip_exactly():
+    expected = [dict(s) for s in SEGMENTS]
+    del expected[2]["confidence"]  # Missing confidence is left out
+
+    assert SegmentArray.from_dicts(SEGMENTS).to_dicts() == expected
+
+
+def test_duration_is_only_written_when_the_input_had_it():
+    segments = [{"start": 1.0, "end": 2.5}]
+
+    assert SegmentArray.from_dicts(segments).to_dicts() == segments
+
+
+@pytest.mark.parametrize("start", [
+    4.5 * 3600 + 0.001,  # Past the range where float32 still resolves milliseconds
+    12 * 3600 + 0.123,
+    24 * 3600 - 0.001
+])
+def test_long_call_timestamps_round_trip_exactly(start):
+    segments = [{"start": start, "end": start + 0.25, "duration": 0.25, "confidence": 0.123456789}]
+
+    assert SegmentArray.from_dicts(segments).to_dicts() == segments
+
+
+def test_speaker_dict_round_trip():
+    speakers = {
+        "SPEAKER_00": [{"start": 0.0, "end": 5.2, "duration": 5.2, "confidence": 0.9}],
+        "SPEAKER_01": [
+            {"start": 5.2, "end": 12.1, "duration": 6.9, "confidence": 0.87},
+            {"start": 18.7, "end": 25.3, "duration": 6.6, "confidence": 0.91}
+        ]
+    }
+
+    array = SegmentArray.from_speaker_dict(speakers)
+
+    assert array.to_speaker_dict() == speakers
+    assert [s["speaker"] for s in array.to_dicts(include_speaker=True)] == ["SPEAKER_00", "SPEAKER_01", "SPEAKER_01"]
+
+
+def test_merge_joins_close_segments_per_speaker():
+    segments = [
+        {"start": 0.0, "end": 2.0, "confidence": 0.8, "speaker": "A"},
+        {"start": 2.3, "end": 4.0, "confidence": 0.6, "speaker": "A"},
+        {"start": 1.0, "end": 3.0, "confidence": 0.9, "speaker": "B"},
+        {"start": 10.0, "end": 11.0, "confidence": 0.7, "speaker": "A"}
+    ]
+
+    merged = SegmentArray.from_dicts(segments).merge(max_gap=0.5).to_dicts(include_speaker=True)
+
+    assert [(s["speaker"], s["start"], s["end"]) for s in merged] == [("A", 0.0, 4.0), ("A", 10.0, 11.0), ("B", 1.0, 3.0)]
+    # Duration-weighted: 2 s at 0.8 and 1.7 s at 0.6
+    assert merged[0]["confidence"] == pytest.approx((2.0 * 0.8 + 1.7 * 0.6) / 3.7)
+
+
+def test_statistics_use_the_given_durations():
+    stats = SegmentArray.from_speaker_dict({
+        "SPEAKER_00": [
+            {"start": 0.0, "end": 5.2, "duration": 5.2, "confidence": 0.9},
+            {"start": 12.1, "end": 18.7, "duration": 6.6, "confidence": 0.7}
+        ]
+    }).statistics()
+
+    assert stats["SPEAKER_00"] == {
+        "total_speaking_time": 5.2 + 6.6,
+        "segment_count": 2,
+        "average_confidence": pytest.approx(0.8),
+        "average_segment_length": (5.2 + 6.6) / 2
+    }
+
+
+def test_overlap_and_interruptions():
+    array = SegmentArray.from_dicts([
+        {"start": 0.0, "end": 4.0, "speaker": "A"},
+        {"start": 3.0, "end": 6.0, "speaker": "B"},
+        {"start": 6.0, "end": 8.0, "speaker": "A"}
+    ])
+
+    assert array.overlap_with(2.0, 5.0) == {"A": 2.0, "B": 2.0}
+    assert array.overlapped_speech_seconds() == 1.0
+    assert array.interruption_count() == 1
+
+
+def test_empty_array():
+    array = SegmentArray.from_dicts([])
+
+    assert len(array) == 0
+    assert array.to_dicts() == []
+    assert array.merge().to_dicts() == []
+    assert array.statistics() == {}
@@ -0,0 +1,360 @@
+"""
+Tests for incremental SFTP ingestion against a local directory.
+Designer: Abdullah Alawiss
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.models.call import Call, SftpManifestEntry
+from app.services.sftp_service import (
+    LocalDirectoryClient,
+    RemoteFile,
+    SFTPConnectionPool,
+    SFTPIngestService,
+    _close_client,
+    diff_manifest
+)
+from app.workers import sftp_tasks
+
+SETTLED = int(time.time()) - 3600  # Older than SFTP_MIN_FILE_AGE_SECONDS
+
+
+def _wav(payload: bytes) -> bytes:
+    return b"RIFF" + len(payload).to_bytes(4, "little") + b"WAVE" + payload
+
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """Remote directory served by LocalDirectoryClient; uploads land in tmp_path/uploads."""
+    incoming = tmp_path / "sftp" / "incoming"
+    incoming.mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    return incoming
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    call_ids = []
+
+    def dispatch(db, ids, decision=None):
+        call_ids.extend(ids)
+        return "task-id"
+
+    monkeypatch.setattr(sftp_tasks, "dispatch_or_park", dispatch)
+    return call_ids
+
+
+def _put(directory, name: str, data: bytes, mtime: int = SETTLED):
+    path = directory / name
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _sync(remote_dir):
+    connect = lambda: LocalDirectoryClient(str(remote_dir.parent))
+    return sftp_tasks.sync_remote_directory(connect, remote_path="/incoming")
+
+
+def test_diff_manifest_returns_new_and_changed_files():
+    files = [
+        RemoteFile("/incoming/a.wav", 100, 1000),
+        RemoteFile("/incoming/b.wav", 200, 1000),
+        RemoteFile("/incoming/c.wav", 300, 1000),
+        RemoteFile("/incoming/d.wav", 400, 1000)
+    ]
+    manifest = {
+        "/incoming/a.wav": (100, 1000),  # Unchanged
+        "/incoming/b.wav": (150, 1000),  # Size changed
+        "/incoming/c.wav": (300, 900)  # Touched
+    }
+
+    assert [f.path for f in diff_manifest(files, manifest)] == ["/incoming/b.wav", "/incoming/c.wav", "/incoming/d.wav"]
+
+
+def test_sync_fetches_new_files_once(db, remote, dispatched):
+    _put(remote, "a.wav", _wav(b"first call"))
+    _put(remote, "b.wav", _wav(b"second call"))
+
+    first = _sync(remote)
+    second = _sync(remote)
+
+    assert (first["listed"], first["downloaded"]) == (2, 2)
+    assert (second["listed"], second["pending"], second["downloaded"]) == (2, 0, 0)
+    assert sorted(c.original_filename for c in db.query(Call)) == ["a.wav", "b.wav"]
+    assert len(dispatched) == 2
+    assert {e.status for e in db.query(SftpManifestEntry)} == {"downloaded"}
+
+
+def test_sync_skips_files_still_being_written(db, remote, dispatched):
+    _put(remote, "settled.wav", _wav(b"settled"))
+    _put(remote, "fresh.wav", _wav(b"fresh"), mtime=int(time.time()))
+
+    result = _sync(remote)
+
+    assert (result["listed"], result["downloaded"]) == (1, 1)
+
+
+def test_changed_size_is_downloaded_again(db, remote, dispatched):
+    _put(remote, "a.wav", _wav(b"partial"))
+    _sync(remote)
+
+    _put(remote, "a.wav", _wav(b"partial, now complete"), mtime=SETTLED + 10)
+    result = _sync(remote)
+
+    assert result["downloaded"] == 1
+    assert db.query(Call).count() == 2
+    entry = db.query(SftpManifestEntry).one()
+    assert (entry.size, entry.mtime) == (len(_wav(b"partial, now complete")), SETTLED + 10)
+
+
+def test_touched_file_is_downloaded_again_and_linked_as_duplicate(db, remote, dispatched):
+    _put(remote, "a.wav", _wav(b"same content"))
+    _sync(remote)
+
+    _put(remote, "a.wav", _wav(b"same content"), mtime=SETTLED + 10)
+    result = _sync(remote)
+
+    assert (result["downloaded"], result["duplicates"]) == (1, 1)
+    assert len(dispatched) == 1
+    assert db.query(SftpManifestEntry).one().mtime == SETTLED + 10
+
+
+def test_rejected_file_is_recorded_and_not_retried(db, remote, dispatched):
+    _put(remote, "notes.txt", b"not audio at all")
+
+    first = _sync(remote)
+    second = _sync(remote)
+
+    assert first["rejected"] == 1
+    assert second["pending"] == 0
+    assert db.query(SftpManifestEntry).one().status == "rejected"
+    assert db.query(Call).count() == 0
+
+
+def test_overlapping_sync_is_skipped_while_the_lock_is_held(db, remote, dispatched, monkeypatch):
+    _put(remote, "a.wav", _wav(b"first call"))
+    lock = threading.Lock()
+    monkeypatch.setattr(settings, "SFTP_HOST", "sftp.example.com")
+    monkeypatch.setattr(sftp_tasks, "_sync_lock", lambda: lock)
+    monkeypatch.setattr(sftp_tasks, "paramiko_connect", lambda: lambda: LocalDirectoryClient(str(remote.parent)))
+    monkeypatch.setattr(settings, "SFTP_REMOTE_PATH", "/incoming")
+
+    lock.acquire()
+    try:
+        assert sftp_tasks.sync_sftp_files() == {"status": "skipped", "reason": "previous sync still running"}
+    finally:
+        lock.release()
+
+    result = sftp_tasks.sync_sftp_files()
+
+    assert result["downloaded"] == 1
+    assert not lock.locked()  # Released after the run
+
+
+class FakeTransport:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeChannel:
+    def __init__(self, transport: FakeTransport):
+        self.transport = transport
+
+    def get_transport(self):
+        return self.transport
+
+
+class FakeRemoteFile:
+    """paramiko's SFTPFile: a context manager with read() and prefetch()."""
+
+    def __init__(self, data: bytes, fail: bool):
+        self.data = data
+        self.fail = fail
+        self.prefetched = None
+        self.offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def prefetch(self, file_size: int):
+        self.prefetched = file_size
+
+    def read(self, size: int) -> bytes:
+        if self.fail:
+            raise EOFError("Server connection dropped")
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += len(chunk)
+        return chunk
+
+
+class FakeSFTPClient:
+    """
+    The parts of paramiko.SFTPClient the ingest uses, including get_channel(),
+    whose transport _close_client must shut down as well.
+    """
+
+    def __init__(self, server: "FakeServer"):
+        self.server = server
+        self.transport = FakeTransport()
+        self.closed = False
+        self.opened = []
+
+    def listdir_attr(self, path: str):
+        return self.server.entries
+
+    def open(self, path: str, mode: str = "rb"):
+        f = FakeRemoteFile(self.server.files[path], fail=path in self.server.failing)
+        self.opened.append(f)
+        self.server.failing.discard(path)  # The next attempt succeeds
+        return f
+
+    def get_channel(self):
+        return FakeChannel(self.transport)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer:
+    def __init__(self):
+        self.files = {}
+        self.entries = []
+        self.failing = set()
+        self.clients = []
+
+    def add(self, name: str, data: bytes, mtime: int = SETTLED, mode: int = 0o100644):
+        self.files[f"/incoming/{name}"] = data
+        self.entries.append(_Entry(name, len(data), mtime, mode))
+
+    def connect(self):
+        client = FakeSFTPClient(self)
+        self.clients.append(client)
+        return client
+
+
+class _Entry:
+    def __init__(self, filename, st_size, st_mtime, st_mode):
+        self.filename = filename
+        self.st_size = st_size
+        self.st_mtime = st_mtime
+        self.st_mode = st_mode
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "SFTP_POOL_SIZE", 1)
+    return FakeServer()
+
+
+def _sync_fake(server):
+    return sftp_tasks.sync_remote_directory(server.connect, remote_path="/incoming")
+
+
+def test_listing_keeps_settled_regular_files_in_mtime_order(server):
+    server.add("b.wav", b"b", mtime=SETTLED)
+    server.add("a.wav", b"a", mtime=SETTLED - 10)
+    server.add("archive", b"", mode=0o040755)  # Directory
+    server.add("unknown.wav", b"u", mode=None)
+    server.add("fresh.wav", b"f", mtime=int(time.time()))
+    ingest = SFTPIngestService(SFTPConnectionPool(server.connect), "/incoming")
+
+    assert [f.name for f in ingest.list_remote()] == ["a.wav", "b.wav"]
+
+
+def test_pool_reuses_one_connection_and_prefetches(db, server, dispatched):
+    for i in range(3):
+        server.add(f"{i}.wav", _wav(bytes([i]) * 100))
+
+    result = _sync_fake(server)
+
+    assert result["downloaded"] == 3
+    assert len(server.clients) == 1  # Listing and all three downloads share it
+    client = server.clients[0]
+    assert [f.prefetched for f in client.opened] == [len(_wav(b"\x00" * 100))] * 3
+    # Closed, transport included, when the sync ends
+    assert client.closed and client.transport.closed
+
+
+def test_connection_error_drops_the_client_and_the_file_is_retried(db, server, dispatched):
+    server.add("a.wav", _wav(b"\x01" * 100))
+    server.add("b.wav", _wav(b"\x02" * 100))
+    server.failing.add("/incoming/a.wav")
+
+    first = _sync_fake(server)
+
+    assert (first["downloaded"], first["failed"]) == (1, 1)
+    broken = server.clients[0]
+    assert broken.closed and broken.transport.closed
+    assert len(server.clients) == 2  # b.wav went through a fresh connection
+    # Not in the manifest, so the next sync fetches it again
+    assert [e.remote_path for e in db.query(SftpManifestEntry)] == ["/incoming/b.wav"]
+
+    second = _sync_fake(server)
+
+    assert (second["pending"], second["downloaded"], second["failed"]) == (1, 1, 0)
+    assert sorted(c.original_filename for c in db.query(Call)) == ["a.wav", "b.wav"]
+
+
+def test_rejected_content_keeps_the_connection(db, server, dispatched):
+    server.add("notes.txt", b"not audio at all" * 4)
+    server.add("a.wav", _wav(b"\x01" * 100))
+
+    result = _sync_fake(server)
+
+    assert (result["rejected"], result["downloaded"]) == (1, 1)
+    assert len(server.clients) == 1
+
+
+def test_close_client_shuts_the_transport_and_survives_errors(capsys):
+    client = FakeSFTPClient(FakeServer())
+    _close_client(client)
+    assert client.closed and client.transport.closed
+
+    class Broken:
+        def close(self):
+            raise OSError("socket already gone")
+
+    _close_client(Broken())  # No get_channel, and close() raises: logged, not raised
+    assert "socket already gone" in capsys.readouterr().out
+
+
+def test_pool_close_closes_idle_clients(server):
+    pool = SFTPConnectionPool(server.connect, size=2)
+    with pool.client():
+        with pool.client():
+            pass
+
+    pool.close()
+
+    assert len(server.clients) == 2
+    assert all(c.closed and c.transport.closed for c in server.clients)
+
+
+def test_calls_and_manifest_commit_together(db, server, dispatched, tmp_path, monkeypatch):
+    server.add("a.wav", _wav(b"\x01" * 100))
+
+    def broken_manifest(db, entries):
+        raise RuntimeError("manifest insert failed")
+
+    monkeypatch.setattr(sftp_tasks, "_record_manifest", broken_manifest)
+
+    with pytest.raises(RuntimeError):
+        _sync_fake(server)
+
+    db.expire_all()
+    assert db.query(Call).count() == 0
+    assert list((tmp_path / "uploads").iterdir()) == []
+    assert dispatched == []
@@ -0,0 +1,46 @@
+"""
+Tests for the artifact keys of pipeline stages.
+Designer: Abdullah Alawiss
+"""
+
+from datetime import datetime
+
+from app.models.call import Call
+from app.services.artifact_store import file_sha256
+from app.workers.audio_tasks import _input_hash
+
+
+class FakeSession:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_upload_hash_is_computed_once_and_kept_on_the_call(tmp_path):
+    original = tmp_path / "call.wav"
+    original.write_bytes(b"RIFF original audio")
+    call = Call(file_path=str(original))
+    db = FakeSession()
+
+    assert _input_hash(db, call) == file_sha256(str(original))
+    assert call.content_hash == file_sha256(str(original))
+    _input_hash(db, call)
+    assert db.commits == 1
+
+
+def test_archived_call_is_keyed_by_its_transcode(tmp_path):
+    original = tmp_path / "call.wav"
+    original.write_bytes(b"RIFF original audio")
+    transcode = tmp_path / "call.opus"
+    transcode.write_bytes(b"OggS archived audio")
+    call = Call(file_path=str(original))
+    db = FakeSession()
+    upload_hash = _input_hash(db, call)
+
+    call.file_path = str(transcode)
+    call.archived_at = datetime.utcnow()
+
+    assert _input_hash(db, call) == file_sha256(str(transcode))
+    assert call.content_hash == upload_hash  # Duplicate detection still matches the upload
@@ -0,0 +1,205 @@
+"""
+Tests for the local and S3 storage backends.
+Designer: Abdullah Alawiss
+"""
+
+import io
+
+import pytest
+
+from app.services.artifact_store import ArtifactStore
+from app.services.storage import MIN_PART_SIZE, LocalStorage, S3Storage, StorageBackend
+
+
+class NotFound(Exception):
+    """Shaped like botocore's ClientError for a missing key."""
+
+    def __init__(self):
+        super().__init__("Not Found")
+        self.response = {"Error": {"Code": "404"}}
+
+
+class StubS3Client:
+    """In-memory bucket with the boto3 S3 client calls S3Storage makes."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.calls.append("put_object")
+        self.objects[Key] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.calls.append("create_multipart_upload")
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.calls.append("upload_part")
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.calls.append("complete_multipart_upload")
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.calls.append("abort_multipart_upload")
+        self.uploads.pop(UploadId)
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.calls.append("get_object")
+        if Key not in self.objects:
+            raise NotFound()
+        data = self.objects[Key]
+        if Range:
+            start, _, end = Range[len("bytes="):].partition("-")
+            data = data[int(start):int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(data)}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise NotFound()
+        return {"ContentLength": len(self.objects[Key])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path / "storage"))
+
+
+@pytest.fixture
+def s3(tmp_path):
+    cache = ArtifactStore(str(tmp_path / "cache"), max_bytes=10 * MIN_PART_SIZE)
+    return S3Storage(bucket="calls", part_size=MIN_PART_SIZE, cache=cache, client=StubS3Client())
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+    class Incomplete(StorageBackend):
+        def put_file(self, local_path, key, remove_source=False):
+            return 0
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_local_put_file_copies_or_moves(local, tmp_path):
+    source = tmp_path / "call.wav"
+    source.write_bytes(b"audio")
+
+    assert local.put_file(str(source), "uploads/copy.wav") == 5
+    assert source.exists()
+    assert local.put_file(str(source), "uploads/moved.wav", remove_source=True) == 5
+    assert not source.exists()
+    assert local.read_range("uploads/moved.wav") == b"audio"
+
+
+def test_local_put_file_in_place_is_a_no_op(local):
+    path = local.spool_path("uploads/in-place.wav")
+    with open(path, "wb") as f:
+        f.write(b"audio")
+
+    assert local.put_file(path, "uploads/in-place.wav", remove_source=True) == 5
+    assert local.exists("uploads/in-place.wav")
+
+
+def test_local_upload_stream_and_ranged_reads(local):
+    assert local.upload_stream("uploads/a.wav", [b"0123", b"4567", b"89"]) == 10
+
+    assert local.read_range("uploads/a.wav") == b"0123456789"
+    assert local.read_range("uploads/a.wav", 3, 4) == b"3456"
+    assert local.read_range("uploads/a.wav", 8) == b"89"
+    assert local.size("uploads/a.wav") == 10
+
+
+def test_local_failed_stream_leaves_nothing_behind(local, tmp_path):
+    def chunks():
+        yield b"partial"
+        raise ConnectionError("client went away")
+
+    with pytest.raises(ConnectionError):
+        local.upload_stream("uploads/broken.wav", chunks())
+
+    assert not local.exists("uploads/broken.wav")
+    assert list((tmp_path / "storage" / "uploads").iterdir()) == []
+
+
+def test_local_missing_keys(local):
+    assert not local.exists("uploads/missing.wav")
+    with pytest.raises(FileNotFoundError):
+        local.local_path("uploads/missing.wav")
+    local.delete("uploads/missing.wav")
+
+
+def test_s3_small_upload_is_a_single_put(s3):
+    assert s3.upload_stream("uploads/a.wav", [b"small", b" file"]) == 10
+
+    assert s3.client.calls == ["put_object"]
+    assert s3.client.objects["uploads/a.wav"] == b"small file"
+
+
+def test_s3_large_upload_goes_through_multipart(s3):
+    chunk = b"x" * (1024 * 1024)
+    size = s3.upload_stream("uploads/large.wav", [chunk] * 11)
+
+    assert size == 11 * len(chunk)
+    assert s3.client.calls.count("upload_part") == 3  # 5 MB, 5 MB, 1 MB
+    assert s3.client.calls[-1] == "complete_multipart_upload"
+    assert s3.client.objects["uploads/large.wav"] == chunk * 11
+
+
+def test_s3_failed_multipart_upload_is_aborted(s3):
+    def chunks():
+        for _ in range(6):
+            yield b"x" * (1024 * 1024)
+        raise ConnectionError("client went away")
+
+    with pytest.raises(ConnectionError):
+        s3.upload_stream("uploads/broken.wav", chunks())
+
+    assert s3.client.calls[-1] == "abort_multipart_upload"
+    assert s3.client.uploads == {}
+    assert "uploads/broken.wav" not in s3.client.objects
+
+
+def test_s3_put_file_and_ranged_reads(s3, tmp_path):
+    source = tmp_path / "call.wav"
+    source.write_bytes(b"0123456789")
+
+    assert s3.put_file(str(source), "uploads/a.wav", remove_source=True) == 10
+    assert not source.exists()
+    assert s3.read_range("uploads/a.wav", 2, 3) == b"234"
+    assert s3.read_range("uploads/a.wav", 7) == b"789"
+
+
+def test_s3_local_path_downloads_once_into_the_cache(s3):
+    s3.client.objects["uploads/a.wav"] = b"audio"
+
+    first = s3.local_path("uploads/a.wav")
+    second = s3.local_path("uploads/a.wav")
+
+    assert first == second
+    assert open(first, "rb").read() == b"audio"
+    assert s3.client.calls.count("get_object") == 1
+
+
+def test_s3_missing_keys(s3):
+    assert not s3.exists("uploads/missing.wav")
+    with pytest.raises(FileNotFoundError):
+        s3.local_path("uploads/missing.wav")
+
+    s3.client.objects["uploads/a.wav"] = b"audio"
+    assert s3.exists("uploads/a.wav")
+    assert s3.size("uploads/a.wav") == 5
+    s3.delete("uploads/a.wav")
+    assert not s3.exists("uploads/a.wav")
@@ -0,0 +1,172 @@
+"""
+Tests for the transcript-only call import.
+Designer: Abdullah Alawiss
+"""
+
+import csv
+import io
+from datetime import datetime
+
+import pytest
+
+from app.models.call import Call, CallTranscript, ProcessingTask
+from app.services.transcript_importer import CALL_COLUMNS, TranscriptImporter, _csv_buffer
+from app.workers import import_tasks
+
+
+@pytest.fixture
+def transcripts(tmp_path):
+    directory = tmp_path / "transcripts"
+    directory.mkdir()
+    return directory
+
+
+def _csv(*rows, header=("filename", "date", "time", "duration_seconds")) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(rows)
+    buffer.seek(0)
+    return buffer
+
+
+def _write(directory, name: str, text: str):
+    (directory / name).write_text(text, encoding="utf-8")
+    return (name, "2024-03-01", "09:30:00", "61.5")
+
+
+def _importer(db, directory, dispatched=None, **kwargs):
+    dispatch = None if dispatched is None else dispatched.append
+    return TranscriptImporter(db, str(directory), dispatch=dispatch, **kwargs)
+
+
+def test_rows_are_inserted_and_dispatched_per_batch(db, transcripts):
+    rows = [_write(transcripts, f"{i}.txt", f"Kunde {i} ringte om faktura.") for i in range(5)]
+    dispatched = []
+
+    stats = _importer(db, transcripts, dispatched, batch_size=2).import_csv(_csv(*rows))
+
+    assert (stats["rows"], stats["imported"]) == (5, 5)
+    assert [len(ids) for ids in dispatched] == [2, 2, 1]
+    calls = db.query(Call).order_by(Call.id).all()
+    assert [c.id for c in calls] == [call_id for ids in dispatched for call_id in ids]
+    assert {(c.status, c.format, c.duration_seconds) for c in calls} == {("processing", "txt", 61.5)}
+    assert calls[0].created_at.replace(tzinfo=None) == datetime(2024, 3, 1, 9, 30)
+    transcript = db.query(CallTranscript).filter(CallTranscript.call_id == calls[3].id).one()
+    assert (transcript.raw_text, transcript.whisper_model) == ("Kunde 3 ringte om faktura.", "import")
+
+
+def test_already_imported_transcripts_are_skipped(db, transcripts):
+    rows = [_write(transcripts, f"{i}.txt", f"Samtale {i}") for i in range(3)]
+    _importer(db, transcripts, batch_size=2).import_csv(_csv(*rows))
+    dispatched = []
+
+    stats = _importer(db, transcripts, dispatched, batch_size=2).import_csv(_csv(*rows))
+
+    assert (stats["imported"], stats["already_imported"]) == (0, 3)
+    assert dispatched == []
+    assert db.query(Call).count() == 3
+
+
+def test_same_text_twice_in_a_batch_is_imported_once(db, transcripts):
+    first = _write(transcripts, "a.txt", "Samme tekst")
+    second = _write(transcripts, "b.txt", "Samme tekst")
+
+    stats = _importer(db, transcripts).import_csv(_csv(first, second))
+
+    assert (stats["imported"], stats["already_imported"]) == (1, 1)
+
+
+def test_missing_and_empty_transcripts_are_counted(db, transcripts):
+    present = _write(transcripts, "present.txt", "Hei")
+    empty = _write(transcripts, "empty.txt", "  \n")
+
+    stats = _importer(db, transcripts).import_csv(_csv(present, empty, ("gone.txt",), ("",), ("../present.txt",)))
+
+    # The path component is stripped, so ../present.txt is the same file (and text) again
+    assert stats == {"rows": 5, "imported": 1, "retried": 0, "already_imported": 1, "missing": 2, "empty": 1}
+
+
+def test_csv_without_the_filename_column_is_rejected(db, transcripts):
+    with pytest.raises(ValueError):
+        _importer(db, transcripts).import_csv(_csv(("a.txt",), header=("file",)))
+
+
+def test_failed_dispatch_marks_the_batch_failed_and_a_rerun_queues_it(db, transcripts):
+    rows = [_write(transcripts, f"{i}.txt", f"Samtale {i}") for i in range(3)]
+
+    def broker_down(call_ids):
+        raise ConnectionError("broker unreachable")
+
+    with pytest.raises(ConnectionError):
+        TranscriptImporter(db, str(transcripts), batch_size=2, dispatch=broker_down).import_csv(_csv(*rows))
+
+    # The first batch was committed, then failed instead of staying "processing"
+    assert {c.status for c in db.query(Call)} == {"failed"}
+    assert db.query(Call).count() == 2
+
+    dispatched = []
+    stats = _importer(db, transcripts, dispatched, batch_size=2).import_csv(_csv(*rows))
+
+    assert (stats["retried"], stats["imported"], stats["already_imported"]) == (2, 1, 0)
+    assert sorted(call_id for ids in dispatched for call_id in ids) == [c.id for c in db.query(Call).order_by(Call.id)]
+    assert {c.status for c in db.query(Call)} == {"processing"}
+
+
+def test_csv_buffer_escapes_text_for_copy():
+    rows = [{
+        "id": 1,
+        "filename": "import-1.txt",
+        "original_filename": 'say "hei", then\nhang up',
+        "file_path": "/data/a,b.txt",
+        "file_size": 10,
+        "duration_seconds": None,
+        "status": "processing",
+        "format": "txt",
+        "content_hash": "abc",
+        "created_at": datetime(2024, 3, 1, 9, 30)
+    }]
+
+    text = _csv_buffer(rows, CALL_COLUMNS).getvalue()
+    parsed = next(csv.reader(io.StringIO(text)))
+
+    assert parsed[2] == 'say "hei", then\nhang up'
+    assert parsed[3] == "/data/a,b.txt"
+    assert parsed[9] == "2024-03-01T09:30:00"
+    # COPY's csv format reads an unquoted empty field as NULL
+    assert ',10,,processing,' in text
+
+
+def test_import_task_records_the_result_and_removes_the_csv(db, transcripts, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rows = [_write(transcripts, f"{i}.txt", f"Samtale {i}") for i in range(2)]
+    (tmp_path / "imports").mkdir()
+    (tmp_path / "imports" / "log.csv").write_text(_csv(*rows).getvalue(), encoding="utf-8")
+    dispatched = []
+    monkeypatch.setattr(import_tasks, "dispatch_imported_calls", dispatched.append)
+
+    result = import_tasks.import_transcripts("imports/log.csv", str(transcripts))
+
+    assert result["imported"] == 2
+    assert len(dispatched) == 1
+    task = db.query(ProcessingTask).one()
+    assert (task.status, task.result) == ("completed", result)
+    assert not (tmp_path / "imports" / "log.csv").exists()
+
+
+def test_analysis_settles_each_call(db, transcripts, monkeypatch):
+    rows = [_write(transcripts, f"{i}.txt", f"Samtale {i}") for i in range(3)]
+    _importer(db, transcripts).import_csv(_csv(*rows))
+    ids = [c.id for c in db.query(Call).order_by(Call.id)]
+
+    def analyze(call_id):
+        if call_id == ids[1]:
+            raise RuntimeError("analysis failed")
+
+    monkeypatch.setattr(import_tasks, "analyze_call", analyze)
+    monkeypatch.setattr(import_tasks, "redact_sensitive_data", lambda call_id: None)
+
+    assert import_tasks.analyze_imported_calls(ids) == {"completed": 2, "failed": 1}
+
+    db.expire_all()
+    assert [c.status for c in db.query(Call).order_by(Call.id)] == ["completed", "failed", "completed"]
@@ -0,0 +1,220 @@
+"""
+Tests for streaming uploads: format sniffing, hashing and the size limit.
+Designer: Abdullah Alawiss
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from app.core.config import settings
+from app.models.call import Call
+from app.services.artifact_store import ArtifactStore
+from app.services.storage import MIN_PART_SIZE, LocalStorage, S3Storage
+from app.services.upload_service import (
+    UPLOAD_CHUNK_SIZE,
+    UnsupportedAudioFormat,
+    UploadService,
+    UploadTooLarge,
+    sniff_audio_format
+)
+
+from .test_storage import StubS3Client
+
+
+def _wav(payload: bytes) -> bytes:
+    return b"RIFF" + len(payload).to_bytes(4, "little") + b"WAVE" + payload
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return UploadService(max_bytes=1000, chunk_size=16, storage=LocalStorage())
+
+
+async def _stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.mark.parametrize("head, audio_format", [
+    (_wav(b"fmt "), "wav"),
+    (b"fLaC\x00\x00\x00\x22", "flac"),
+    (b"\x00\x00\x00\x20ftypM4A \x00\x00", "m4a"),
+    (b"\x00\x00\x00\x20ftypisom\x00\x00", "m4a"),
+    (b"ID3\x04\x00\x00", "mp3"),
+    (b"\xff\xfb\x90\x64", "mp3"),  # MPEG-1 Layer III frame sync
+    (b"OggS\x00\x02", "ogg"),
+    (b"RIFF\x00\x00\x00\x00AVI LIST", None),
+    (b"\xff\xe0\x00\x00", None),  # Frame sync with the reserved layer
+    (b"<html>", None),
+    (b"", None)
+])
+def test_sniff_audio_format(head, audio_format):
+    assert sniff_audio_format(head) == audio_format
+
+
+def test_format_comes_from_content_not_name(service):
+    data = _wav(b"\x00" * 200)
+
+    stored = service.save_iter([data])
+
+    assert stored.audio_format == "wav"
+    assert stored.filename.endswith(".wav")
+    assert stored.content_hash == hashlib.sha256(data).hexdigest()
+    assert stored.file_size == len(data)
+    assert open(stored.file_path, "rb").read() == data
+
+
+def test_tiny_network_chunks_are_collected_before_sniffing(service):
+    data = _wav(b"\x01" * 100)
+
+    stored = asyncio.run(service.save_stream(_stream(*(data[i:i + 3] for i in range(0, len(data), 3)))))
+
+    assert stored.audio_format == "wav"
+    assert open(stored.file_path, "rb").read() == data
+    assert stored.content_hash == hashlib.sha256(data).hexdigest()
+
+
+def test_file_shorter_than_the_sniff_window_is_still_detected(service):
+    data = b"fLaC\x00\x00\x00\x22"
+
+    stored = service.save_iter([data])
+
+    assert stored.audio_format == "flac"
+    assert stored.file_size == len(data)
+
+
+def test_unsupported_format_is_rejected_and_nothing_is_kept(service, tmp_path):
+    with pytest.raises(UnsupportedAudioFormat):
+        asyncio.run(service.save_stream(_stream(b"OggS" + b"\x00" * 100)))  # ogg is not in SUPPORTED_AUDIO_FORMATS
+
+    with pytest.raises(UnsupportedAudioFormat):
+        service.save_iter([b"just some text, not audio at all" * 4])
+
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_upload_stops_as_soon_as_the_limit_is_passed(service, tmp_path):
+    consumed = []
+
+    async def chunks():
+        for i in range(100):
+            consumed.append(i)
+            yield _wav(b"\x00" * 100) if i == 0 else b"\x00" * 100
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(service.save_stream(chunks()))
+
+    assert len(consumed) == 10  # 1,008 bytes; the rest of the body is never read
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_upload_at_the_limit_is_accepted(service):
+    data = _wav(b"\x00" * (1000 - 12))
+
+    assert service.save_iter([data[:500], data[500:]]).file_size == 1000
+
+
+def test_stream_endpoint_rejects_a_declared_oversize_body(client, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONTENT_LENGTH", 1000)
+
+    response = client.post(
+        "/api/v1/upload/stream",
+        params={"filename": "call.wav"},
+        content=_wav(b"\x00" * 2000),
+        headers={"Content-Type": "application/octet-stream"}
+    )
+
+    assert response.status_code == 413
+
+
+def test_stream_endpoint_rejects_a_body_that_grows_past_the_limit(client, api_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONTENT_LENGTH", 1000)
+
+    def body():
+        yield _wav(b"\x00" * 500)
+        yield b"\x00" * 600
+
+    # A generator body is sent chunked, without Content-Length
+    response = client.post("/api/v1/upload/stream", params={"filename": "call.wav"}, content=body())
+
+    assert response.status_code == 413
+    assert api_db.query(Call).count() == 0
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_stream_endpoint_rejects_non_audio(client):
+    response = client.post("/api/v1/upload/stream", params={"filename": "call.wav"}, content=b"<html></html>" * 10)
+
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def bucket(tmp_path, monkeypatch):
+    """S3 storage on an in-memory bucket; uploads go straight into it."""
+    monkeypatch.chdir(tmp_path)
+    cache = ArtifactStore(str(tmp_path / "cache"), max_bytes=10 * MIN_PART_SIZE)
+    return S3Storage(bucket="calls", part_size=MIN_PART_SIZE, cache=cache, client=StubS3Client())
+
+
+def test_s3_upload_is_streamed_without_a_local_copy(bucket, tmp_path):
+    data = _wav(b"\x01" * 100)
+
+    stored = UploadService(max_bytes=1000, chunk_size=16, storage=bucket).save_iter([data[:5], data[5:]])
+
+    assert bucket.client.objects == {stored.file_path: data}
+    assert bucket.client.calls == ["put_object"]
+    assert (stored.audio_format, stored.content_hash) == ("wav", hashlib.sha256(data).hexdigest())
+    assert stored.file_path.startswith("uploads/") and stored.file_path.endswith(".wav")
+    assert not (tmp_path / "uploads").exists()
+
+
+def test_s3_stream_goes_through_multipart(bucket):
+    data = _wav(b"\x02" * (2 * MIN_PART_SIZE + 100))
+    service = UploadService(max_bytes=len(data), storage=bucket)
+
+    stored = asyncio.run(service.save_stream(_stream(*(data[i:i + UPLOAD_CHUNK_SIZE] for i in range(0, len(data), UPLOAD_CHUNK_SIZE)))))
+
+    assert bucket.client.objects[stored.file_path] == data
+    assert bucket.client.calls.count("upload_part") == 3
+    assert stored.content_hash == hashlib.sha256(data).hexdigest()
+
+
+def test_s3_upload_past_the_limit_is_aborted(bucket):
+    consumed = []
+
+    async def chunks():
+        for i in range(20):
+            consumed.append(i)
+            yield _wav(b"\x00" * MIN_PART_SIZE) if i == 0 else b"\x00" * MIN_PART_SIZE
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(UploadService(max_bytes=3 * MIN_PART_SIZE, storage=bucket).save_stream(chunks()))
+
+    assert len(consumed) == 3  # The limit is passed 12 bytes into the third part
+    assert bucket.client.calls[-1] == "abort_multipart_upload"
+    assert bucket.client.objects == {} and bucket.client.uploads == {}
+
+
+def test_s3_non_audio_never_reaches_the_bucket(bucket):
+    with pytest.raises(UnsupportedAudioFormat):
+        asyncio.run(UploadService(storage=bucket).save_stream(_stream(b"<html>" * 20)))
+
+    assert bucket.client.calls == []
+
+
+def test_stream_endpoint_uploads_into_s3(client, bucket, monkeypatch):
+    monkeypatch.setattr("app.services.upload_service.get_storage", lambda: bucket)
+    monkeypatch.setattr("app.api.api_v1.endpoints.upload.dispatch_new_calls", lambda ids, decision=None: "task-id")
+    data = _wav(b"\x03" * 5000)
+
+    def body():
+        for i in range(0, len(data), 1000):
+            yield data[i:i + 1000]
+
+    response = client.post("/api/v1/upload/stream", params={"filename": "call.wav"}, content=body())
+
+    assert response.status_code == 200
+    assert list(bucket.client.objects.values()) == [data]
@@ -0,0 +1,182 @@
+"""
+Tests for resumable chunked upload sessions.
+Designer: Abdullah Alawiss
+"""
+
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.api.api_v1.endpoints import upload
+from app.models.call import Call, UploadSession
+from app.workers.maintenance_tasks import cleanup_upload_sessions
+
+CHUNK_SIZE = 100
+
+
+def _wav(payload: bytes) -> bytes:
+    return b"RIFF" + len(payload).to_bytes(4, "little") + b"WAVE" + payload
+
+
+DATA = _wav(bytes(range(256)))  # 268 bytes: chunks of 100, 100 and 68
+CHUNKS = [DATA[i:i + CHUNK_SIZE] for i in range(0, len(DATA), CHUNK_SIZE)]
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    call_ids = []
+
+    def dispatch(ids, decision=None):
+        # The broker publish (and admission check) must not run on the event loop
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        call_ids.extend(ids)
+        return "task-id"
+
+    monkeypatch.setattr(upload, "dispatch_new_calls", dispatch)
+    return call_ids
+
+
+def _create(client, **overrides):
+    body = {"original_filename": "call.wav", "total_size": len(DATA), "chunk_size": CHUNK_SIZE}
+    body.update(overrides)
+    response = client.post("/api/v1/upload/sessions", json=body)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _put(client, session_id: str, index: int, data: bytes = None, checksum: str = None):
+    data = CHUNKS[index] if data is None else data
+    return client.put(
+        f"/api/v1/upload/sessions/{session_id}/chunks/{index}",
+        content=data,
+        headers={"X-Chunk-SHA256": checksum or hashlib.sha256(data).hexdigest()}
+    )
+
+
+def _complete(client, session_id: str):
+    return client.post(f"/api/v1/upload/sessions/{session_id}/complete")
+
+
+def test_session_is_planned_in_chunks(client):
+    session = _create(client)
+
+    assert session["total_chunks"] == 3
+    assert (session["received_chunks"], session["missing_chunks"]) == ([], [0, 1, 2])
+
+
+def test_chunks_arrive_in_any_order_and_complete_into_one_call(client, api_db, dispatched, tmp_path):
+    session_id = _create(client, content_hash=hashlib.sha256(DATA).hexdigest())["session_id"]
+
+    assert _put(client, session_id, 2).json()["missing_chunks"] == [0, 1]
+    assert _put(client, session_id, 0).json()["missing_chunks"] == [1]
+    assert _put(client, session_id, 1).json()["missing_chunks"] == []
+
+    response = _complete(client, session_id)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == "completed"
+    call = api_db.get(Call, result["call_id"])
+    assert call.content_hash == hashlib.sha256(DATA).hexdigest()
+    assert (tmp_path / call.file_path).read_bytes() == DATA
+    assert dispatched == [call.id]
+    assert not os.path.exists(tmp_path / "uploads" / "sessions" / session_id)
+
+
+def test_duplicate_chunk_put_is_harmless(client, api_db, dispatched):
+    session_id = _create(client)["session_id"]
+
+    for index in (0, 0, 1, 2, 1):
+        assert _put(client, session_id, index).status_code == 200
+
+    assert _complete(client, session_id).status_code == 200
+    assert api_db.query(Call).count() == 1
+
+
+def test_checksum_mismatch_is_rejected_and_the_chunk_discarded(client):
+    session_id = _create(client)["session_id"]
+
+    response = _put(client, session_id, 0, checksum="0" * 64)
+
+    assert response.status_code == 400
+    assert "checksum" in response.json()["detail"]
+    assert client.get(f"/api/v1/upload/sessions/{session_id}").json()["missing_chunks"] == [0, 1, 2]
+
+
+def test_wrong_chunk_size_and_index_are_rejected(client):
+    session_id = _create(client)["session_id"]
+
+    assert _put(client, session_id, 0, data=CHUNKS[0][:50]).status_code == 400
+    assert _put(client, session_id, 2, data=CHUNKS[0]).status_code == 400  # The last chunk is 68 bytes
+    assert _put(client, session_id, 3, data=CHUNKS[2]).status_code == 400
+
+
+def test_complete_with_missing_chunks_is_rejected(client, dispatched):
+    session_id = _create(client)["session_id"]
+    _put(client, session_id, 0)
+    _put(client, session_id, 2)
+
+    response = _complete(client, session_id)
+
+    assert response.status_code == 400
+    assert "[1]" in response.json()["detail"]
+    assert dispatched == []
+
+
+def test_repeated_complete_returns_the_same_call(client, api_db, dispatched):
+    session_id = _create(client)["session_id"]
+    for index in range(3):
+        _put(client, session_id, index)
+
+    first = _complete(client, session_id).json()
+    second = _complete(client, session_id)
+
+    assert second.status_code == 200
+    assert second.json()["call_id"] == first["call_id"]
+    assert api_db.query(Call).count() == 1
+    assert len(dispatched) == 1
+
+
+def test_content_hash_mismatch_reopens_the_session(client, api_db, dispatched):
+    session_id = _create(client, content_hash="f" * 64)["session_id"]
+    for index in range(3):
+        _put(client, session_id, index)
+
+    response = _complete(client, session_id)
+
+    assert response.status_code == 400
+    assert api_db.query(Call).count() == 0
+    session = client.get(f"/api/v1/upload/sessions/{session_id}").json()
+    assert (session["status"], session["missing_chunks"]) == ("open", [])
+
+
+def test_chunk_put_after_completion_is_rejected(client, dispatched):
+    session_id = _create(client)["session_id"]
+    for index in range(3):
+        _put(client, session_id, index)
+    _complete(client, session_id)
+
+    assert _put(client, session_id, 0).status_code == 409
+
+
+def test_expired_sessions_are_cleaned_up(client, api_db, tmp_path, monkeypatch):
+    session_id = _create(client)["session_id"]
+    _put(client, session_id, 0)
+    session = api_db.query(UploadSession).one()
+    session.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    api_db.commit()
+
+    assert _put(client, session_id, 1).status_code == 410
+
+    monkeypatch.setattr("app.workers.maintenance_tasks.SessionLocal", sessionmaker(bind=api_db.bind))
+    result = cleanup_upload_sessions()
+
+    assert result["expired_sessions"] == 1
+    api_db.expire_all()
+    assert api_db.query(UploadSession).one().status == "expired"
+    assert not os.path.exists(tmp_path / "uploads" / "sessions" / session_id)
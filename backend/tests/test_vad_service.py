@@ -0,0 +1,135 @@
+"""
+Tests for the energy VAD pre-pass and the speech-timeline remap.
+Designer: Abdullah Alawiss
+"""
+
+import numpy as np
+import pytest
+
+from app.services.pcm_buffer import PCMAudio
+from app.services.vad_service import SpeechTimeline, VADService
+from app.workers.audio_tasks import _skip_silence
+
+SAMPLE_RATE = 16000
+
+
+def _audio(*parts):
+    """PCMAudio from (seconds, amplitude) parts: a 440 Hz tone, or near-silent noise at amplitude 0."""
+    rng = np.random.default_rng(0)
+    pieces = []
+    for seconds, amplitude in parts:
+        n = int(seconds * SAMPLE_RATE)
+        if amplitude:
+            tone = amplitude * np.sin(2 * np.pi * 440 * np.arange(n) / SAMPLE_RATE)
+        else:
+            tone = rng.normal(0, 3, n)
+        pieces.append(tone)
+    return PCMAudio(np.concatenate(pieces).astype(np.int16), SAMPLE_RATE)
+
+
+@pytest.fixture
+def vad():
+    return VADService(energy_margin_db=12.0, min_speech_seconds=0.25, min_silence_seconds=0.5, padding_seconds=0.2)
+
+
+def test_speech_between_silences_is_found_with_padding(vad):
+    audio = _audio((1.0, 0), (2.0, 8000), (1.0, 0))
+
+    regions = vad.detect_speech(audio)
+
+    assert len(regions) == 1
+    start, end = regions[0]
+    assert start == pytest.approx(0.8, abs=0.05)
+    assert end == pytest.approx(3.2, abs=0.05)
+
+
+def test_short_pauses_are_bridged(vad):
+    audio = _audio((1.0, 0), (1.0, 8000), (0.3, 0), (1.0, 8000), (1.0, 0))
+
+    assert len(vad.detect_speech(audio)) == 1
+
+
+def test_long_pauses_split_regions(vad):
+    audio = _audio((1.0, 0), (1.0, 8000), (2.0, 0), (1.0, 8000), (1.0, 0))
+
+    regions = vad.detect_speech(audio)
+
+    assert len(regions) == 2
+    assert regions[0][1] < regions[1][0]
+
+
+def test_blips_shorter_than_min_speech_are_dropped(vad):
+    audio = _audio((1.0, 0), (0.1, 8000), (1.0, 0))
+
+    assert vad.detect_speech(audio) == []
+
+
+def test_silence_and_empty_audio_have_no_speech(vad):
+    assert vad.detect_speech(_audio((2.0, 0))) == []
+    assert vad.detect_speech(PCMAudio(np.zeros(0, dtype=np.int16), SAMPLE_RATE)) == []
+
+
+def test_padding_is_clamped_to_the_recording(vad):
+    audio = _audio((1.0, 8000), (1.0, 0))
+
+    start, end = vad.detect_speech(audio)[0]
+
+    assert start == 0.0
+    assert end <= audio.duration
+
+
+def test_extract_speech_concatenates_regions(vad):
+    audio = _audio((1.0, 0), (1.0, 8000), (1.0, 0))
+
+    speech = vad.extract_speech(audio, [(0.5, 1.0), (2.0, 2.25)])
+
+    assert speech.sample_rate == SAMPLE_RATE
+    assert speech.duration == pytest.approx(0.75)
+
+
+def test_timeline_maps_compact_times_back_to_the_original():
+    timeline = SpeechTimeline([(1.0, 3.0), (5.0, 6.0)])
+
+    assert timeline.to_original([0.0, 1.5, 2.0, 2.5]).tolist() == [1.0, 2.5, 5.0, 5.5]
+    # An end exactly on the boundary stays in the earlier region
+    assert timeline.to_original([2.0], is_end=True).tolist() == [3.0]
+
+
+def test_timeline_remaps_segments_and_durations():
+    timeline = SpeechTimeline([(1.0, 3.0), (5.0, 6.0)])
+
+    segments = timeline.remap_segments([{"start": 0.5, "end": 2.0, "duration": 1.5, "text": "hei"},
+                                        {"start": 2.0, "end": 2.75, "text": "takk"}])
+
+    assert segments[0] == {"start": 1.5, "end": 3.0, "duration": 1.5, "text": "hei"}
+    assert (segments[1]["start"], segments[1]["end"]) == (5.0, 5.75)
+
+
+def test_empty_timeline_leaves_times_unchanged():
+    assert SpeechTimeline([]).to_original([1.0, 2.0]).tolist() == [1.0, 2.0]
+
+
+def test_skip_silence_writes_a_speech_only_file(tmp_path):
+    audio = _audio((2.0, 0), (1.0, 8000), (2.0, 0))
+    source = tmp_path / "call.wav"
+    normalized = tmp_path / "call_normalized.wav"
+    source.write_bytes(b"")
+    audio.write_wav(str(normalized))
+
+    regions, speech_path, buffer = _skip_silence(str(normalized), None, str(source))
+
+    assert len(regions) == 1
+    assert buffer is None
+    assert not normalized.exists()
+    assert PCMAudio.from_wav(speech_path).duration == pytest.approx(regions[0][1] - regions[0][0], abs=0.01)
+
+
+def test_skip_silence_keeps_audio_with_little_silence(tmp_path):
+    normalized = tmp_path / "call_normalized.wav"
+    _audio((3.0, 8000)).write_wav(str(normalized))
+
+    regions, path, _ = _skip_silence(str(normalized), None, str(tmp_path / "call.wav"))
+
+    assert regions is None
+    assert path == str(normalized)
+    assert normalized.exists()